@@ -0,0 +1,337 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import uconfig
+
+#=====================================================================#
+# Cache jawaban semantik: query hasil routing -> SermonSummary (dict) #
+#=====================================================================#
+# Lookup memakai cosine similarity antara embedding query baru dan
+# embedding query yang sudah pernah dijawab. Setiap entry menyimpan
+# versi index; begitu index berubah (process_and_add_documents),
+# versi dinaikkan dan seluruh entry lama dibuang. Versi disimpan di
+# SQLite (R_ANSWER_CACHE_PATH) untuk kedua backend, jadi invalidate()
+# dari worker lain atau dari reconcile.py ikut terlihat di sini.
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection):
+    """
+    Transaksi eksplisit; koneksi isolation_level=None tidak membuka transaksi
+    sendiri, jadi `with conn` saja tidak membuat beberapa statement atomik.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _normalize(vector) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+
+class CacheEntry:
+    __slots__ = ("query", "vector", "payload", "created_at", "index_version")
+
+    def __init__(self, query: str, vector: np.ndarray, payload: dict, created_at: float, index_version: int):
+        self.query = query
+        self.vector = vector
+        self.payload = payload
+        self.created_at = created_at
+        self.index_version = index_version
+
+
+class SharedIndexVersion:
+    """
+    Versi index di tabel answer_cache_meta (file yang sama dengan SQLiteBackend),
+    dibaca setiap lookup supaya semua proses di host ini melihat invalidate() yang sama.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS answer_cache_meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.execute("INSERT OR IGNORE INTO answer_cache_meta VALUES ('index_version', 0)")
+
+    def get(self) -> int:
+        return self._conn.execute("SELECT value FROM answer_cache_meta WHERE key = 'index_version'").fetchone()[0]
+
+    def bump(self) -> int:
+        with _transaction(self._conn):
+            self._conn.execute("UPDATE answer_cache_meta SET value = value + 1 WHERE key = 'index_version'")
+            return self.get()
+
+
+class MemoryBackend:
+    """
+    Backend di dalam proses. Urutan OrderedDict dipakai sebagai urutan LRU.
+    Entry hanya milik proses ini; dengan `shared_version` versi index-nya
+    diikutkan ke versi bersama sehingga invalidate() dari proses lain berlaku.
+    """
+
+    def __init__(self, shared_version: Optional[SharedIndexVersion] = None):
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._shared_version = shared_version
+        self._version = shared_version.get() if shared_version is not None else 0
+
+    def get_version(self) -> int:
+        if self._shared_version is not None:
+            version = self._shared_version.get()
+            if version != self._version:
+                self._version = version
+                self._entries.clear()
+        return self._version
+
+    def bump_version(self) -> int:
+        if self._shared_version is not None:
+            self._version = self._shared_version.bump()
+        else:
+            self._version += 1
+        self._entries.clear()
+        return self._version
+
+    def items(self) -> List[Tuple[str, CacheEntry]]:
+        return list(self._entries.items())
+
+    def touch(self, key: str):
+        self._entries.move_to_end(key)
+
+    def put(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def pop_oldest(self) -> Optional[str]:
+        if not self._entries:
+            return None
+        key, _ = self._entries.popitem(last=False)
+        return key
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """
+    Backend SQLite, bisa dipakai bersama oleh beberapa worker di host yang sama.
+    Isi tabel dicerminkan ke memori dan dimuat ulang ketika ada proses lain
+    yang menulis (dideteksi lewat PRAGMA data_version). Cache hit tidak menulis
+    ke disk (itu memaksa proses lain memuat ulang mirror-nya); last_used
+    dikumpulkan dan baru ditulis bersama put/delete berikutnya.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answer_cache ("
+            " key TEXT PRIMARY KEY, query TEXT, vector BLOB, payload TEXT,"
+            " created_at REAL, last_used REAL, index_version INTEGER)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS answer_cache_meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self._conn.execute("INSERT OR IGNORE INTO answer_cache_meta VALUES ('index_version', 0)")
+        self._mirror = MemoryBackend()
+        self._data_version = None
+        self._touched: Dict[str, float] = {}
+        self._refresh()
+
+    def _refresh(self):
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+
+        mirror = MemoryBackend()
+        mirror._version = self.get_version()
+        rows = self._conn.execute(
+            "SELECT key, query, vector, payload, created_at, index_version FROM answer_cache ORDER BY last_used"
+        )
+        for key, query, vector, payload, created_at, index_version in rows:
+            mirror.put(key, CacheEntry(
+                query, np.frombuffer(vector, dtype=np.float32), json.loads(payload), created_at, index_version
+            ))
+        self._mirror = mirror
+
+    def get_version(self) -> int:
+        return self._conn.execute("SELECT value FROM answer_cache_meta WHERE key = 'index_version'").fetchone()[0]
+
+    def bump_version(self) -> int:
+        with _transaction(self._conn):
+            self._conn.execute("UPDATE answer_cache_meta SET value = value + 1 WHERE key = 'index_version'")
+            self._conn.execute("DELETE FROM answer_cache")
+        self._touched.clear()
+        self._data_version = None
+        self._refresh()
+        return self._mirror.get_version()
+
+    def items(self) -> List[Tuple[str, CacheEntry]]:
+        self._refresh()
+        return self._mirror.items()
+
+    def touch(self, key: str):
+        self._mirror.touch(key)
+        self._touched[key] = time.time()
+
+    def _flush_touches(self):
+        if self._touched:
+            touched, self._touched = self._touched, {}
+            self._conn.executemany(
+                "UPDATE answer_cache SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in touched.items()],
+            )
+
+    def put(self, key: str, entry: CacheEntry):
+        self._mirror.put(key, entry)
+        self._touched.pop(key, None)
+        with _transaction(self._conn):
+            self._flush_touches()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answer_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.query, entry.vector.tobytes(), json.dumps(entry.payload),
+                 entry.created_at, time.time(), entry.index_version),
+            )
+
+    def delete(self, key: str):
+        self._mirror.delete(key)
+        self._touched.pop(key, None)
+        with _transaction(self._conn):
+            self._flush_touches()
+            self._conn.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+
+    def pop_oldest(self) -> Optional[str]:
+        key = self._mirror.pop_oldest()
+        if key is not None:
+            self._touched.pop(key, None)
+            with _transaction(self._conn):
+                self._flush_touches()
+                self._conn.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+        return key
+
+    def __len__(self) -> int:
+        return len(self._mirror)
+
+
+class AnswerCache:
+    def __init__(self, backend, threshold: float, ttl: float, max_entries: int):
+        self.backend = backend
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, vector) -> Optional[dict]:
+        """
+        Kembalikan payload yang tersimpan jika ada query yang cukup mirip.
+        """
+        query_vector = _normalize(vector)
+        now = time.time()
+
+        with self._lock:
+            version = self.backend.get_version()
+            live: List[Tuple[str, CacheEntry]] = []
+            for key, entry in self.backend.items():
+                if entry.index_version != version or now - entry.created_at > self.ttl:
+                    self.backend.delete(key)
+                    self.evictions += 1
+                    continue
+                live.append((key, entry))
+
+            if live:
+                scores = np.stack([entry.vector for _, entry in live]) @ query_vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key, entry = live[best]
+                    self.hits += 1
+                    self.backend.touch(key)
+                    return dict(entry.payload)
+
+            self.misses += 1
+            return None
+
+    def store(self, query: str, vector, payload: dict):
+        key = hashlib.sha256(query.strip().lower().encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = CacheEntry(query, _normalize(vector), payload, time.time(), self.backend.get_version())
+            self.backend.put(key, entry)
+            while len(self.backend) > self.max_entries:
+                if self.backend.pop_oldest() is None:
+                    break
+                self.evictions += 1
+
+    def invalidate(self):
+        """
+        Naikkan versi index, semua jawaban lama otomatis tidak berlaku.
+        """
+        with self._lock:
+            self.backend.bump_version()
+            self.invalidations += 1
+
+    # Versi async: query SQLite, reload mirror dan scoring numpy berjalan di
+    # bawah threading lock, jadi dari event loop dijalankan di thread pool.
+
+    async def alookup(self, vector) -> Optional[dict]:
+        return await asyncio.to_thread(self.lookup, vector)
+
+    async def astore(self, query: str, vector, payload: dict):
+        await asyncio.to_thread(self.store, query, vector, payload)
+
+    async def ainvalidate(self):
+        await asyncio.to_thread(self.invalidate)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self.backend),
+        }
+
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """
+    Cache bersama untuk proses ini, None jika dimatikan (R_ANSWER_CACHE=off).
+    """
+    global _answer_cache
+    if uconfig.answer_cache_backend == "off":
+        return None
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                if uconfig.answer_cache_backend == "sqlite":
+                    backend = SQLiteBackend(uconfig.answer_cache_path)
+                else:
+                    backend = MemoryBackend(SharedIndexVersion(uconfig.answer_cache_path))
+                _answer_cache = AnswerCache(
+                    backend,
+                    threshold=uconfig.answer_cache_threshold,
+                    ttl=uconfig.answer_cache_ttl,
+                    max_entries=uconfig.answer_cache_size,
+                )
+    return _answer_cache
@@ -1,17 +1,39 @@
 import fastapi as f
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import HTTPException, Request, Depends, UploadFile, File, HTTPException, status
+from fastapi import HTTPException, Request, Depends, UploadFile, File, Form, HTTPException, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
 from config import uconfig
-from supabase import create_client, Client
 from typing import List
+import asyncio
 import base64
 import datetime
+import functools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import jwt
 import magic
-from rag_sermon_summarizer import summarize_sermon 
+from rag_sermon_summarizer import aget_pipeline, asummarize_sermon, asummarize_sermons, astream_sermon, aupdate_conversation_summary, single_flight_stats, SermonSummary
 from typing import Optional
-from rag_store_documents import process_and_add_documents
+from auth import TokenCache, TokenVerifier
+from conversation import ConversationMemory, Turn
+from persistence import PersistenceQueue
+from rag_store_documents import IngestFile, delete_document, get_store, get_text_splitter, process_and_add_documents
+from readiness import Readiness
+import http_pool
+from http_pool import create_supabase_client
+from jobs import IngestJobQueue, JobStore
+from pdf_parsing import shutdown_pdf_pool
+import metrics
+from metrics import flag, span
+from pagination import InvalidCursor, after_cursor, conditional_json, page_limit, split_page, with_limit
+from uploads import SNIFF_BYTES, UploadRejected, spool_upload
 
 #===================================================#
 # Docs: https://supabase.com/docs/reference/python/ #
@@ -20,7 +42,38 @@ from rag_store_documents import process_and_add_documents
 #==============#
 #  GLOBAL VAR  #
 #==============#
-app = f.FastAPI()
+# antrian write-behind untuk chat, history dan chat_reference (lihat persistence.py)
+persistence_queue = PersistenceQueue(
+        workers=uconfig.write_behind_workers,
+        max_retries=uconfig.write_behind_retries,
+        )
+
+# ringkasan percakapan per history untuk pertanyaan lanjutan (lihat conversation.py)
+conversation_memory = ConversationMemory(
+        summarize=aupdate_conversation_summary,
+        max_entries=uconfig.conversation_cache_size,
+        ) if uconfig.conversation_memory else None
+
+# status dependency untuk /ready, klien berat dibuat di background (lihat readiness.py)
+readiness = Readiness()
+
+@asynccontextmanager
+async def lifespan(app: f.FastAPI):
+    await persistence_queue.start()
+    await ingest_jobs.start()
+    if uconfig.warmup:
+        # tidak ditunggu: /health langsung menjawab, /ready menunggu warm-up selesai
+        readiness.start(warm=True)
+    if uconfig.http_keepwarm_interval > 0:
+        readiness.start_keep_warm(uconfig.http_keepwarm_interval)
+    yield
+    await readiness.stop()
+    await ingest_jobs.stop()
+    shutdown_pdf_pool()
+    # pastikan tulisan yang masih antri tersimpan sebelum proses berhenti
+    await persistence_queue.drain(timeout=uconfig.write_behind_drain_timeout)
+
+app = f.FastAPI(lifespan=lifespan)
 # Tambahkan CORS middleware
 origins = [
     "https://hegai.joelmedia.my.id",
@@ -33,19 +86,93 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
-supabase: Client = create_client(
-        uconfig.supabase_url,
-        uconfig.supabase_key,
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """
+    Catat latensi per tahap request ini (lihat metrics.py) dan kirim sebagai header Server-Timing.
+    """
+    timings = metrics.begin_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.record_request(getattr(route, "path", "unmatched"), request.method, time.perf_counter() - start)
+    if timings is not None:
+        response.headers["Server-Timing"] = timings.server_timing()
+    return response
+
+# klien Supabase dibuat saat pertama dipakai (lihat get_supabase), bukan saat import;
+# keduanya berbagi pool koneksi yang sama (lihat http_pool.py)
+_supabase = None
+_supabase_admin = None
+_supabase_lock = threading.Lock()
+
+def get_supabase():
+    """Client with the anon key, used for user-facing queries"""
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                _supabase = create_supabase_client(
+                        uconfig.supabase_url,
+                        uconfig.supabase_key,
+                        )
+    return _supabase
+
+def get_supabase_admin():
+    """Admin client with service role key for admin operations"""
+    global _supabase_admin
+    if _supabase_admin is None:
+        with _supabase_lock:
+            if _supabase_admin is None:
+                _supabase_admin = create_supabase_client(
+                        uconfig.supabase_url,
+                        uconfig.supabase_service_role_key if uconfig.supabase_service_role_key != "na" else uconfig.supabase_key,
+                        )
+    return _supabase_admin
+security = HTTPBearer()
+
+# job ingestion /update-knowledge (lihat jobs.py)
+ingest_jobs = IngestJobQueue(
+        JobStore(uconfig.ingest_jobs_path),
+        runner=lambda files, on_progress: process_and_add_documents(files, get_supabase_admin(), on_progress),
+        spool_dir=uconfig.ingest_spool_dir,
+        workers=uconfig.ingest_workers,
+        lease_seconds=uconfig.ingest_lease_seconds,
         )
 
-# Admin client with service role key for admin operations
-supabase_admin: Client = create_client(
-        uconfig.supabase_url,
-        uconfig.supabase_service_role_key if uconfig.supabase_service_role_key != "na" else uconfig.supabase_key,
+# verifikasi JWT lokal + cache token -> user (lihat auth.py)
+token_verifier = TokenVerifier(
+        uconfig.supabase_jwt_secret if uconfig.supabase_jwt_secret != "na" else None,
+        uconfig.supabase_url if uconfig.supabase_url != "na" else None,
+        TokenCache(ttl=uconfig.auth_cache_ttl, max_size=uconfig.auth_cache_size),
         )
-security = HTTPBearer()
+
+async def _init_supabase():
+    await asyncio.to_thread(get_supabase)
+    await asyncio.to_thread(get_supabase_admin)
+
+async def _warm_supabase():
+    # buka koneksi HTTP ke PostgREST lebih awal
+    await run_query(get_supabase().table("history").select("id").limit(1))
+
+async def _warm_rag():
+    await (await aget_pipeline()).awarm_up()
+
+async def _init_auth():
+    if uconfig.auth_local:
+        await asyncio.to_thread(token_verifier.prefetch_jwks)
+
+async def _init_ingestion():
+    await asyncio.to_thread(get_store)
+    await asyncio.to_thread(get_text_splitter)
+
+readiness.register("supabase", _init_supabase, warm_up=_warm_supabase)
+readiness.register("rag", aget_pipeline, warm_up=_warm_rag)
+readiness.register("ingestion", _init_ingestion)
+readiness.register("auth", _init_auth)
 
 # -*- CALL THIS ON FIRST RUN -*- #
 # import setup
@@ -103,11 +230,11 @@ def check_auth(req: Request) -> str:
     token = auth_header.split("Bearer ")[1]
     return token
 
-async def get_current_user(request: Request):
-    """Dependency to get current authenticated user"""
-    token = check_auth(request)
+async def get_remote_user(token: str):
+    """Validate the token against the Supabase auth server (sees revocations)"""
     try:
-        response = supabase.auth.get_user(jwt=token)
+        with span("auth_remote"):
+            response = await asyncio.to_thread(get_supabase().auth.get_user, jwt=token)
         if response is None:
             raise HTTPException(status_code=400, detail="Invalid JWT Token.")
         return response.user
@@ -116,6 +243,33 @@ async def get_current_user(request: Request):
     except Exception as e:
         raise HTTPException(status_code=401, detail=str(e))
 
+async def get_current_user(request: Request):
+    """Dependency to get current authenticated user (local JWT verification, cached)"""
+    token = check_auth(request)
+    with span("auth"):
+        user = token_verifier.cache.get(token)
+        flag("auth_cache", user is not None)
+        if user is not None:
+            return user
+
+        if uconfig.auth_local:
+            try:
+                # cache miss: verify bisa mengambil JWKS lewat HTTP (sinkron), jangan blok event loop
+                user = await asyncio.to_thread(token_verifier.verify, token)
+            except jwt.InvalidTokenError as e:
+                raise HTTPException(status_code=401, detail=str(e))
+            if user is not None:
+                return user
+
+        user = await get_remote_user(token)
+        token_verifier.cache.put(token, user)
+        return user
+
+async def get_current_user_strict(request: Request):
+    """Dependency for revocation-sensitive routes, always asks the auth server"""
+    token = check_auth(request)
+    return await get_remote_user(token)
+
 # jadi admin    
 # @app.put("/edit-user-to-admin", response_model=bool)
 # def edit_user_to_admin(req: EditUserToAdminRequest, current_user = Depends(get_current_user)):
@@ -153,7 +307,7 @@ async def get_current_user(request: Request):
 @app.post("/login")
 async def login(payload: LoginRequest):
     try:
-        response = supabase.auth.sign_in_with_password({
+        response = get_supabase().auth.sign_in_with_password({
             "email": payload.email,
             "password": payload.password
             })
@@ -166,7 +320,7 @@ async def login(payload: LoginRequest):
 @app.post("/register")
 async def register(payload: RegisterRequest):
     try:
-        response = supabase.auth.sign_up({
+        response = get_supabase().auth.sign_up({
             "email": payload.email,
             "password": payload.password,
             "options": {
@@ -184,14 +338,14 @@ async def register(payload: RegisterRequest):
 
 # NOTE: For now only work on password
 @app.post("/user-edit")
-async def edit_user(payload: EditUserRequest, user = Depends(get_current_user)):
-    response = supabase_admin.auth.admin.update_user_by_id(user.id, {"password": payload.password})
+async def edit_user(payload: EditUserRequest, user = Depends(get_current_user_strict)):
+    response = get_supabase_admin().auth.admin.update_user_by_id(user.id, {"password": payload.password})
     if response.user:
         return {"code": 200, "data": "User password changed successfully."}
     return {"code": 500, "data": "Failed to change user password."}
 
 @app.post("/myself")
-async def myself(user = Depends(get_current_user)):
+async def myself(user = Depends(get_current_user_strict)):
     return {"code": 200, "data": user}
 
 # @app.post("/user-del")
@@ -212,8 +366,9 @@ async def myself(user = Depends(get_current_user)):
 #     except Exception as e:
 #         raise HTTPException(status_code=401, detail=str(e))
 
+# NOTE: Legacy JSON/base64 variant, prefer /file-upload-stream for large files.
 @app.post("/file-upload")
-async def upload_file(payload: UploadPDFRequest, user = Depends(get_current_user)):
+async def upload_file(payload: UploadPDFRequest, user = Depends(get_current_user_strict)):
     is_admin = user.user_metadata.get("is_admin", False)
     if is_admin is False:
         return {"code": 401, "data": "Only admin can upload pdf."}
@@ -222,12 +377,12 @@ async def upload_file(payload: UploadPDFRequest, user = Depends(get_current_user
     decoded_bytes = base64.b64decode(payload.data)
     # decoded_bytes = base64.urlsafe_b64decode(payload.data).decode('utf-8')
 
-    if magic.from_buffer(decoded_bytes, mime=True) != "application/pdf":
+    if magic.from_buffer(decoded_bytes[:SNIFF_BYTES], mime=True) != "application/pdf":
         return {"code": 400, "data": "The uploaded file is not a pdf."}
 
     file_path = f"public/{payload.name}" # assume there is .pdf already.
     file_call = (
-        supabase.storage
+        get_supabase().storage
         .from_("storage")
         .upload(
             file=decoded_bytes,
@@ -237,7 +392,7 @@ async def upload_file(payload: UploadPDFRequest, user = Depends(get_current_user
     )
     try:
         _ = (
-            supabase.table("file")
+            get_supabase().table("file")
             .insert(
                 {"file_path": file_path, "file_name": payload.name, "uploaded_at": datetime.datetime.now(), "indexed": False}
             ).execute()
@@ -247,24 +402,86 @@ async def upload_file(payload: UploadPDFRequest, user = Depends(get_current_user
 
     return {"code": 200, "data": file_call.full_path}
 
+@app.post("/file-upload-stream")
+async def upload_file_stream(
+    file: UploadFile = File(...),
+    name: Optional[str] = Form(None),
+    user = Depends(get_current_user_strict),
+):
+    """
+    Multipart version of /file-upload. The body is streamed to a temp file
+    (sha256 computed on the way, MIME sniffed from the first few KB) and then
+    streamed from disk to Supabase Storage, so memory use does not grow with file size.
+    """
+    is_admin = user.user_metadata.get("is_admin", False)
+    if is_admin is False:
+        return {"code": 401, "data": "Only admin can upload pdf."}
+
+    file_name = os.path.basename(name or file.filename or "")
+    if not file_name:
+        return {"code": 400, "data": "Missing file name."}
+
+    file_path = f"public/{file_name}" # assume there is .pdf already.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            upload = await spool_upload(
+                file,
+                os.path.join(temp_dir, file_name),
+                expected_mime="application/pdf",
+                max_bytes=uconfig.max_upload_bytes,
+            )
+        except UploadRejected as e:
+            return {"code": e.status_code, "data": e.detail}
+
+        # storage3 opens the path and httpx streams it in chunks
+        file_call = await asyncio.to_thread(
+            get_supabase().storage.from_("storage").upload,
+            file=upload.path,
+            path=file_path,
+            file_options={"cache-control": "3600", "upsert": "false", "content-type": "application/pdf"},
+        )
+
+    try:
+        _ = await run_query(
+            get_supabase().table("file")
+            .insert(
+                {"file_path": file_path, "file_name": file_name, "uploaded_at": datetime.datetime.now(), "indexed": False}
+            )
+        )
+    except Exception as e:
+        return {"code": 500, "data": str(e)}
+
+    return {"code": 200, "data": file_call.full_path, "size": upload.size, "sha256": upload.sha256}
+
 
 @app.post("/file-del")
-async def del_file(payload: DeletePDFRequest, user = Depends(get_current_user)):
+async def del_file(payload: DeletePDFRequest, user = Depends(get_current_user_strict)):
     is_admin = user.user_metadata.get("is_admin", False)
     if is_admin is False:
         return {"code": 401, "data": "Only admin can delete user."}
 
     file_path = f"public/{payload.name}" # assume there is .pdf already.
-    file_call = (
-        supabase.storage
+    file_call = await asyncio.to_thread(
+        get_supabase().storage
         .from_("storage")
-        .remove([file_path])
+        .remove,
+        [file_path]
     )
 
-    if len(file_call) <= 0:
+    # also drop the knowledge base copy and its vectors so retrieval stops returning it
+    try:
+        document = await delete_document(payload.name, get_supabase_admin())
+    except Exception as e:
+        return {"code": 500, "data": f"Failed to delete vectors of {payload.name}: {e}"}
+
+    if len(file_call) <= 0 and document is None:
         return {"code": 500, "data": f"Failed to delete file {payload.name}."}
 
-    return {"code": 200, "data": f"File {payload.name} deleted."}
+    return {
+        "code": 200,
+        "data": f"File {payload.name} deleted.",
+        "vectors_removed": document["vectors_removed"] if document else 0,
+    }
 
 # @app.post("/file-get")
 # async def get_file(request: Request):
@@ -288,16 +505,24 @@ async def del_file(payload: DeletePDFRequest, user = Depends(get_current_user)):
 #         raise HTTPException(status_code=401, detail=str(e))
 
 @app.get("/hist-get")
-async def get_hist(user = Depends(get_current_user)):
-    user_id = user.id
+async def get_hist(request: Request, limit: Optional[int] = None, cursor: Optional[str] = None, user = Depends(get_current_user)):
+    """
+    History milik user, terbaru dulu. Halaman berikutnya: kirim `next_cursor` sebagai `cursor`.
+    Tanpa `limit` dan `cursor` semua history dikembalikan.
+    """
+    limit = page_limit(limit, cursor)
     try:
-        response = (
-            supabase.table("history")
-            .select("*")
-            .eq("user_id", user_id)
-            .execute()
+        query = after_cursor(
+            get_supabase().table("history").select("*").eq("user_id", user.id),
+            cursor,
+            descending=True,
         )
-        return {"code": 200, "data": response}
+        with span("history"):
+            response = await run_query(with_limit(query, limit))
+        rows, next_cursor = split_page(response.data, limit)
+        return conditional_json(request, {"code": 200, "data": {"data": rows, "count": response.count}, "next_cursor": next_cursor})
+    except InvalidCursor as e:
+        return {"code": 400, "data": str(e)}
     except Exception as e:
         return {"code": 500, "data": str(e)}
 
@@ -306,7 +531,7 @@ async def del_hist(payload: DeleteHistRequest, user = Depends(get_current_user))
     user_id = user.id
     try:
         _ = (
-            supabase.table("history")
+            get_supabase().table("history")
             .delete()
             .eq("user_id", user_id)
             .eq("id", payload.hist_id)
@@ -320,7 +545,7 @@ async def del_hist(payload: DeleteHistRequest, user = Depends(get_current_user))
 async def create_hist(payload: CreateHistRequest, user = Depends(get_current_user)):
     try:
         response = (
-            supabase.table("history")
+            get_supabase().table("history")
             .insert(
                 {
                     "user_id": user.id,
@@ -339,7 +564,7 @@ async def edit_hist(payload: EditHistRequest, user = Depends(get_current_user)):
     response = None
     try:
         response = (
-            supabase.table("history")
+            get_supabase().table("history")
             .update(
                 {
                     "title": payload.title,
@@ -353,27 +578,33 @@ async def edit_hist(payload: EditHistRequest, user = Depends(get_current_user)):
         return {"code": 500, "data": str(e)}
 
 @app.get("/chat-get")
-async def get_chat(hist_id: int, user = Depends(get_current_user)):
+async def get_chat(request: Request, hist_id: int, limit: Optional[int] = None, cursor: Optional[str] = None, user = Depends(get_current_user)):
+    """
+    Chat dalam satu history, terlama dulu, diurutkan database lewat idx_chat_history_created_at.
+    Cek kepemilikan history dan query chat berjalan paralel; chat dibuang jika history bukan milik user.
+    Tanpa `limit` dan `cursor` seluruh percakapan dikembalikan.
+    """
+    limit = page_limit(limit, cursor)
     try:
-        response = (
-            supabase.table("history")
-            .select("*, chat(*)")
-            .eq("user_id", user.id)
-            .eq("id", hist_id)
-            .execute()
+        chat_query = after_cursor(
+            get_supabase().table("chat").select("*").eq("history_id", hist_id),
+            cursor,
+            descending=False,
         )
+        with span("history"):
+            history, response = await asyncio.gather(
+                run_query(get_supabase().table("history").select("id").eq("user_id", user.id).eq("id", hist_id)),
+                run_query(with_limit(chat_query, limit)),
+            )
 
-        if not response.data:
+        if not history.data:
             return {"code": 404, "data": "History not found or access denied"}
 
-        history_data = response.data[0]
-        chats = sorted(
-            history_data["chat"] or [],
-            key=lambda x: x["created_at"]
-        )
-
-        return {"code": 200, "data": chats}
+        chats, next_cursor = split_page(response.data, limit)
+        return conditional_json(request, {"code": 200, "data": chats, "next_cursor": next_cursor})
 
+    except InvalidCursor as e:
+        return {"code": 400, "data": str(e)}
     except Exception as e:
         return {"code": 500, "data": str(e)}
 
@@ -384,116 +615,271 @@ class ChatRequest(BaseModel):
     message: str
     file_path: Optional[str] = None  # Optional, can be None if no file is attached
 
-@app.post("/chat")
-async def create_chat(request: ChatRequest):
+async def run_query(query):
     """
-    Mengirim pesan baru
+    Jalankan query supabase (sinkron) di thread pool supaya event loop tidak terblokir.
+    """
+    return await asyncio.to_thread(query.execute)
+
+def chat_rows(history_id, message: str, rag_response: SermonSummary) -> list:
+    return [
+        {
+            "history_id": history_id,
+            "role": "user",
+            "content": message,
+        },
+        {
+            "history_id": history_id,
+            "role": "assistant",
+            "content": rag_response.summary,
+        }
+    ]
+
+async def persist_chat(history_id, message: str, rag_response: SermonSummary, state: Optional[dict] = None) -> list:
+    """
+    Simpan pesan user + jawaban assistant, lalu semua referensi sumbernya dalam satu bulk insert.
+    `state` mencatat langkah yang sudah berhasil supaya retry tidak membuat baris ganda.
+    """
+    state = {} if state is None else state
+
+    if "rows" not in state:
+        response = await run_query(get_supabase().table("chat").insert(chat_rows(history_id, message, rag_response)))
+        state["rows"] = response.data
+    rows = state["rows"]
+
+    if rag_response.source_documents and not state.get("references"):
+        await run_query(get_supabase().table("chat_reference").insert([
+            {
+                "chat_id": rows[1]["id"],
+                "reference": doc
+            }
+            for doc in rag_response.source_documents
+        ]))
+        state["references"] = True
+
+    rows[1]["source_documents"] = rag_response.source_documents
+    return rows
+
+def _log_persist_failure(history_id, future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"GAGAL menyimpan referensi chat untuk history {history_id}: {future.exception()}")
+
+async def save_chat(history_id, message: str, rag_response: SermonSummary) -> list:
+    """
+    Baris chat selalu ditunggu supaya id-nya ikut dikembalikan ke klien. Dengan
+    write-behind aktif, hanya referensi sumber (chat_reference) yang diantrikan.
+    """
+    if not uconfig.write_behind:
+        return await persist_chat(history_id, message, rag_response)
+
+    state = {}
+    response = await run_query(get_supabase().table("chat").insert(chat_rows(history_id, message, rag_response)))
+    state["rows"] = response.data
+    rows = [dict(row) for row in state["rows"]]
+    rows[1]["source_documents"] = rag_response.source_documents
+
+    if rag_response.source_documents:
+        # antrian penuh: referensi ditulis langsung, jawaban yang sudah dibuat tidak berubah jadi 500
+        future = await persistence_queue.submit_or_run(
+            functools.partial(persist_chat, history_id, message, rag_response, state)
+        )
+        future.add_done_callback(functools.partial(_log_persist_failure, history_id))
+    return rows
+
+async def resolve_history(request: ChatRequest):
+    """
+    Kembalikan history_id untuk chat ini, buat history baru jika belum ada.
+    None berarti history tidak ditemukan.
     """
     if not request.history_id:
-        try:
-            response = (supabase.table("history").insert(
-                {
-                    "user_id": request.user_id,
-                    "title": request.message,
-                }
-            ).execute())
+        response = await run_query(get_supabase().table("history").insert(
+            {
+                "user_id": request.user_id,
+                "title": request.message,
+            }
+        ))
+        return response.data[0]["id"]
 
-            rag_response = summarize_sermon(request.message)
+    history_check = await run_query(get_supabase().table("history").select("id").eq("id", request.history_id))
 
-            message_to_insert = [
-                {
-                    "history_id": response.data[0]["id"],
-                    "role": "user",
-                    "content": request.message,
-                },
-                {
-                    "history_id": response.data[0]["id"],
-                    "role": "assistant",
-                    "content": rag_response.summary,
-                }
-            ]
+    if history_check.count == 0:
+        return None
+    return request.history_id
 
-            response = supabase.table("chat").insert(message_to_insert).execute()
+async def load_recent_turns(history_id) -> List[Turn]:
+    """
+    Beberapa giliran terakhir dari tabel chat, terlama dulu, untuk membangun ulang ringkasan percakapan.
+    """
+    response = await run_query(
+        get_supabase().table("chat")
+        .select("role, content")
+        .eq("history_id", history_id)
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(uconfig.conversation_rebuild_turns * 2)
+    )
+    turns = []
+    question = None
+    for row in reversed(response.data):
+        if row["role"] == "user":
+            question = row["content"]
+        elif question is not None:
+            turns.append((question, row["content"]))
+            question = None
+    return turns
+
+async def conversation_summary(history_id) -> Optional[str]:
+    """
+    Ringkasan percakapan untuk history yang sudah ada; None untuk chat baru atau jika dimatikan.
+    """
+    if conversation_memory is None or not history_id:
+        return None
+    with span("conversation"):
+        return await conversation_memory.aget(history_id, functools.partial(load_recent_turns, history_id))
 
-            source_documents_to_insert = rag_response.source_documents if rag_response.source_documents else []
+def remember_turn(history_id, message: str, rag_response: SermonSummary):
+    if conversation_memory is not None:
+        conversation_memory.update(history_id, message, rag_response.summary)
 
-            for doc in source_documents_to_insert:
-                supabase.table("chat_reference").insert({
-                    "chat_id": response.data[1]["id"],
-                    "reference": doc
-                }).execute()
+async def answer_chat(request: ChatRequest) -> SermonSummary:
+    return await asummarize_sermon(request.message, conversation=await conversation_summary(request.history_id))
 
-            response.data[1]["source_documents"] = rag_response.source_documents
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
-            return {
-                "code": 200,
-                "data": response.data
-            }
-        except Exception as e:
-            return {"code": 500, "data": str(e)}
-    else:
-        try:
-            history_check = supabase.table("history").select("id").eq("id", request.history_id).execute()
+@app.post("/chat")
+async def create_chat(request: ChatRequest):
+    """
+    Mengirim pesan baru
+    """
+    # chat baru belum punya ringkasan percakapan: pembuatan history dan RAG jalan bersamaan.
+    # History yang sudah ada dicek dulu, supaya ringkasan + rewrite (LLM) tidak
+    # dikerjakan untuk request yang akhirnya ditolak.
+    rag_task = None if request.history_id else asyncio.create_task(answer_chat(request))
+    try:
+        with span("history"):
+            history_id = await resolve_history(request)
+        if history_id is None:
+            return {"code": 404, "data": "History not found or access denied"}
+        if rag_task is None:
+            rag_task = asyncio.create_task(answer_chat(request))
+
+        with span("rag_wait"):
+            rag_response = await rag_task
+
+        with span("persist"):
+            rows = await save_chat(history_id, request.message, rag_response)
+        remember_turn(history_id, request.message, rag_response)
+        return {
+            "code": 200,
+            "data": rows
+        }
+    except Exception as e:
+        if rag_task is not None:
+            rag_task.cancel()
+        return {"code": 500, "data": str(e)}
 
-            if history_check.count == 0:
-                return {"code": 404, "data": "History not found or access denied"}
+@app.post("/chat-stream")
+async def create_chat_stream(request: ChatRequest):
+    """
+    Sama seperti /chat tetapi jawaban dikirim bertahap lewat Server-Sent Events:
+    event `snippet` (featured snippet), `token` (potongan jawaban), `sources`,
+    lalu `done` berisi baris chat yang disimpan (atau `error`).
+    """
+    try:
+        with span("history"):
+            history_id = await resolve_history(request)
+    except Exception as e:
+        return {"code": 500, "data": str(e)}
+    if history_id is None:
+        return {"code": 404, "data": "History not found or access denied"}
 
-            rag_response = summarize_sermon(request.message)
+    async def event_stream():
+        answer = ""
+        try:
+            conversation = await conversation_summary(request.history_id)
+            async for event, data in astream_sermon(request.message, conversation=conversation):
+                if event == "token":
+                    answer += data
+                elif event == "sources":
+                    rag_response = SermonSummary(summary=answer, source_documents=data)
+                yield sse_event(event, data)
+
+            rows = await save_chat(history_id, request.message, rag_response)
+            remember_turn(history_id, request.message, rag_response)
+            yield sse_event("done", {"history_id": history_id, "data": rows})
+        except Exception as e:
+            yield sse_event("error", str(e))
 
-            new_messages = [
-                {
-                    "history_id": request.history_id,
-                    "role": "user",
-                    "content": request.message,
-                },
-                {
-                    "history_id": request.history_id,
-                    "role": "assistant",
-                    "content": rag_response.summary,
-                }
-            ]
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-            response = supabase.table("chat").insert(new_messages).execute()
+class ChatBatchRequest(BaseModel):
+    questions: List[str]
 
-            source_documents_to_insert = rag_response.source_documents if rag_response.source_documents else []
+@app.post("/chat-batch")
+async def create_chat_batch(payload: ChatBatchRequest, user = Depends(get_current_user_strict)):
+    """
+    Jawab banyak pertanyaan dalam satu request (tool admin, generator FAQ), tanpa disimpan ke history.
+    Routing, embedding dan LLM dikerjakan per batch; `data` berurutan sesuai `questions`,
+    berisi summary + source_documents atau `error` per pertanyaan. Hanya untuk admin.
+    """
+    is_admin = user.user_metadata.get("is_admin", False)
+    if is_admin is False:
+        return {"code": 401, "data": "Only admin can run batch questions."}
 
-            for doc in source_documents_to_insert:
-                supabase.table("chat_reference").insert({
-                    "chat_id": response.data[1]["id"],
-                    "reference": doc
-                }).execute()
+    if not payload.questions:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tidak ada pertanyaan.")
+    if len(payload.questions) > uconfig.batch_max_questions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maksimal {uconfig.batch_max_questions} pertanyaan per batch.",
+        )
 
-            response.data[1]["source_documents"] = rag_response.source_documents
+    try:
+        results = await asummarize_sermons(payload.questions)
+    except Exception as e:
+        return {"code": 500, "data": str(e)}
 
-            return {
-                "code": 200,
-                "data": response.data
-            }
-        except Exception as e:
-            return {"code": 500, "data": str(e)}
+    data = []
+    for question, result in zip(payload.questions, results):
+        if isinstance(result, BaseException):
+            data.append({"question": question, "error": str(result)})
+        else:
+            data.append({"question": question, **result.model_dump()})
+    return {"code": 200, "data": data}
 
-@app.post("/update-knowledge", tags=["Knowledge Base"])
+@app.post("/update-knowledge", tags=["Knowledge Base"], status_code=status.HTTP_202_ACCEPTED)
 async def update_knowledge_base(
     files: List[UploadFile] = File(
         ...,
         description="Upload 1 hingga 5 file PDF untuk ditambahkan ke knowledge base.",
         max_items=5
-    )
+    ),
+    user = Depends(get_current_user_strict),
 ):
     """
-    Endpoint ini menangani alur lengkap:
-    1. Menerima file PDF (maksimal 5).
-    2. Mengunggahnya ke Supabase Storage.
-    3. Mengekstrak teks, membuat chunk, dan menghasilkan embedding.
-    4. Menyimpan vektor embedding ke Pinecone.
+    Endpoint ini menerima file PDF (maksimal 5) lalu langsung mengembalikan job_id.
+    Di background, worker akan:
+    1. Mengunggahnya ke Supabase Storage.
+    2. Mengekstrak teks, membuat chunk, dan menghasilkan embedding.
+    3. Menyimpan vektor embedding ke Pinecone.
+    Pantau progresnya lewat GET /jobs/{job_id}. Hanya untuk admin.
     """
+    is_admin = user.user_metadata.get("is_admin", False)
+    if is_admin is False:
+        return {"code": 401, "data": "Only admin can update the knowledge base."}
+
     if not files:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Tidak ada file yang diunggah."
         )
 
-    # Validasi tipe file (hanya izinkan PDF)
+    # Validasi tipe file (hanya izinkan PDF), isi file dicek lagi saat disimpan
     for file in files:
         if file.content_type != 'application/pdf':
             raise HTTPException(
@@ -502,19 +888,78 @@ async def update_knowledge_base(
             )
 
     print(f"Menerima {len(files)} file untuk diproses...")
-    
-    # Panggil fungsi inti untuk melakukan semua pekerjaan berat
-    result = await process_and_add_documents(files, supabase_admin)
 
-    # Kembalikan respons berdasarkan hasil dari prosesor
-    if result["status"] == "error":
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=result["message"]
-        )
-    
-    return result
+    # Simpan file ke spool dir, UploadFile tidak bisa dibaca lagi setelah response dikirim
+    job_id, job_dir = ingest_jobs.new_job_dir()
+    spooled = []
+    for index, file in enumerate(files):
+        filename = os.path.basename(file.filename or "")
+        if not filename:
+            continue
+        try:
+            upload = await spool_upload(
+                file,
+                # prefix index: dua upload bernama sama dalam satu request tidak saling menimpa
+                os.path.join(job_dir, f"{index}_{filename}"),
+                expected_mime="application/pdf",
+                max_bytes=uconfig.max_upload_bytes,
+            )
+        except UploadRejected as e:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        spooled.append(IngestFile(filename=filename, path=upload.path, size=upload.size, sha256=upload.sha256))
+
+    # Pekerjaan berat (upload, parsing, chunking, embedding) dikerjakan worker di background
+    job = ingest_jobs.enqueue(job_id, spooled)
+    return {"status": "queued", "job_id": job_id, "files": [f.filename for f in spooled], "created_at": job["created_at"]}
+
+@app.get("/jobs/{job_id}", tags=["Knowledge Base"])
+async def get_job(job_id: str, user = Depends(get_current_user_strict)):
+    """
+    Status job ingestion: queued, running, done, atau error,
+    beserta tahap, jumlah chunk, dan error per file. Hanya untuk admin.
+    """
+    is_admin = user.user_metadata.get("is_admin", False)
+    if is_admin is False:
+        return {"code": 401, "data": "Only admin can view ingestion jobs."}
+
+    job = ingest_jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job tidak ditemukan.")
+    return IngestJobQueue.public_view(job)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Histogram latensi per tahap, token LLM dan hit/miss cache dalam format Prometheus.
+    """
+    rendered = metrics.render()
+    if rendered is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics dimatikan (R_METRICS=0).")
+    body, content_type = rendered
+    return Response(content=body, media_type=content_type)
 
 @app.get("/health")
 async def health_check():
+    """
+    Liveness: tidak menyentuh dependency apa pun, langsung menjawab sejak proses start.
+    """
     return {"status": "ok"}
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness: status tiap dependency (supabase, rag, ingestion). Jika belum siap,
+    inisialisasi dijalankan di background dan endpoint menjawab 503 sampai semuanya ok.
+    """
+    readiness.start(warm=uconfig.warmup)
+    report = readiness.report()
+    report["persistence_queue"] = persistence_queue.stats()
+    report["http_pools"] = http_pool.stats()
+    if conversation_memory is not None:
+        report["conversation_memory"] = conversation_memory.stats()
+    if uconfig.single_flight:
+        report["single_flight"] = single_flight_stats()
+    if not report["ready"]:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=report)
+    return report
@@ -0,0 +1,139 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import jwt
+from pydantic import BaseModel
+
+#==================================================================#
+# Verifikasi JWT Supabase secara lokal (tanpa round trip ke auth   #
+# server) + cache token -> user dengan TTL dan batas ukuran.       #
+# HS256 diverifikasi dengan JWT secret project, RS256/ES256 dengan #
+# JWKS dari {SUPABASE_URL}/auth/v1/.well-known/jwks.json.          #
+#==================================================================#
+
+SUPABASE_AUDIENCE = "authenticated"
+
+
+class AuthUser(BaseModel):
+    """
+    Subset dari user Supabase yang bisa dibangun dari klaim JWT.
+    Atribut yang dipakai route (id, user_metadata) sama dengan User supabase-py.
+    """
+    id: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    role: Optional[str] = None
+    aud: Optional[str] = None
+    user_metadata: dict = {}
+    app_metadata: dict = {}
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> "AuthUser":
+        return cls(
+            id=claims["sub"],
+            email=claims.get("email"),
+            phone=claims.get("phone"),
+            role=claims.get("role"),
+            aud=claims.get("aud"),
+            user_metadata=claims.get("user_metadata") or {},
+            app_metadata=claims.get("app_metadata") or {},
+        )
+
+
+class TokenCache:
+    """
+    LRU token -> user. Entry kedaluwarsa pada min(TTL, exp token).
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, token: str, user, exp: Optional[float] = None):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        with self._lock:
+            self._entries[self._key(token)] = (expires_at, user)
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class TokenVerifier:
+    def __init__(self, jwt_secret: Optional[str], supabase_url: Optional[str], cache: TokenCache):
+        self.jwt_secret = jwt_secret
+        self.cache = cache
+        self._jwks: Optional[jwt.PyJWKClient] = None
+        if supabase_url:
+            self._jwks = jwt.PyJWKClient(f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json", cache_keys=True)
+
+    def _signing_key(self, token: str):
+        alg = jwt.get_unverified_header(token).get("alg")
+        if alg == "HS256":
+            return self.jwt_secret, alg
+        if alg in ("RS256", "ES256") and self._jwks is not None:
+            try:
+                return self._jwks.get_signing_key_from_jwt(token).key, alg
+            except jwt.PyJWKClientError as e:
+                # JWKS tidak bisa diambil, serahkan ke verifikasi remote
+                print(f"Gagal mengambil JWKS: {e}")
+        return None, alg
+
+    def prefetch_jwks(self):
+        """
+        Ambil JWKS saat startup supaya request pertama tidak menunggu fetch HTTP.
+        """
+        if self._jwks is None:
+            return
+        try:
+            self._jwks.get_signing_keys()
+        except jwt.PyJWKClientError as e:
+            print(f"Gagal mengambil JWKS: {e}")
+
+    def verify(self, token: str) -> Optional[AuthUser]:
+        """
+        Kembalikan user jika token valid. None jika token tidak bisa diverifikasi
+        secara lokal (mis. secret tidak dikonfigurasi), pemanggil harus fallback
+        ke supabase.auth.get_user. Token yang jelas tidak valid -> jwt.InvalidTokenError.
+        """
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
+
+        key, alg = self._signing_key(token)
+        if key is None:
+            return None
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[alg],
+            audience=SUPABASE_AUDIENCE,
+            options={"require": ["exp", "sub"]},
+        )
+        user = AuthUser.from_claims(claims)
+        self.cache.put(token, user, exp=claims["exp"])
+        return user
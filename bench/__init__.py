@@ -0,0 +1,5 @@
+#==============================================================#
+# Benchmark offline. Jalankan dari root repo, contoh:          #
+#   python -m bench.chunking_modes data/*.pdf --fake            #
+#   python -m bench all --output hasil.json                     #
+#==============================================================#
@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+
+from bench.harness import Latencies, setup_offline, synthetic_questions
+
+#=====================================================================#
+# Benchmark /chat dan ingestion tanpa jaringan (lihat harness.py):     #
+#   python -m bench chat --concurrency 1,4,16,64 --requests 64         #
+#   python -m bench ingest --synthetic 20 --pages 12                   #
+#   python -m bench ingest data/*.pdf                                  #
+#   python -m bench all --output hasil.json                            #
+# Hasil berupa JSON; log aplikasi dialihkan ke stderr.                 #
+#=====================================================================#
+
+
+def main(argv=None):
+    defaults = Latencies()
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark offline /chat dan ingestion.")
+    parser.add_argument("target", choices=["chat", "ingest", "all"])
+    parser.add_argument("pdfs", nargs="*", help="PDF untuk benchmark ingestion (butuh unstructured)")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="level concurrency /chat, dipisah koma")
+    parser.add_argument("--requests", type=int, default=64, help="jumlah request /chat per level")
+    parser.add_argument("--corpus-docs", type=int, default=50, help="jumlah khotbah sintetis di index untuk /chat")
+    parser.add_argument("--synthetic", type=int, default=10, help="jumlah file sintetis jika tidak ada PDF")
+    parser.add_argument("--pages", type=int, default=12, help="halaman per file sintetis")
+    parser.add_argument("--ingest-batch", type=int, default=5, help="file per panggilan ingestion (maks /update-knowledge)")
+    parser.add_argument("--answer-cache", action="store_true", help="aktifkan semantic answer cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="direktori untuk index lokal (default: direktori sementara)")
+    parser.add_argument("--output", help="tulis hasil JSON ke file ini")
+    for field, value in defaults.as_dict().items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=float, default=value, help=f"detik (default {value})")
+    args = parser.parse_args(argv)
+
+    latencies = Latencies(**{field: getattr(args, field) for field in defaults.as_dict()})
+    report = {"latencies": latencies.as_dict(), "seed": args.seed}
+
+    with contextlib.redirect_stdout(sys.stderr):
+        offline = setup_offline(latencies, work_dir=args.work_dir, answer_cache=args.answer_cache, seed=args.seed)
+
+        if args.target in ("chat", "all"):
+            from bench.chat_bench import run_chat_bench
+
+            levels = [int(level) for level in args.concurrency.split(",")]
+            questions = synthetic_questions(max(args.requests * len(levels), 100), args.seed)
+            report["corpus_chunks"] = offline.seed_corpus(args.corpus_docs, paragraphs=8, seed=args.seed)
+            report["chat"] = asyncio.run(run_chat_bench(offline, levels, args.requests, questions))
+
+        if args.target in ("ingest", "all"):
+            from bench.ingest_bench import run_ingest_bench, write_synthetic_files
+
+            if args.pdfs:
+                paths, page_latency = args.pdfs, None
+            else:
+                directory = os.path.join(offline.work_dir, "synthetic")
+                paths = write_synthetic_files(directory, args.synthetic, args.pages, args.seed)
+                page_latency = latencies.pdf_page
+            report["ingest"] = asyncio.run(run_ingest_bench(offline, paths, args.ingest_batch, page_latency))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
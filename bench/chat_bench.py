@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import List, Optional
+
+import numpy as np
+
+#=====================================================================#
+# Beban ke /chat lewat ASGI in-process: setiap level concurrency      #
+# menjalankan N request dengan C worker, lalu melaporkan p50/p95/p99  #
+# latensi dan throughput.                                             #
+#=====================================================================#
+
+
+def percentiles(samples: List[float]) -> Optional[dict]:
+    if not samples:
+        return None
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(values.mean()), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+async def _chat_once(client, message: str) -> dict:
+    start = time.perf_counter()
+    response = await client.post("/chat", json={"user_id": "bench-user", "message": message})
+    body = response.json()
+    return {"seconds": time.perf_counter() - start, "ok": body.get("code") == 200}
+
+
+async def run_level(client, messages: List[str], concurrency: int) -> dict:
+    queue: asyncio.Queue = asyncio.Queue()
+    for message in messages:
+        queue.put_nowait(message)
+    results: List[dict] = []
+
+    async def worker():
+        while True:
+            try:
+                message = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results.append(await _chat_once(client, message))
+            except Exception:
+                results.append({"seconds": None, "ok": False})
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["ok"]]
+    report = {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency": percentiles([r["seconds"] for r in ok]),
+    }
+    return report
+
+
+async def run_batch(offline, messages: List[str]) -> dict:
+    """
+    Semua pertanyaan sekaligus lewat asummarize_sermons (jalur /chat-batch tanpa HTTP).
+    """
+    start = time.perf_counter()
+    results = await offline.rag.asummarize_sermons(messages)
+    elapsed = time.perf_counter() - start
+    ok = [r for r in results if not isinstance(r, BaseException)]
+    return {
+        "questions": len(messages),
+        "errors": len(results) - len(ok),
+        "seconds": round(elapsed, 3),
+        "throughput_qps": round(len(ok) / elapsed, 2) if elapsed else None,
+    }
+
+
+async def run_chat_bench(offline, concurrency_levels: List[int], requests: int, messages: List[str], warmup: int = 3) -> dict:
+    """
+    Jalankan semua level concurrency dengan lifespan app aktif (antrian write-behind dll).
+    """
+    import httpx
+
+    app = offline.app
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for message in messages[:warmup]:
+                await _chat_once(client, message)
+
+            levels = []
+            for i, concurrency in enumerate(concurrency_levels):
+                # pertanyaan digeser per level supaya tidak mengulang urutan yang sama persis
+                offset = (i * requests) % len(messages)
+                batch = [messages[(offset + j) % len(messages)] for j in range(requests)]
+                levels.append(await run_level(client, batch, concurrency))
+
+            # pertanyaan yang belum pernah ditanyakan di level mana pun, supaya cache tidak ikut dihitung
+            batch = [f"{messages[j % len(messages)]} (batch {j})" for j in range(requests)]
+            batch_report = await run_batch(offline, batch)
+
+    pipeline = offline.rag.get_pipeline()
+    return {
+        "endpoint": "/chat",
+        "levels": levels,
+        "batch": batch_report,
+        "llm_calls": offline.llm.calls,
+        "embedding_cache": offline.embeddings.stats(),
+        "intent_fast_path": pipeline.intent_classifier.stats(),
+        "speculation": dict(offline.rag.speculation_stats),
+        "single_flight": offline.rag.single_flight_stats(),
+        "context_builder": pipeline.context_builder.stats(),
+    }
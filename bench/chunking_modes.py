@@ -0,0 +1,146 @@
+import argparse
+import json
+import random
+import re
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+
+from bench.fakes import CountingEmbeddings, HashingEmbeddings
+from chunking import CHUNKING_MODES, SENTENCE_SPLIT_RE, SentenceEmbeddingChunker
+
+#=====================================================================#
+# Bandingkan mode chunking (semantic / pooled / fixed):                #
+#   - jumlah request & teks embedding dan waktu untuk chunk + vektor    #
+#   - kualitas retrieval: kalimat acak dari korpus dijadikan query,     #
+#     hit jika salah satu dari top-k chunk memuat kalimat itu           #
+#   - untuk pooled: kemiripan vektor pooled dengan embedding aslinya    #
+#=====================================================================#
+
+
+def load_documents(paths: List[str]) -> List[Document]:
+    """
+    PDF di-parse seperti ingestion; .txt dipecah per paragraf (baris kosong).
+    """
+    documents = []
+    for path in paths:
+        if path.lower().endswith(".pdf"):
+            from pdf_parsing import load_pdf_elements
+
+            documents.extend(load_pdf_elements(path))
+        else:
+            with open(path, encoding="utf-8") as f:
+                for paragraph in re.split(r"\n\s*\n", f.read()):
+                    if paragraph.strip():
+                        documents.append(Document(page_content=paragraph.strip(), metadata={"source": path}))
+    return documents
+
+
+def sample_queries(documents: List[Document], n: int, seed: int) -> List[str]:
+    sentences = set()
+    for doc in documents:
+        for sentence in re.split(SENTENCE_SPLIT_RE, doc.page_content):
+            if len(sentence.split()) >= 5:
+                sentences.add(sentence)
+    sentences = sorted(sentences)
+    random.Random(seed).shuffle(sentences)
+    return sentences[:n]
+
+
+def run_mode(mode: str, documents: List[Document], underlying, queries, query_vectors, k: int) -> dict:
+    embeddings = CountingEmbeddings(underlying)
+    chunker = SentenceEmbeddingChunker(embeddings, mode=mode)
+
+    start = time.perf_counter()
+    chunks = chunker.split_documents(documents)
+    pooled = [chunk for chunk in chunks if chunk.vector is not None]
+    vectors = chunker.embed_missing(chunks)
+    elapsed = time.perf_counter() - start
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    scores = query_vectors @ matrix.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+
+    hits = 0
+    reciprocal_rank = 0.0
+    for query, row in zip(queries, top):
+        for rank, index in enumerate(row):
+            if query in chunks[index].document.page_content:
+                hits += 1
+                reciprocal_rank += 1.0 / (rank + 1)
+                break
+
+    result = {
+        "mode": mode,
+        "chunks": len(chunks),
+        "embedding_calls": embeddings.calls,
+        "embedded_texts": embeddings.texts,
+        "embedded_chars": embeddings.chars,
+        "seconds": round(elapsed, 4),
+        f"recall@{k}": round(hits / len(queries), 4) if queries else None,
+        "mrr": round(reciprocal_rank / len(queries), 4) if queries else None,
+        "chunker": chunker.stats(),
+    }
+
+    # seberapa dekat vektor hasil pooling dengan embedding chunk yang sebenarnya (tidak dihitung di atas)
+    if pooled:
+        true_vectors = np.asarray(underlying.embed_documents([c.document.page_content for c in pooled]), dtype=np.float32)
+        reused = np.asarray([c.vector for c in pooled], dtype=np.float32)
+        true_vectors /= np.maximum(np.linalg.norm(true_vectors, axis=1, keepdims=True), 1e-12)
+        reused /= np.maximum(np.linalg.norm(reused, axis=1, keepdims=True), 1e-12)
+        similarity = np.sum(true_vectors * reused, axis=1)
+        result["reused_vector_similarity"] = {
+            "mean": round(float(similarity.mean()), 4),
+            "min": round(float(similarity.min()), 4),
+        }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark mode chunking ingestion.")
+    parser.add_argument("paths", nargs="+", help="file PDF atau .txt")
+    parser.add_argument("--modes", default=",".join(CHUNKING_MODES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fake", action="store_true", help="pakai HashingEmbeddings, tanpa OpenAI")
+    parser.add_argument("--output", help="tulis hasil JSON ke file ini")
+    args = parser.parse_args(argv)
+
+    if args.fake:
+        underlying = HashingEmbeddings()
+    else:
+        # tanpa cache embedding, supaya setiap mode membayar biaya embedding-nya sendiri
+        from langchain_openai import OpenAIEmbeddings
+        from embeddings import EMBEDDING_MODEL
+
+        underlying = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+
+    documents = load_documents(args.paths)
+    queries = sample_queries(documents, args.queries, args.seed)
+    query_vectors = np.asarray(underlying.embed_documents(queries), dtype=np.float32) if queries else np.zeros((0, 1))
+    if queries:
+        query_vectors /= np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+
+    report = {
+        "documents": len(documents),
+        "queries": len(queries),
+        "embeddings": "fake" if args.fake else "openai",
+        "modes": [
+            run_mode(mode, documents, underlying, queries, query_vectors, args.k)
+            for mode in args.modes.split(",")
+        ],
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import types
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from vector_store import LocalVectorStore
+
+#================================================================#
+# Pengganti layanan eksternal untuk benchmark (tanpa jaringan):  #
+# ChatOpenAI, OpenAIEmbeddings, Pinecone dan Supabase. Semuanya  #
+# deterministik dan bisa diberi latensi buatan (Latency).        #
+#================================================================#
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class Latency:
+    """
+    Latensi buatan: `base` detik dengan jitter +-`jitter` (fraksi), urutan acaknya tetap per seed.
+    """
+
+    def __init__(self, base: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.base = base
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        if self.base <= 0:
+            return 0.0
+        with self._lock:
+            return self.base * (1 + self._rng.uniform(-self.jitter, self.jitter))
+
+    def sleep(self):
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+
+    async def asleep(self):
+        delay = self.sample()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embedding bag-of-words dengan feature hashing: deterministik, tanpa API,
+    dan teks yang kata-katanya mirip tetap berdekatan, jadi angka kualitas
+    retrieval di benchmark masih bermakna (tidak seperti vektor acak).
+    """
+
+    def __init__(self, size: int = 256, latency: Optional[Latency] = None):
+        self.size = size
+        self.latency = latency or Latency()
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in TOKEN_RE.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.size] += 1.0 if (h >> 63) == 0 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.latency.sleep()
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await self.latency.asleep()
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class CountingEmbeddings(Embeddings):
+    """
+    Bungkus Embeddings lain dan hitung jumlah request serta teks yang di-embed.
+    """
+
+    def __init__(self, underlying: Embeddings):
+        self.underlying = underlying
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+        self.chars = 0
+
+    def _count(self, texts: List[str]):
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+            self.chars += sum(len(text) for text in texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._count(texts)
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._count([text])
+        return self.underlying.embed_query(text)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "texts": self.texts, "chars": self.chars}
+
+
+def default_responder(prompt: str) -> str:
+    """
+    Jawaban router berupa JSON, selain itu jawaban RAG dengan featured snippet.
+    """
+    if "AI router" in prompt:
+        user_input = prompt.rsplit("Analisis input berikut:", 1)[-1].strip()
+        return json.dumps({"intent": "topic_summary", "query": user_input})
+    if "PERTANYAAN LANJUTAN:" in prompt:
+        return prompt.rsplit("PERTANYAAN LANJUTAN:", 1)[-1].strip()
+    if "GILIRAN BARU:" in prompt:
+        return " ".join(TOKEN_RE.findall(prompt.rsplit("GILIRAN BARU:", 1)[-1])[:60])
+    words = TOKEN_RE.findall(prompt.split("### KONTEKS", 1)[-1])[:120] or ["kosong"]
+    return (
+        f"<featured-snippet>Ringkasan singkat: {' '.join(words[:20])}.</featured-snippet>\n"
+        + " ".join(words)
+    )
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Pengganti ChatOpenAI. `latency` = waktu sampai token pertama,
+    `token_latency` = jeda antar token saat streaming.
+    """
+
+    latency: Any = None
+    token_latency: float = 0.0
+    responder: Callable[[str], str] = default_responder
+    # jumlah panggilan (generate maupun stream)
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        self.calls += 1
+        return self.responder("\n".join(str(m.content) for m in messages))
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency is not None:
+            self.latency.sleep()
+        text = self._respond(messages)
+        if self.token_latency:
+            time.sleep(self.token_latency * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency is not None:
+            await self.latency.asleep()
+        text = self._respond(messages)
+        if self.token_latency:
+            await asyncio.sleep(self.token_latency * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self.latency is not None:
+            self.latency.sleep()
+        for token in re.findall(r"\S+\s*", self._respond(messages)):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if self.token_latency:
+                time.sleep(self.token_latency)
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency is not None:
+            await self.latency.asleep()
+        for token in re.findall(r"\S+\s*", self._respond(messages)):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+
+
+class LatencyVectorStore(LocalVectorStore):
+    """
+    Pengganti Pinecone: LocalVectorStore + latensi jaringan per query dan per upsert.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings, latency: Optional[Latency] = None, **kwargs: Any):
+        super().__init__(path, embedding, **kwargs)
+        self.latency = latency or Latency()
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any):
+        self.latency.sleep()
+        return super().similarity_search_with_score_by_vector(embedding, k, filter, **kwargs)
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any):
+        await self.latency.asleep()
+        return [doc for doc, _ in super().similarity_search_with_score_by_vector(embedding, k, kwargs.get("filter"))]
+
+    def upsert_embeddings(self, ids, embeddings, documents, batch_size: int = 100):
+        for _ in range(0, len(ids), batch_size):
+            self.latency.sleep()
+        super().upsert_embeddings(ids, embeddings, documents, batch_size)
+
+
+class _Response:
+    def __init__(self, data: List[dict]):
+        self.data = data
+        self.count = len(data)
+
+
+class _Query:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload: Any = None
+        self.filters: List[Callable[[dict], bool]] = []
+        self.limit_count: Optional[int] = None
+        self.order_key: Optional[str] = None
+        self.order_desc = False
+
+    def select(self, *args: Any, **kwargs: Any) -> "_Query":
+        return self
+
+    def insert(self, payload: Any, **kwargs: Any) -> "_Query":
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload: Any, **kwargs: Any) -> "_Query":
+        return self.insert(payload)
+
+    def update(self, payload: dict) -> "_Query":
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self) -> "_Query":
+        self.op = "delete"
+        return self
+
+    def eq(self, key: str, value: Any) -> "_Query":
+        self.filters.append(lambda row: str(row.get(key)) == str(value))
+        return self
+
+    def in_(self, key: str, values: List[Any]) -> "_Query":
+        allowed = {str(v) for v in values}
+        self.filters.append(lambda row: str(row.get(key)) in allowed)
+        return self
+
+    def lt(self, key: str, value: Any) -> "_Query":
+        self.filters.append(lambda row: row.get(key) is not None and row.get(key) < value)
+        return self
+
+    def gt(self, key: str, value: Any) -> "_Query":
+        self.filters.append(lambda row: row.get(key) is not None and row.get(key) > value)
+        return self
+
+    def order(self, key: str, desc: bool = False, **kwargs: Any) -> "_Query":
+        self.order_key, self.order_desc = key, desc
+        return self
+
+    def limit(self, count: int, **kwargs: Any) -> "_Query":
+        self.limit_count = count
+        return self
+
+    def execute(self) -> _Response:
+        self.db.latency.sleep()
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table, [])
+            if self.op == "insert":
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                inserted = []
+                for row in payload:
+                    row = dict(row)
+                    row.setdefault("id", next(self.db.ids))
+                    row.setdefault("created_at", time.time())
+                    rows.append(row)
+                    inserted.append(dict(row))
+                return _Response(inserted)
+
+            matched = [row for row in rows if all(f(row) for f in self.filters)]
+            if self.op == "update":
+                for row in matched:
+                    row.update(self.payload)
+            elif self.op == "delete":
+                for row in matched:
+                    rows.remove(row)
+            if self.order_key:
+                matched.sort(key=lambda row: row.get(self.order_key) or 0, reverse=self.order_desc)
+            if self.limit_count is not None:
+                matched = matched[:self.limit_count]
+            return _Response([dict(row) for row in matched])
+
+
+class _Bucket:
+    def __init__(self, db: "FakeSupabase", name: str):
+        self.db = db
+        self.name = name
+
+    def upload(self, path: str, file: Any, file_options: Optional[dict] = None):
+        self.db.latency.sleep()
+        if isinstance(file, str):
+            with open(file, "rb") as f:
+                data = f.read()
+        else:
+            data = file.read() if hasattr(file, "read") else bytes(file)
+        self.db.objects[(self.name, path)] = data
+        return types.SimpleNamespace(path=path, full_path=f"{self.name}/{path}")
+
+    def download(self, path: str) -> bytes:
+        self.db.latency.sleep()
+        return self.db.objects[(self.name, path)]
+
+    def get_public_url(self, path: str) -> str:
+        return f"http://storage.local/{self.name}/{path}"
+
+    def remove(self, paths: List[str]) -> List[dict]:
+        self.db.latency.sleep()
+        removed = []
+        for path in paths:
+            if self.db.objects.pop((self.name, path), None) is not None:
+                removed.append({"name": path})
+        return removed
+
+    def list(self, path: Optional[str] = None, options: Optional[dict] = None) -> List[dict]:
+        self.db.latency.sleep()
+        prefix = f"{path}/" if path else ""
+        names = sorted(p[len(prefix):] for (bucket, p) in self.db.objects if bucket == self.name and p.startswith(prefix))
+        offset = (options or {}).get("offset", 0)
+        limit = (options or {}).get("limit", len(names))
+        return [{"name": name} for name in names[offset:offset + limit]]
+
+
+class FakeSupabase:
+    """
+    Pengganti supabase Client: tabel di memori dan storage bucket, dengan latensi per request.
+    """
+
+    def __init__(self, latency: Optional[Latency] = None):
+        self.latency = latency or Latency()
+        self.tables: Dict[str, List[dict]] = {}
+        self.objects: Dict[tuple, bytes] = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.storage = types.SimpleNamespace(from_=lambda name: _Bucket(self, name))
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
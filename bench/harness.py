@@ -0,0 +1,186 @@
+import os
+import random
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+#=====================================================================#
+# Menyiapkan app.py untuk benchmark tanpa jaringan: env diatur dulu   #
+# (config.py membaca env saat di-import), lalu singleton embedding,    #
+# vector store, klien Supabase dan rantai LLM diganti dengan fake dari #
+# bench/fakes.py. Kode aplikasi sendiri (routing, retrieval, konteks,  #
+# penyimpanan chat, ingestion) tetap yang asli.                        #
+#=====================================================================#
+
+WORDS = """
+kasih iman pengharapan anugerah pengampunan doa pertobatan keselamatan salib kebangkitan roh kudus
+gereja jemaat pelayanan persekutuan firman injil murid hikmat kerendahan hati kesetiaan sukacita damai
+sejahtera kesabaran pencobaan penderitaan berkat janji perjanjian korban syukur pujian penyembahan
+kerajaan sorga terang garam gembala domba ladang benih penabur anak hilang bapa daud goliat musa
+abraham yusuf rut ester paulus petrus yohanes maria yesus kristus allah tuhan umat bangsa israel
+""".split()
+
+BOOKS = ["Yohanes", "Matius", "Markus", "Lukas", "Roma", "Mazmur", "Amsal", "Yesaya", "Kejadian", "Efesus"]
+
+
+@dataclass
+class Latencies:
+    """
+    Latensi buatan per panggilan (detik), kira-kira seperti layanan aslinya.
+    """
+    llm_first_token: float = 0.35
+    llm_token: float = 0.0
+    embedding: float = 0.05
+    vector_query: float = 0.04
+    supabase: float = 0.03
+    pdf_page: float = 0.02
+    jitter: float = 0.25
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def synthetic_sermon(rng: random.Random, paragraphs: int = 6, sentences: int = 5) -> List[str]:
+    """
+    Paragraf khotbah sintetis (deterministik per rng), sesekali berisi referensi ayat.
+    """
+    result = []
+    for _ in range(paragraphs):
+        parts = []
+        for _ in range(sentences):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize()
+            if rng.random() < 0.3:
+                sentence += f" seperti tertulis dalam {rng.choice(BOOKS)} {rng.randint(1, 20)}:{rng.randint(1, 30)}"
+            parts.append(sentence + ".")
+        result.append(" ".join(parts))
+    return result
+
+
+def synthetic_questions(n: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    templates = [
+        "Tolong ringkaskan khotbah tentang {a} dan {b}",
+        "Apa kata khotbah mengenai {a}?",
+        "Jelaskan hubungan {a} dengan {b} menurut khotbah",
+        "Ringkasan {a} dalam {book} {chapter}:{verse}",
+    ]
+    return [
+        rng.choice(templates).format(
+            a=rng.choice(WORDS), b=rng.choice(WORDS), book=rng.choice(BOOKS),
+            chapter=rng.randint(1, 20), verse=rng.randint(1, 30),
+        )
+        for _ in range(n)
+    ]
+
+
+class OfflineApp:
+    """
+    Hasil setup_offline: modul app dan fake yang terpasang.
+    """
+
+    def __init__(self, app_module, rag_module, store_module, embeddings, llm, vectorstore, db, work_dir: str):
+        self.app_module = app_module
+        self.app = app_module.app
+        self.rag = rag_module
+        self.store = store_module
+        self.embeddings = embeddings
+        self.llm = llm
+        self.vectorstore = vectorstore
+        self.db = db
+        self.work_dir = work_dir
+
+    def seed_corpus(self, documents: int, paragraphs: int, seed: int) -> int:
+        """
+        Isi vector store dan index leksikal lewat jalur upsert ingestion, kembalikan jumlah chunk.
+        """
+        from langchain_core.documents import Document
+
+        from chunking import Chunk
+
+        rng = random.Random(seed)
+        chunks, ids = [], []
+        for doc_id in range(1, documents + 1):
+            source = f"http://storage.local/bench/sermon-{doc_id}.pdf"
+            for page, text in enumerate(synthetic_sermon(rng, paragraphs), start=1):
+                metadata = {"source": source, "doc_id": doc_id, "filename": f"sermon-{doc_id}.pdf", "page_number": page}
+                chunks.append(Chunk(Document(page_content=text, metadata=metadata)))
+                ids.append(self.store.chunk_id(doc_id, text))
+        self.store.upsert_chunks(chunks, ids, batch_size=100)
+        return len(chunks)
+
+
+_offline: Optional[OfflineApp] = None
+
+
+def setup_offline(latencies: Latencies, work_dir: Optional[str] = None, answer_cache: bool = False, seed: int = 0) -> OfflineApp:
+    """
+    Import app.py dengan semua layanan eksternal diganti fake. Hanya bisa sekali per proses.
+    """
+    global _offline
+    if _offline is not None:
+        return _offline
+
+    work_dir = work_dir or tempfile.mkdtemp(prefix="r1-bench-")
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-bench",
+        "PINECONE_API_KEY": "bench",
+        "R_SUPABASE_URL": "http://localhost:54321",
+        "R_SUPABASE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench",
+        "R_SUPABASE_SERVICE_ROLE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench",
+        "R_VECTOR_BACKEND": "local",
+        "R_LOCAL_VECTOR_DIR": os.path.join(work_dir, "vector_store"),
+        "R_LEXICAL_INDEX_PATH": os.path.join(work_dir, "lexical_index.sqlite3"),
+        "R_INGEST_JOBS_PATH": os.path.join(work_dir, "ingest_jobs.sqlite3"),
+        "R_INGEST_SPOOL_DIR": os.path.join(work_dir, "spool"),
+        "R_ANSWER_CACHE_PATH": os.path.join(work_dir, "answer_cache.sqlite3"),
+        "R_EMBED_CACHE_PATH": "",
+        "R_WARMUP": "0",
+        "R_ANSWER_CACHE": os.environ.get("R_ANSWER_CACHE", "memory") if answer_cache else "off",
+    })
+
+    # import setelah env diatur
+    import embeddings as embeddings_module
+    import vector_store as vector_store_module
+    from bench.fakes import FakeChatModel, FakeSupabase, HashingEmbeddings, Latency, LatencyVectorStore
+    from config import uconfig
+
+    def latency(base: float, offset: int) -> Latency:
+        return Latency(base, latencies.jitter, seed=seed + offset)
+
+    embeddings = embeddings_module.CachedEmbeddings(
+        HashingEmbeddings(latency=latency(latencies.embedding, 1)),
+        namespace="bench",
+        memory_size=uconfig.embed_cache_size,
+    )
+    embeddings_module._embeddings = embeddings
+    vectorstore = LatencyVectorStore(
+        uconfig.local_vector_dir, embeddings, latency=latency(latencies.vector_query, 2), dtype=uconfig.local_vector_dtype
+    )
+    vector_store_module._vectorstore = vectorstore
+
+    import app as app_module
+    import rag_sermon_summarizer as rag
+    import rag_store_documents as store
+    from langchain.chains import RetrievalQA
+    from langchain_core.output_parsers import StrOutputParser
+
+    db = FakeSupabase(latency=latency(latencies.supabase, 3))
+    app_module._supabase = db
+    app_module._supabase_admin = db
+
+    llm = FakeChatModel(latency=latency(latencies.llm_first_token, 4), token_latency=latencies.llm_token)
+    pipeline = rag.get_pipeline()
+    pipeline.router_chain = pipeline.prompt_router | llm | pipeline.json_parser
+    pipeline.stream_chain = pipeline.rag_prompt | llm
+    pipeline.rewrite_chain = pipeline.prompt_rewrite | llm | StrOutputParser()
+    pipeline.conversation_summary_chain = pipeline.prompt_conversation_summary | llm | StrOutputParser()
+    pipeline.rag_chain = RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",
+        retriever=pipeline.retriever,
+        return_source_documents=True,
+        chain_type_kwargs={"prompt": pipeline.rag_prompt},
+    )
+
+    _offline = OfflineApp(app_module, rag, store, embeddings, llm, vectorstore, db, work_dir)
+    return _offline
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import random
+import time
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from bench.harness import synthetic_sermon
+
+#=====================================================================#
+# Throughput ingestion (process_and_add_documents): halaman/detik dan  #
+# chunk/detik. Dengan PDF asli parsing memakai unstructured seperti    #
+# produksi; tanpa PDF (atau tanpa unstructured) dipakai file sintetis  #
+# yang "diparse" dengan latensi per halaman.                           #
+#=====================================================================#
+
+PAGE_BREAK = "\f"
+
+
+def write_synthetic_files(directory: str, files: int, pages: int, seed: int) -> List[str]:
+    """
+    File teks dengan halaman dipisah form feed, satu paragraf khotbah per halaman.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f"synthetic-{seed}-{i}.pdf")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(PAGE_BREAK.join(synthetic_sermon(rng, paragraphs=pages)))
+        paths.append(path)
+    return paths
+
+
+def make_synthetic_loader(page_latency: float):
+    """
+    Pengganti aload_pdf untuk file sintetis: satu elemen per halaman, parsing disimulasikan
+    dengan sleep di thread (seperti process pool, event loop tetap bebas).
+    """
+    async def aload_synthetic(path: str) -> List[Document]:
+        with open(path, encoding="utf-8") as f:
+            pages = f.read().split(PAGE_BREAK)
+        await asyncio.to_thread(time.sleep, page_latency * len(pages))
+        return [
+            Document(page_content=text, metadata={"page_number": number, "filename": os.path.basename(path)})
+            for number, text in enumerate(pages, start=1)
+        ]
+
+    return aload_synthetic
+
+
+async def run_ingest_bench(offline, paths: List[str], batch_size: int, page_latency: Optional[float] = None) -> dict:
+    """
+    Ingest `paths` per batch seperti /update-knowledge. `page_latency` berarti file sintetis.
+    """
+    from rag_store_documents import IngestFile
+
+    store = offline.store
+    original_loader = store.aload_pdf
+    loader = make_synthetic_loader(page_latency) if page_latency is not None else original_loader
+    pages = 0
+
+    async def counting_loader(path: str) -> List[Document]:
+        nonlocal pages
+        documents = await loader(path)
+        pages += len({doc.metadata.get("page_number") for doc in documents}) or 1
+        return documents
+
+    store.aload_pdf = counting_loader
+    chunks = 0
+    failed = 0
+    start = time.perf_counter()
+    try:
+        for i in range(0, len(paths), batch_size):
+            files = [
+                IngestFile(filename=os.path.basename(path), path=path, size=os.path.getsize(path))
+                for path in paths[i:i + batch_size]
+            ]
+            result = await store.process_and_add_documents(files, offline.db)
+            if result.get("status") != "success":
+                failed += len(files)
+            chunks += result.get("chunks_added", 0)
+    finally:
+        store.aload_pdf = original_loader
+    elapsed = time.perf_counter() - start
+
+    return {
+        "source": "synthetic" if page_latency is not None else "pdf",
+        "files": len(paths),
+        "files_failed": failed,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else None,
+        "chunks_per_second": round(chunks / elapsed, 2) if elapsed else None,
+        "embedding_cache": offline.embeddings.stats(),
+    }
@@ -0,0 +1,148 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+#======================================================================#
+# Chunking untuk ingestion.                                            #
+# SemanticChunker meng-embed setiap (gabungan) kalimat untuk mencari   #
+# breakpoint, lalu vectorstore.add_documents meng-embed setiap chunk   #
+# lagi. Di sini embedding kalimat disimpan dan dipakai ulang:          #
+#   - "semantic": perilaku lama, chunk di-embed ulang saat disimpan     #
+#   - "pooled":   vektor chunk diambil dari embedding kalimat (persis   #
+#                 jika teksnya sama, atau rata-rata); chunk hanya        #
+#                 di-embed ulang jika kalimatnya terlalu menyebar        #
+#   - "fixed":    RecursiveCharacterTextSplitter, tanpa embedding       #
+#======================================================================#
+
+CHUNKING_MODES = ("semantic", "pooled", "fixed")
+
+# sama dengan default SemanticChunker
+SENTENCE_SPLIT_RE = r"(?<=[.?!])\s+"
+BUFFER_SIZE = 1
+BREAKPOINT_PERCENTILE = 95.0
+
+
+@dataclass
+class Chunk:
+    document: Document
+    # None berarti vektor belum ada dan harus di-embed saat disimpan
+    vector: Optional[List[float]] = None
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SentenceEmbeddingChunker:
+    def __init__(self, embeddings: Embeddings, mode: str = "pooled", reembed_below: float = 0.85):
+        if mode not in CHUNKING_MODES:
+            raise ValueError(f"Mode chunking tidak dikenal: {mode}")
+        self.embeddings = embeddings
+        self.mode = mode
+        self.reembed_below = reembed_below
+        self.fixed_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=250,
+            chunk_overlap=75,
+            length_function=len,
+            is_separator_regex=False,
+        )
+        self.exact_chunks = 0
+        self.pooled_chunks = 0
+        self.reembedded_chunks = 0
+
+    def _split_text(self, text: str):
+        """
+        Algoritma SemanticChunker (percentile, buffer 1) yang juga mengembalikan
+        vektor setiap gabungan kalimat.
+        Kembalikan list (teks chunk, matriks vektor, vektor persis atau None).
+        """
+        sentences = re.split(SENTENCE_SPLIT_RE, text)
+        sentences = [s for s in sentences if s]
+        if not sentences:
+            return []
+
+        combined = []
+        for i in range(len(sentences)):
+            lo = max(0, i - BUFFER_SIZE)
+            hi = min(len(sentences), i + 1 + BUFFER_SIZE)
+            combined.append(" ".join(sentences[lo:hi]))
+        vectors = _normalize_rows(np.asarray(self.embeddings.embed_documents(combined), dtype=np.float32))
+        by_text = dict(zip(combined, vectors))
+
+        if len(sentences) == 1:
+            return [(sentences[0], vectors, vectors[0])]
+
+        distances = 1.0 - np.sum(vectors[:-1] * vectors[1:], axis=1)
+        threshold = np.percentile(distances, BREAKPOINT_PERCENTILE)
+        breakpoints = [i for i, d in enumerate(distances) if d > threshold]
+
+        bounds = []
+        start = 0
+        for index in breakpoints:
+            bounds.append((start, index + 1))
+            start = index + 1
+        if start < len(sentences):
+            bounds.append((start, len(sentences)))
+
+        groups = []
+        for start, end in bounds:
+            text = " ".join(sentences[start:end])
+            # chunk pendek sering sama persis dengan salah satu gabungan kalimat
+            groups.append((text, vectors[start:end], by_text.get(text)))
+        return groups
+
+    def split_documents(self, documents: List[Document]) -> List[Chunk]:
+        # statistik berlaku untuk pemanggilan terakhir
+        self.exact_chunks = self.pooled_chunks = self.reembedded_chunks = 0
+        if self.mode == "fixed":
+            return [Chunk(doc) for doc in self.fixed_splitter.split_documents(documents)]
+
+        chunks: List[Chunk] = []
+        for document in documents:
+            for text, vectors, exact in self._split_text(document.page_content):
+                doc = Document(page_content=text, metadata=dict(document.metadata))
+                if self.mode == "semantic":
+                    chunks.append(Chunk(doc))
+                    continue
+
+                if exact is not None:
+                    self.exact_chunks += 1
+                    chunks.append(Chunk(doc, exact.tolist()))
+                    continue
+
+                pooled = vectors.mean(axis=0)
+                pooled /= np.linalg.norm(pooled) or 1.0
+                # rata-rata hanya mewakili chunk jika semua kalimatnya dekat ke pusatnya
+                if float(np.min(vectors @ pooled)) < self.reembed_below:
+                    self.reembedded_chunks += 1
+                    chunks.append(Chunk(doc))
+                else:
+                    self.pooled_chunks += 1
+                    chunks.append(Chunk(doc, pooled.tolist()))
+        return chunks
+
+    def embed_missing(self, chunks: List[Chunk]) -> List[List[float]]:
+        """
+        Lengkapi vektor chunk yang belum punya vektor dalam satu batch embedding.
+        """
+        missing = [chunk for chunk in chunks if chunk.vector is None]
+        if missing:
+            vectors = self.embeddings.embed_documents([chunk.document.page_content for chunk in missing])
+            for chunk, vector in zip(missing, vectors):
+                chunk.vector = vector
+        return [chunk.vector for chunk in chunks]
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "exact": self.exact_chunks,
+            "pooled": self.pooled_chunks,
+            "reembedded": self.reembedded_chunks,
+        }
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,9 +9,114 @@ class Configuration:
         self.supabase_url = os.getenv("R_SUPABASE_URL", "na")
         self.supabase_key = os.getenv("R_SUPABASE_KEY", "na")
         self.supabase_service_role_key = os.getenv("R_SUPABASE_SERVICE_ROLE_KEY", "na")
+        self.supabase_jwt_secret = os.getenv("R_SUPABASE_JWT_SECRET", "na")
         self.secret_key = os.getenv("R_KEY", "default_secret")
         self.url = os.getenv("R_IP", "0.0.0.0")
         self.port = int(os.getenv("R_PORT", "8000"))
         self.email = os.getenv("R_EMAIL", "")
 
+        # verifikasi JWT lokal + cache token -> user
+        self.auth_local = os.getenv("R_AUTH_LOCAL", "1") == "1"
+        self.auth_cache_ttl = float(os.getenv("R_AUTH_CACHE_TTL", "60"))
+        self.auth_cache_size = int(os.getenv("R_AUTH_CACHE_SIZE", "10000"))
+
+        # write-behind untuk penyimpanan chat
+        self.write_behind = os.getenv("R_WRITE_BEHIND", "1") == "1"
+        self.write_behind_workers = int(os.getenv("R_WRITE_BEHIND_WORKERS", "2"))
+        self.write_behind_retries = int(os.getenv("R_WRITE_BEHIND_RETRIES", "3"))
+        self.write_behind_drain_timeout = float(os.getenv("R_WRITE_BEHIND_DRAIN_TIMEOUT", "30"))
+
+        # batas ukuran file upload
+        self.max_upload_bytes = int(os.getenv("R_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+        # job ingestion /update-knowledge
+        self.ingest_workers = int(os.getenv("R_INGEST_WORKERS", "1"))
+        self.ingest_jobs_path = os.getenv("R_INGEST_JOBS_PATH", "ingest_jobs.sqlite3")
+        self.ingest_spool_dir = os.getenv("R_INGEST_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "r1-ingest")
+        # job yang lease-nya tidak diperpanjang selama ini dianggap yatim dan diantrikan ulang
+        self.ingest_lease_seconds = float(os.getenv("R_INGEST_LEASE_SECONDS", "60"))
+
+        # parsing PDF di process pool (0 = di thread)
+        self.pdf_workers = int(os.getenv("R_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.pdf_timeout = float(os.getenv("R_PDF_TIMEOUT", "300"))
+
+        # cache embedding bersama (memori + sqlite, kosongkan path untuk mematikan disk)
+        self.embed_cache_size = int(os.getenv("R_EMBED_CACHE_SIZE", "20000"))
+        self.embed_cache_path = os.getenv("R_EMBED_CACHE_PATH", "embeddings_cache.sqlite3")
+
+        # vector store: pinecone | local (lihat vector_store.py)
+        self.vector_backend = os.getenv("R_VECTOR_BACKEND", "pinecone")
+        self.local_vector_dir = os.getenv("R_LOCAL_VECTOR_DIR", "vector_store")
+        self.local_vector_dtype = os.getenv("R_LOCAL_VECTOR_DTYPE", "float16")
+
+        # retriever: dense | hybrid (dense + BM25 lokal, lihat hybrid_retrieval.py)
+        self.retriever_mode = os.getenv("R_RETRIEVER_MODE", "dense")
+        self.lexical_index_path = os.getenv("R_LEXICAL_INDEX_PATH", "lexical_index.sqlite3")
+        self.hybrid_fetch_k = int(os.getenv("R_HYBRID_FETCH_K", "20"))
+        self.rrf_k = int(os.getenv("R_RRF_K", "60"))
+
+        # penyusunan konteks prompt: kandidat retrieval, batas token, MMR, ambang duplikat
+        self.context_candidates = int(os.getenv("R_CONTEXT_CANDIDATES", "10"))
+        self.context_token_budget = int(os.getenv("R_CONTEXT_TOKEN_BUDGET", "1500"))
+        self.context_max_chunks = int(os.getenv("R_CONTEXT_MAX_CHUNKS", "5"))
+        self.context_mmr_lambda = float(os.getenv("R_CONTEXT_MMR_LAMBDA", "0.7"))
+        self.context_duplicate_threshold = float(os.getenv("R_CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+
+        # chunking ingestion: pooled | semantic | fixed (lihat chunking.py)
+        self.chunking_mode = os.getenv("R_CHUNKING_MODE", "pooled")
+        self.chunk_reembed_below = float(os.getenv("R_CHUNK_REEMBED_BELOW", "0.85"))
+
+        # semantic answer cache: memory | sqlite | off
+        self.answer_cache_backend = os.getenv("R_ANSWER_CACHE", "memory")
+        self.answer_cache_path = os.getenv("R_ANSWER_CACHE_PATH", "answer_cache.sqlite3")
+        self.answer_cache_threshold = float(os.getenv("R_ANSWER_CACHE_THRESHOLD", "0.95"))
+        self.answer_cache_ttl = float(os.getenv("R_ANSWER_CACHE_TTL", "86400"))
+        self.answer_cache_size = int(os.getenv("R_ANSWER_CACHE_SIZE", "1000"))
+
+        # local intent fast-path sebelum router LLM
+        self.intent_fast_path = os.getenv("R_INTENT_FAST_PATH", "1") == "1"
+        self.intent_fast_threshold = float(os.getenv("R_INTENT_FAST_THRESHOLD", "0.15"))
+
+        # retrieval spekulatif atas input mentah, paralel dengan routing
+        self.speculative_retrieval = os.getenv("R_SPECULATIVE_RETRIEVAL", "1") == "1"
+        self.speculative_min_similarity = float(os.getenv("R_SPECULATIVE_MIN_SIMILARITY", "0.8"))
+
+        # latensi per tahap: histogram Prometheus di /metrics dan header Server-Timing
+        self.metrics_enabled = os.getenv("R_METRICS", "1") == "1"
+        self.server_timing = os.getenv("R_SERVER_TIMING", "1") == "1"
+
+        # pool koneksi HTTP bersama untuk OpenAI, Supabase dan Pinecone (lihat http_pool.py)
+        self.http2 = os.getenv("R_HTTP2", "1") == "1"
+        self.http_max_connections = int(os.getenv("R_HTTP_MAX_CONNECTIONS", "100"))
+        self.http_max_keepalive = int(os.getenv("R_HTTP_MAX_KEEPALIVE", "20"))
+        self.http_keepalive_expiry = float(os.getenv("R_HTTP_KEEPALIVE_EXPIRY", "120"))
+        self.http_timeout = float(os.getenv("R_HTTP_TIMEOUT", "60"))
+        self.pinecone_pool_size = int(os.getenv("R_PINECONE_POOL_SIZE", "20"))
+        # ulangi warm-up tiap N detik supaya koneksi idle tetap hidup (0 = mati)
+        self.http_keepwarm_interval = float(os.getenv("R_HTTP_KEEPWARM_INTERVAL", "0"))
+
+        # ukuran halaman /hist-get dan /chat-get jika klien memakai limit/cursor (lihat pagination.py)
+        self.page_size = int(os.getenv("R_PAGE_SIZE", "50"))
+        self.page_size_max = int(os.getenv("R_PAGE_SIZE_MAX", "200"))
+        # encode JSON dengan orjson jika terpasang
+        self.fast_json = os.getenv("R_FAST_JSON", "1") == "1"
+
+        # ringkasan percakapan bergulir untuk pertanyaan lanjutan (lihat conversation.py)
+        self.conversation_memory = os.getenv("R_CONVERSATION_MEMORY", "1") == "1"
+        self.conversation_summary_tokens = int(os.getenv("R_CONVERSATION_SUMMARY_TOKENS", "300"))
+        self.conversation_turn_tokens = int(os.getenv("R_CONVERSATION_TURN_TOKENS", "300"))
+        self.conversation_rebuild_turns = int(os.getenv("R_CONVERSATION_REBUILD_TURNS", "3"))
+        self.conversation_cache_size = int(os.getenv("R_CONVERSATION_CACHE_SIZE", "10000"))
+
+        # request identik yang bersamaan berbagi satu komputasi RAG (lihat singleflight.py)
+        self.single_flight = os.getenv("R_SINGLE_FLIGHT", "1") == "1"
+
+        # /chat-batch: jumlah pertanyaan per request dan batas concurrency per tahap
+        self.batch_max_questions = int(os.getenv("R_BATCH_MAX_QUESTIONS", "100"))
+        self.batch_llm_concurrency = int(os.getenv("R_BATCH_LLM_CONCURRENCY", "8"))
+        self.batch_retrieval_concurrency = int(os.getenv("R_BATCH_RETRIEVAL_CONCURRENCY", "16"))
+
+        # warm-up saat startup: buat klien & rantai di background dan buka koneksinya
+        self.warmup = os.getenv("R_WARMUP", "1") == "1"
+
 uconfig = Configuration()
@@ -0,0 +1,156 @@
+import threading
+from typing import Callable, List, Optional, Set
+
+from langchain_core.documents import Document
+
+from lexical_index import tokenize
+
+#=====================================================================#
+# Menyusun KONTEKS untuk RAG_PROMPT dari kandidat hasil retrieval:     #
+#   1. buang chunk yang hampir sama (Jaccard token >= ambang)          #
+#   2. pilih dengan MMR: relevansi (urutan retrieval) vs kemiripan      #
+#      dengan chunk yang sudah dipilih                                  #
+#   3. isi sampai batas token (tokenizer lokal tiktoken)               #
+# Kemiripan dihitung dari token leksikal, jadi tidak ada panggilan     #
+# embedding tambahan per query.                                        #
+#=====================================================================#
+
+TOKENIZER_MODEL = "gpt-4o-mini"
+
+_encoder = None
+_encoder_lock = threading.Lock()
+_encoder_failed = False
+
+
+def _get_encoder():
+    global _encoder, _encoder_failed
+    if _encoder is None and not _encoder_failed:
+        with _encoder_lock:
+            if _encoder is None and not _encoder_failed:
+                try:
+                    import tiktoken
+
+                    _encoder = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+                except Exception as e:
+                    # file encoding tiktoken belum ada di cache dan tidak bisa diunduh
+                    print(f"Peringatan: tokenizer tiktoken tidak tersedia, memakai perkiraan 4 karakter/token: {e}")
+                    _encoder_failed = True
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    encoder = _get_encoder()
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoder = _get_encoder()
+    if encoder is None:
+        return text[: max_tokens * 4]
+    return encoder.decode(encoder.encode(text)[:max_tokens])
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def unique_sources(docs: List[Document]) -> List[str]:
+    """
+    Daftar metadata source tanpa duplikat, urutan kemunculan dipertahankan.
+    """
+    return list(dict.fromkeys(doc.metadata.get("source", "N/A") for doc in docs))
+
+
+class ContextBuilder:
+    def __init__(
+        self,
+        token_budget: int = 1500,
+        max_chunks: int = 5,
+        mmr_lambda: float = 0.7,
+        duplicate_threshold: float = 0.8,
+        separator: str = "\n\n",
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        self.token_budget = token_budget
+        self.max_chunks = max_chunks
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.separator = separator
+        self.count_tokens = token_counter or count_tokens
+        self._lock = threading.Lock()
+        self.built = 0
+        self.duplicates_dropped = 0
+        self.truncated = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def build(self, docs: List[Document]) -> List[Document]:
+        """
+        Pilih chunk dari `docs` (urut dari yang paling relevan) untuk dimasukkan ke prompt.
+        """
+        if not docs:
+            return []
+
+        token_sets = [set(tokenize(doc.page_content)) for doc in docs]
+        token_counts = [self.count_tokens(doc.page_content) for doc in docs]
+
+        # 1. near-duplicate: simpan yang peringkatnya lebih tinggi
+        candidates: List[int] = []
+        duplicates = 0
+        for i in range(len(docs)):
+            if any(_jaccard(token_sets[i], token_sets[j]) >= self.duplicate_threshold for j in candidates):
+                duplicates += 1
+            else:
+                candidates.append(i)
+
+        # 2. MMR dengan relevansi dari urutan retrieval (1.0 untuk peringkat pertama)
+        relevance = {i: 1.0 - rank / len(docs) for rank, i in enumerate(candidates)}
+        order: List[int] = []
+        remaining = list(candidates)
+        while remaining and len(order) < self.max_chunks:
+            def mmr(i: int) -> float:
+                redundancy = max((_jaccard(token_sets[i], token_sets[j]) for j in order), default=0.0)
+                return self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+
+            best = max(remaining, key=mmr)
+            order.append(best)
+            remaining.remove(best)
+
+        # 3. batas token; chunk yang tidak muat dilewati, chunk pertama dipotong jika perlu
+        separator_tokens = self.count_tokens(self.separator)
+        selected: List[Document] = []
+        used = 0
+        truncated = 0
+        for i in order:
+            doc = docs[i]
+            tokens = token_counts[i] + (separator_tokens if selected else 0)
+            if used + tokens <= self.token_budget:
+                selected.append(doc)
+                used += tokens
+            elif not selected:
+                text = truncate_tokens(doc.page_content, self.token_budget)
+                selected.append(Document(id=doc.id, page_content=text, metadata=doc.metadata))
+                used += self.count_tokens(text)
+                truncated += 1
+
+        with self._lock:
+            self.built += 1
+            self.duplicates_dropped += duplicates
+            self.truncated += truncated
+            self.tokens_in += sum(token_counts)
+            self.tokens_out += used
+        return selected
+
+    def stats(self) -> dict:
+        return {
+            "built": self.built,
+            "duplicates_dropped": self.duplicates_dropped,
+            "truncated": self.truncated,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+        }
+
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+#=====================================================================#
+# Ringkasan percakapan bergulir per history_id.                       #
+# Pertanyaan lanjutan ("jelaskan poin kedua") ditulis ulang menjadi   #
+# pertanyaan mandiri dari ringkasan ini (lihat rag_sermon_summarizer),#
+# bukan dari seluruh thread, jadi ukuran prompt tetap berapapun       #
+# panjang percakapannya. Setelah setiap giliran, ringkasan diperbarui #
+# di background dari ringkasan lama + giliran terakhir saja.          #
+# Cache ada di memori (LRU); jika history belum ada di cache (restart,#
+# worker lain, terbuang dari LRU) ringkasan dibangun ulang dari      #
+# beberapa giliran terakhir di tabel chat.                            #
+#=====================================================================#
+
+# (pertanyaan user, jawaban assistant)
+Turn = Tuple[str, str]
+Summarize = Callable[[str, List[Turn]], Awaitable[str]]
+LoadTurns = Callable[[], Awaitable[List[Turn]]]
+
+
+class ConversationState:
+    __slots__ = ("summary", "turns", "updated_at")
+
+    def __init__(self, summary: str, turns: int):
+        self.summary = summary
+        self.turns = turns
+        self.updated_at = time.time()
+
+
+class ConversationMemory:
+    def __init__(self, summarize: Summarize, max_entries: int):
+        self.summarize = summarize
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, ConversationState]" = OrderedDict()
+        # update per history dijalankan berurutan; task terakhir disimpan di sini
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.updates = 0
+        self.failures = 0
+
+    def _put(self, key: str, state: ConversationState):
+        self._entries[key] = state
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _schedule(self, key: str, step: Callable[[], Awaitable[None]]) -> asyncio.Task:
+        previous = self._pending.get(key)
+
+        async def run():
+            if previous is not None:
+                await asyncio.wait({previous})
+            try:
+                await step()
+            except Exception as e:
+                self.failures += 1
+                print(f"Gagal memperbarui ringkasan percakapan {key}: {e}")
+
+        task = asyncio.create_task(run())
+        self._pending[key] = task
+        task.add_done_callback(lambda t: self._pending.get(key) is t and self._pending.pop(key))
+        return task
+
+    async def _rebuild(self, key: str, load_turns: LoadTurns):
+        if key in self._entries:
+            return
+        turns = await load_turns()
+        summary = await self.summarize("", turns) if turns else ""
+        self.rebuilds += 1
+        self._put(key, ConversationState(summary, len(turns)))
+
+    async def _apply(self, key: str, turn: Turn):
+        state = self._entries.get(key)
+        summary = await self.summarize(state.summary if state else "", [turn])
+        self.updates += 1
+        self._put(key, ConversationState(summary, (state.turns if state else 0) + 1))
+
+    async def aget(self, history_id, load_turns: LoadTurns) -> Optional[str]:
+        """
+        Ringkasan terbaru untuk history ini (menunggu update yang masih berjalan),
+        None jika percakapannya masih kosong.
+        """
+        key = str(history_id)
+        pending = self._pending.get(key)
+        if pending is not None:
+            await asyncio.wait({pending})
+
+        state = self._entries.get(key)
+        if state is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self.misses += 1
+            await self._schedule(key, lambda: self._rebuild(key, load_turns))
+            state = self._entries.get(key)
+        return state.summary if state is not None and state.summary else None
+
+    def update(self, history_id, question: str, answer: str) -> asyncio.Task:
+        """
+        Masukkan satu giliran ke ringkasan di background. History yang belum
+        ada di cache mulai dari ringkasan kosong.
+        """
+        key = str(history_id)
+        return self._schedule(key, lambda: self._apply(key, (question, answer)))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "rebuilds": self.rebuilds,
+            "updates": self.updates,
+            "failures": self.failures,
+            "pending": len(self._pending),
+            "size": len(self._entries),
+        }
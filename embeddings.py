@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import uconfig
+
+#====================================================================#
+# Satu provider embedding untuk seluruh aplikasi (retriever, chunker, #
+# vectorstore.add_documents, intent classifier, answer cache).       #
+# Vektor di-cache berdasarkan hash isi teks:                         #
+#   tier 1: LRU di memori                                            #
+#   tier 2: SQLite di disk (bertahan antar restart / antar worker)   #
+#====================================================================#
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying: Embeddings, namespace: str, memory_size: int, disk_path: Optional[str] = None):
+        self.underlying = underlying
+        self.namespace = namespace
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # koneksi sqlite dipakai dari thread pool (jalur async), dikunci terpisah
+        # supaya cek memori di event loop tidak ikut menunggu I/O disk
+        self._disk_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _lookup_memory(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self.memory_hits += 1
+        return found
+
+    def _lookup_disk(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        if not keys or self._conn is None:
+            return found
+        with self._disk_lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        with self._lock:
+            for key, vector in found.items():
+                self._remember(key, vector)
+            self.disk_hits += len(found)
+        return found
+
+    def _store_memory(self, keys: List[str], vectors: List[List[float]]):
+        with self._lock:
+            self.misses += len(keys)
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+
+    def _store_disk(self, keys: List[str], vectors: List[List[float]]):
+        if self._conn is None:
+            return
+        with self._disk_lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in zip(keys, vectors)],
+            )
+
+    @staticmethod
+    def _pending(keys: List[str], texts: List[str], found: Dict[str, List[float]]) -> Dict[str, str]:
+        # teks yang sama cukup di-embed sekali
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        return pending
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup_memory(keys)
+        found.update(self._lookup_disk([key for key in dict.fromkeys(keys) if key not in found]))
+        pending = self._pending(keys, texts, found)
+        if pending:
+            vectors = self.underlying.embed_documents(list(pending.values()))
+            self._store_memory(list(pending), vectors)
+            self._store_disk(list(pending), vectors)
+            found.update(zip(pending, vectors))
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Sama dengan embed_documents, tetapi tier disk (SQLite) dijalankan di thread
+        pool supaya tidak memblokir event loop; cek LRU memori tetap inline.
+        """
+        keys = [self._key(text) for text in texts]
+        found = self._lookup_memory(keys)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self._conn is not None:
+            found.update(await asyncio.to_thread(self._lookup_disk, missing))
+        pending = self._pending(keys, texts, found)
+        if pending:
+            vectors = await self.underlying.aembed_documents(list(pending.values()))
+            self._store_memory(list(pending), vectors)
+            if self._conn is not None:
+                await asyncio.to_thread(self._store_disk, list(pending), vectors)
+            found.update(zip(pending, vectors))
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "memory_size": len(self._memory),
+        }
+
+
+_embeddings: Optional[CachedEmbeddings] = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings() -> CachedEmbeddings:
+    """
+    Provider embedding bersama (OpenAIEmbeddings + cache), dibuat sekali per proses.
+    """
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                from langchain_openai import OpenAIEmbeddings
+
+                from http_pool import openai_clients
+
+                _embeddings = CachedEmbeddings(
+                    OpenAIEmbeddings(model=EMBEDDING_MODEL, **openai_clients()),
+                    namespace=EMBEDDING_MODEL,
+                    memory_size=uconfig.embed_cache_size,
+                    disk_path=uconfig.embed_cache_path or None,
+                )
+    return _embeddings
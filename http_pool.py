@@ -0,0 +1,274 @@
+import asyncio
+import importlib.util
+import threading
+from typing import Callable, Dict
+
+import httpx
+
+from config import uconfig
+
+#=====================================================================#
+# Pool koneksi HTTP bersama untuk SDK eksternal.                      #
+#   openai:   satu httpx.Client + httpx.AsyncClient untuk semua        #
+#             ChatOpenAI dan OpenAIEmbeddings                          #
+#   supabase: satu transport (pool koneksi) untuk klien anon & admin,  #
+#             tiap sub-klien (postgrest, storage, auth) tetap punya    #
+#             httpx.Client sendiri karena SDK-nya mengubah base_url    #
+#             dan header pada klien yang diberikan                     #
+#   pinecone: SDK memakai urllib3, cukup batas pool-nya yang diatur   #
+#             (lihat vector_store.py), statistiknya dibaca dari pool   #
+# Pool async terikat ke event loop tempat koneksinya dibuka, jadi      #
+# transport async menyimpan satu pool per loop (wrapper sinkron        #
+# summarize_sermon memakai asyncio.run, loop baru setiap panggilan).   #
+# HTTP/2 dipakai jika paket h2 terpasang (R_HTTP2=1). Setiap transport #
+# menghitung request dan koneksi baru lewat trace httpcore, jadi       #
+# tingkat reuse koneksi terlihat di stats() / GET /metrics.            #
+#=====================================================================#
+
+# event trace httpcore saat koneksi baru dibuka
+_CONNECT_EVENT = "connection.connect_tcp.complete"
+_TLS_EVENT = "connection.start_tls.complete"
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def request(self):
+        with self._lock:
+            self.requests += 1
+
+    def trace(self, event: str, info: dict):
+        if event == _CONNECT_EVENT:
+            with self._lock:
+                self.connections += 1
+        elif event == _TLS_EVENT:
+            with self._lock:
+                self.tls_handshakes += 1
+
+    async def atrace(self, event: str, info: dict):
+        self.trace(event, info)
+
+    def as_dict(self) -> dict:
+        reused = max(self.requests - self.connections, 0)
+        return {
+            "requests": self.requests,
+            "new_connections": self.connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reused": reused,
+            "reuse_rate": reused / self.requests if self.requests else 0.0,
+        }
+
+
+class _TracingTransport(httpx.HTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.request()
+        request.extensions["trace"] = self.stats.trace
+        return super().handle_request(request)
+
+
+class _AsyncTracingTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.request()
+        request.extensions["trace"] = self.stats.atrace
+        return await super().handle_async_request(request)
+
+
+class _PerLoopTransport(httpx.AsyncBaseTransport):
+    """
+    Satu _AsyncTracingTransport per event loop yang sedang berjalan; pool milik
+    loop yang sudah ditutup dibuang saat loop baru meminta pool.
+    """
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        self.stats = stats
+        self.kwargs = kwargs
+        self._transports: Dict[asyncio.AbstractEventLoop, _AsyncTracingTransport] = {}
+        self._lock = threading.Lock()
+
+    def _current(self) -> "_AsyncTracingTransport":
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            current = self._transports.get(loop)
+            if current is None:
+                # koneksi milik loop yang sudah ditutup tidak bisa dipakai (atau ditutup) lagi
+                for closed in [other for other in self._transports if other.is_closed()]:
+                    del self._transports[closed]
+                current = self._transports[loop] = _AsyncTracingTransport(self.stats, **self.kwargs)
+            return current
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._current().handle_async_request(request)
+
+    async def aclose(self):
+        with self._lock:
+            current = self._transports.pop(asyncio.get_running_loop(), None)
+        if current is not None:
+            await current.aclose()
+
+
+def http2_enabled() -> bool:
+    return uconfig.http2 and importlib.util.find_spec("h2") is not None
+
+
+def _transport_kwargs() -> dict:
+    return {
+        "http2": http2_enabled(),
+        "limits": httpx.Limits(
+            max_connections=uconfig.http_max_connections,
+            max_keepalive_connections=uconfig.http_max_keepalive,
+            keepalive_expiry=uconfig.http_keepalive_expiry,
+        ),
+    }
+
+
+_lock = threading.RLock()
+_stats: Dict[str, PoolStats] = {}
+_transports: Dict[str, httpx.BaseTransport] = {}
+_async_transports: Dict[str, httpx.AsyncBaseTransport] = {}
+_clients: Dict[str, httpx.Client] = {}
+_async_clients: Dict[str, httpx.AsyncClient] = {}
+_external_stats: Dict[str, Callable[[], dict]] = {}
+
+
+def _pool_stats(name: str) -> PoolStats:
+    if name not in _stats:
+        _stats[name] = PoolStats()
+    return _stats[name]
+
+
+def transport(service: str) -> httpx.BaseTransport:
+    """
+    Transport (pool koneksi) sinkron bersama untuk `service`.
+    """
+    with _lock:
+        if service not in _transports:
+            _transports[service] = _TracingTransport(_pool_stats(service), **_transport_kwargs())
+        return _transports[service]
+
+
+def async_transport(service: str) -> httpx.AsyncBaseTransport:
+    with _lock:
+        if service not in _async_transports:
+            _async_transports[service] = _PerLoopTransport(_pool_stats(f"{service}_async"), **_transport_kwargs())
+        return _async_transports[service]
+
+
+def http_client(service: str) -> httpx.Client:
+    """
+    httpx.Client bersama untuk SDK yang memakai URL absolut per request (mis. openai).
+    """
+    with _lock:
+        if service not in _clients:
+            _clients[service] = httpx.Client(transport=transport(service), timeout=None, follow_redirects=True)
+        return _clients[service]
+
+
+def async_http_client(service: str) -> httpx.AsyncClient:
+    with _lock:
+        if service not in _async_clients:
+            _async_clients[service] = httpx.AsyncClient(transport=async_transport(service), timeout=None, follow_redirects=True)
+        return _async_clients[service]
+
+
+def session(service: str, timeout) -> httpx.Client:
+    """
+    httpx.Client baru di atas transport bersama, untuk SDK yang mengubah
+    base_url/header klien yang diberikan (postgrest, storage3).
+    """
+    return httpx.Client(transport=transport(service), timeout=timeout, follow_redirects=True)
+
+
+def register_stats(name: str, collect: Callable[[], dict]):
+    """
+    Daftarkan statistik pool yang tidak dikelola modul ini (mis. urllib3 milik Pinecone).
+    """
+    _external_stats[name] = collect
+
+
+def stats() -> dict:
+    result = {name: pool.as_dict() for name, pool in list(_stats.items())}
+    for name, collect in list(_external_stats.items()):
+        try:
+            result[name] = collect()
+        except Exception as e:
+            result[name] = {"error": str(e)}
+    return result
+
+
+def openai_clients() -> dict:
+    """
+    kwargs untuk ChatOpenAI / OpenAIEmbeddings supaya memakai pool bersama.
+    """
+    return {"http_client": http_client("openai"), "http_async_client": async_http_client("openai")}
+
+
+def create_supabase_client(url: str, key: str):
+    """
+    create_client() dengan semua sub-klien (auth, postgrest, storage) di atas transport
+    "supabase" bersama. Properti postgrest & storage di-override supaya masing-masing
+    mendapat httpx.Client sendiri: postgrest dan storage3 menimpa base_url dan header
+    klien yang diberikan, jadi satu klien tidak boleh dipakai bersama.
+
+    Bergantung pada internal supabase-py (_postgrest, _storage, _init_*_client);
+    karena itu versinya dipatok di requirements.txt, cek ulang fungsi ini saat upgrade.
+    """
+    from supabase import Client, ClientOptions
+
+    class PooledClient(Client):
+        @property
+        def postgrest(self):
+            if self._postgrest is None:
+                self._postgrest = self._init_postgrest_client(
+                    rest_url=self.rest_url,
+                    headers=self.options.headers,
+                    schema=self.options.schema,
+                    http_client=session("supabase", self.options.postgrest_client_timeout),
+                )
+            return self._postgrest
+
+        @property
+        def storage(self):
+            if self._storage is None:
+                self._storage = self._init_storage_client(
+                    storage_url=self.storage_url,
+                    headers=self.options.headers,
+                    http_client=session("supabase", self.options.storage_client_timeout),
+                )
+            return self._storage
+
+    # auth (gotrue) memakai URL absolut dan header per request, klien ini aman dipakai sendiri
+    options = ClientOptions(httpx_client=session("supabase", uconfig.http_timeout))
+    return PooledClient.create(url, key, options)
+
+
+def pinecone_pool_stats(index) -> dict:
+    """
+    Statistik pool urllib3 milik index Pinecone (num_requests / num_connections per host).
+    """
+    pool_manager = index._api_client.rest_client.pool_manager
+    requests = connections = 0
+    for key in list(pool_manager.pools.keys()):
+        pool = pool_manager.pools.get(key)
+        if pool is None:
+            continue
+        requests += pool.num_requests
+        connections += pool.num_connections
+    reused = max(requests - connections, 0)
+    return {
+        "requests": requests,
+        "new_connections": connections,
+        "reused": reused,
+        "reuse_rate": reused / requests if requests else 0.0,
+    }
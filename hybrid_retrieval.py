@@ -0,0 +1,74 @@
+import asyncio
+from typing import List, Optional, Sequence
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from lexical_index import LexicalIndex, verse_ref_tokens
+
+#=====================================================================#
+# Retrieval hybrid: hasil dense (vector store) dan BM25 (lexical_index)#
+# digabung dengan reciprocal rank fusion. Query yang berisi referensi  #
+# ayat dijawab dari index leksikal saja, tanpa panggilan embedding.    #
+#=====================================================================#
+
+
+def _doc_key(doc: Document) -> str:
+    return doc.id or doc.page_content
+
+
+def rrf_fuse(result_lists: Sequence[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Reciprocal rank fusion: skor = sum(1 / (rrf_k + rank)) atas semua daftar.
+    """
+    scores = {}
+    documents = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in ranked]
+
+
+class HybridRetriever(BaseRetriever):
+    vectorstore: VectorStore
+    lexical_index: LexicalIndex
+    k: int = 5
+    # kandidat per sumber sebelum fusion
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def lexical_only(self, query: str) -> Optional[List[Document]]:
+        """
+        Hasil leksikal untuk query berisi referensi ayat, None jika bukan
+        referensi atau tidak ada yang cocok (lanjut ke jalur hybrid biasa).
+        Shortcut hanya dipakai jika token ayat itu sendiri ada di index; pola
+        seperti "jam 10:30" atau ayat yang tidak pernah dikutip tetap lewat routing.
+        """
+        if not self.lexical_index.has_any(verse_ref_tokens(query)):
+            return None
+        return self.lexical_index.search(query, k=self.k) or None
+
+    def fuse(self, dense: List[Document], lexical: List[Document]) -> List[Document]:
+        return rrf_fuse([dense, lexical], k=self.k, rrf_k=self.rrf_k)
+
+    async def asearch_by_vector(self, query: str, vector: List[float]) -> List[Document]:
+        """
+        Jalur hybrid dengan embedding query yang sudah ada (dipakai _prepare).
+        """
+        dense, lexical = await asyncio.gather(
+            self.vectorstore.asimilarity_search_by_vector(vector, k=self.fetch_k),
+            asyncio.to_thread(self.lexical_index.search, query, self.fetch_k),
+        )
+        return self.fuse(dense, lexical)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        exact = self.lexical_only(query)
+        if exact is not None:
+            return exact
+        dense = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        return self.fuse(dense, self.lexical_index.search(query, k=self.fetch_k))
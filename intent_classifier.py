@@ -0,0 +1,158 @@
+import asyncio
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+#=====================================================================#
+# Klasifikasi niat lokal sebelum router_chain.                        #
+# 1. Aturan regex untuk kasus yang sangat jelas (sapaan, terima kasih, #
+#    permintaan ringkasan umum) -> tanpa panggilan jaringan sama sekali.#
+# 2. Nearest-centroid atas embedding contoh berlabel (dihitung sekali  #
+#    lalu di-cache). Jika selisih skor terbaik dan kedua di bawah      #
+#    threshold, hasilnya None dan router LLM yang memutuskan.          #
+#=====================================================================#
+
+GENERAL_SUMMARY_QUERY = "Buatkan ringkasan umum dari keseluruhan khotbah ini."
+
+_IRRELEVANT_RE = re.compile(
+    r"^(terima ?kasih|makasih|trims|thanks?( you)?|thx|halo+|hal+o|hai+|hi+|hello|hey|"
+    r"selamat (pagi|siang|sore|malam)|ok(e|ay)?|sip|mantap|baik|siap|permisi|"
+    r"apa kabar|assalamualaikum|shalom|syalom)"
+    r"( (ya|yah|yaa|kak|pak|bu|min|banyak|sekali|semuanya))*[\s!.?~]*$",
+    re.IGNORECASE,
+)
+
+_GENERAL_SUMMARY_RE = re.compile(
+    r"^(tolong |coba |bisa )?(ringkas(kan|an)?|rangkum(kan|an)?|simpulkan|kesimpulan(nya)?|"
+    r"gimana intinya|apa intinya|intinya( apa)?( aja)?)"
+    r"( (dong|donk|ya|aja|saja))?"
+    r"( (khotbah|kotbah|renungan)( (ini|tadi|itu|nya|hari ini|minggu ini))?)?"
+    r"( (dong|donk|ya|aja|saja))?[\s!.?]*$",
+    re.IGNORECASE,
+)
+
+LABELLED_EXAMPLES: Dict[str, List[str]] = {
+    "topic_summary": [
+        "Tolong ringkaskan khotbah tentang kasih",
+        "Peristiwa Daud dan Goliat",
+        "Apa yang diajarkan tentang mengasihi sesama seperti mengasihi diri sendiri?",
+        "Jelaskan tentang pengampunan",
+        "Apa kata khotbah mengenai iman dan perbuatan?",
+        "Bagaimana khotbah menjelaskan Yohanes 3:16?",
+        "Perumpamaan anak yang hilang",
+        "Apa arti kasih karunia menurut khotbah ini?",
+        "Ringkasan bagian tentang doa",
+        "Siapa itu Abraham dalam khotbah tersebut?",
+    ],
+    "general_summary": [
+        "gimana intinya?",
+        "Buatkan ringkasan umum dari keseluruhan khotbah ini.",
+        "Apa pesan utama khotbahnya?",
+        "Tolong rangkum semuanya",
+        "Khotbah ini tentang apa sih?",
+        "Kesimpulan dari khotbah tadi apa?",
+        "Ringkas saja secara umum",
+        "Apa poin-poin penting khotbah ini?",
+    ],
+    "irrelevant": [
+        "Terima kasih ya",
+        "Halo, apa kabar?",
+        "Cuaca hari ini bagus ya",
+        "Siapa presiden Indonesia?",
+        "Buatkan saya kode python",
+        "Berapa harga tiket pesawat ke Bali?",
+        "Kamu siapa?",
+        "Selamat pagi",
+        "Resep nasi goreng enak",
+        "Oke sip",
+    ],
+}
+
+
+class IntentClassifier:
+    def __init__(self, embeddings: Embeddings, threshold: float, examples: Dict[str, List[str]] = LABELLED_EXAMPLES):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.examples = examples
+        self._labels: List[str] = list(examples)
+        self._centroids: Optional[np.ndarray] = None
+        self._centroids_lock = asyncio.Lock()
+        self.rule_hits = 0
+        self.centroid_hits = 0
+        self.fallbacks = 0
+
+    def classify_rules(self, user_input: str) -> Optional[dict]:
+        """
+        Kasus yang sangat jelas, tanpa jaringan.
+        """
+        text = " ".join(user_input.split())
+        if _IRRELEVANT_RE.match(text):
+            self.rule_hits += 1
+            return {"intent": "irrelevant", "query": None, "confidence": 1.0}
+        if _GENERAL_SUMMARY_RE.match(text):
+            self.rule_hits += 1
+            return {"intent": "general_summary", "query": GENERAL_SUMMARY_QUERY, "confidence": 1.0}
+        return None
+
+    async def _get_centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            async with self._centroids_lock:
+                if self._centroids is None:
+                    centroids = []
+                    for label in self._labels:
+                        vectors = np.asarray(await self.embeddings.aembed_documents(self.examples[label]), dtype=np.float32)
+                        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                        centroid = vectors.mean(axis=0)
+                        centroids.append(centroid / np.linalg.norm(centroid))
+                    self._centroids = np.stack(centroids)
+        return self._centroids
+
+    async def aclassify(self, user_input: str, vector: Optional[List[float]] = None) -> Optional[dict]:
+        """
+        Kembalikan route {"intent", "query", "confidence"} jika yakin, None jika harus ke router LLM.
+        `vector` boleh diisi embedding input yang sudah dihitung sebelumnya.
+        Untuk topic_summary, embedding input ikut dikembalikan di "query_vector"
+        supaya tidak perlu di-embed ulang saat retrieval.
+        """
+        route = self.classify_rules(user_input)
+        if route is not None:
+            return route
+
+        if vector is None:
+            vector = await self.embeddings.aembed_query(user_input)
+        query_vector = np.asarray(vector, dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector)
+
+        scores = await self._get_centroids() @ query_vector
+        order = np.argsort(scores)[::-1]
+        confidence = float(scores[order[0]] - scores[order[1]])
+        if confidence < self.threshold:
+            self.fallbacks += 1
+            return None
+
+        self.centroid_hits += 1
+        intent = self._labels[int(order[0])]
+        if intent == "topic_summary":
+            return {"intent": intent, "query": user_input, "confidence": confidence, "query_vector": vector}
+        if intent == "general_summary":
+            return {"intent": intent, "query": GENERAL_SUMMARY_QUERY, "confidence": confidence}
+        return {"intent": intent, "query": None, "confidence": confidence}
+
+    async def awarm_up(self):
+        """
+        Hitung centroid lebih awal supaya request pertama tidak menunggu embedding contoh.
+        """
+        await self._get_centroids()
+
+    def stats(self) -> dict:
+        saved = self.rule_hits + self.centroid_hits
+        total = saved + self.fallbacks
+        return {
+            "rule_hits": self.rule_hits,
+            "centroid_hits": self.centroid_hits,
+            "llm_fallbacks": self.fallbacks,
+            "router_calls_saved": saved,
+            "fast_path_rate": saved / total if total else 0.0,
+        }
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional
+
+from rag_store_documents import IngestFile
+
+#====================================================================#
+# Job ingestion di background untuk /update-knowledge.               #
+# File disimpan dulu ke spool dir, job dicatat di SQLite (bertahan    #
+# antar restart dan bisa dibaca worker lain), lalu sejumlah worker    #
+# memproses job satu per satu. Status per file (stage, jumlah chunk,  #
+# error) diperbarui lewat callback on_progress.                      #
+# Beberapa proses (worker uvicorn) berbagi store yang sama: job       #
+# diklaim secara atomik dengan lease yang diperpanjang selama job     #
+# berjalan, dan baru diantrikan ulang setelah lease-nya habis.        #
+#====================================================================#
+
+JobRunner = Callable[[List[IngestFile], Callable[..., None]], Awaitable[dict]]
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+            " id TEXT PRIMARY KEY, status TEXT, created_at REAL, updated_at REAL, state TEXT,"
+            " owner TEXT, lease_until REAL)"
+        )
+        # store lama belum punya kolom lease
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ingest_jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE ingest_jobs ADD COLUMN {column} {kind}")
+        self._lock = threading.Lock()
+
+    def save(self, job: dict):
+        job["updated_at"] = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingest_jobs (id, status, created_at, updated_at, state) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET"
+                " status = excluded.status, updated_at = excluded.updated_at, state = excluded.state",
+                (job["id"], job["status"], job["created_at"], job["updated_at"], json.dumps(job)),
+            )
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """
+        Ambil job 'queued' untuk `owner`. False jika sudah diklaim proses lain.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'running', owner = ?, lease_until = ?"
+                " WHERE id = ? AND status = 'queued'",
+                (owner, time.time() + lease_seconds, job_id),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ingest_jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + lease_seconds, job_id, owner),
+            )
+        return cursor.rowcount == 1
+
+    def requeue_expired(self):
+        """
+        Job 'running' yang lease-nya habis (pemiliknya mati) dikembalikan ke 'queued'.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'queued', owner = NULL, lease_until = NULL,"
+                " state = json_set(state, '$.status', 'queued')"
+                " WHERE status = 'running' AND lease_until < ?",
+                (time.time(),),
+            )
+
+    def fail_queued(self, job_id: str, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'error',"
+                " state = json_set(state, '$.status', 'error', '$.error', ?)"
+                " WHERE id = ? AND status = 'queued'",
+                (error, job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def queued(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state FROM ingest_jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+class IngestJobQueue:
+    def __init__(self, store: JobStore, runner: JobRunner, spool_dir: str, workers: int = 1,
+                 lease_seconds: float = 60.0):
+        self.store = store
+        self.runner = runner
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        # identitas proses ini sebagai pemilik lease
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    def _recover(self):
+        """
+        Antrikan job yang lease-nya habis atau belum diambil siapa pun. Job yang
+        sama boleh masuk antrian beberapa proses; hanya satu yang berhasil klaim.
+        """
+        self.store.requeue_expired()
+        for job in self.store.queued():
+            if all(os.path.exists(f["path"]) for f in job["files"]):
+                self._queue.put_nowait(job["id"])
+            else:
+                self.store.fail_queued(job["id"], "File spool hilang setelah restart, silakan unggah ulang.")
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                await asyncio.to_thread(self._recover)
+            except Exception as e:
+                print(f"Gagal memeriksa job ingestion yang terbengkalai: {e}")
+
+    async def start(self):
+        """
+        Jalankan worker dan lanjutkan job yang belum selesai saat proses sebelumnya berhenti.
+        """
+        self._ensure_started()
+        await asyncio.to_thread(self._recover)
+
+    def new_job_dir(self) -> tuple:
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        return job_id, job_dir
+
+    def enqueue(self, job_id: str, files: List[IngestFile]) -> dict:
+        self._ensure_started()
+        now = time.time()
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "created_at": now,
+            "updated_at": now,
+            "files": [
+                {"filename": f.filename, "path": f.path, "size": f.size, "sha256": f.sha256,
+                 "stage": "queued", "chunks": 0, "error": None}
+                for f in files
+            ],
+            "result": None,
+            "error": None,
+        }
+        self.store.save(job)
+        self._queue.put_nowait(job_id)
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                if await asyncio.to_thread(self.store.claim, job_id, self.owner, self.lease_seconds):
+                    await self._run(job_id)
+            except Exception as e:
+                print(f"GAGAL mengambil job ingestion {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _keep_lease(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.store.renew, job_id, self.owner, self.lease_seconds)
+            except Exception as e:
+                print(f"Gagal memperpanjang lease job {job_id}: {e}")
+
+    async def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None:
+            return
+
+        files_by_name = {f["filename"]: f for f in job["files"]}
+
+        def on_progress(filename: str, stage: str, **info):
+            entry = files_by_name.get(filename)
+            if entry is None:
+                return
+            entry["stage"] = stage
+            if "chunks" in info:
+                entry["chunks"] = info["chunks"]
+            if "error" in info:
+                entry["error"] = info["error"]
+            self.store.save(job)
+
+        job["status"] = "running"
+        self.store.save(job)
+        lease = asyncio.create_task(self._keep_lease(job_id))
+        try:
+            result = await self.runner(
+                [IngestFile(filename=f["filename"], path=f["path"], size=f["size"], sha256=f.get("sha256"))
+                 for f in job["files"]],
+                on_progress,
+            )
+            job["result"] = result
+            job["status"] = "done" if result.get("status") == "success" else "error"
+            if job["status"] == "error":
+                job["error"] = result.get("message")
+        except Exception as e:
+            print(f"GAGAL menjalankan job ingestion {job_id}: {e}")
+            job["status"] = "error"
+            job["error"] = str(e)
+        finally:
+            lease.cancel()
+            self.store.save(job)
+            shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
+
+    async def stop(self):
+        tasks = self._tasks + ([self._sweeper] if self._sweeper is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._sweeper = None
+
+    @staticmethod
+    def public_view(job: dict) -> dict:
+        """
+        Status job untuk API, tanpa path spool internal.
+        """
+        view = dict(job)
+        view["files"] = [{k: v for k, v in f.items() if k != "path"} for f in job["files"]]
+        return view
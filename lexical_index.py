@@ -0,0 +1,189 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Set
+
+from langchain_core.documents import Document
+
+from config import uconfig
+
+#=====================================================================#
+# Inverted index BM25 lokal (SQLite) untuk chunk yang diindeks.       #
+# Diisi dan dihapus bersamaan dengan vector store oleh ingestion,     #
+# dipakai retriever hybrid (lihat hybrid_retrieval.py) untuk nama dan #
+# referensi ayat seperti "Daud dan Goliat" atau "Yohanes 3:16" yang   #
+# sering meleset di pencarian dense.                                  #
+#=====================================================================#
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+ada adalah agar akan aku anda apa apakah atau bagaimana bagi bahwa baik banyak beberapa begitu belum
+bisa boleh bukan dalam dan dapat dari daripada dengan di dia ia ini itu jadi jika juga kalau kami kamu
+kan karena kata ke kepada kita lagi lain lalu maka mana masih mereka mungkin namun oleh pada para pun
+saat sama sangat saja saya sebagai sebuah secara sedang sehingga sekali selalu seperti serta siapa
+sudah supaya tapi telah tentang tersebut tetapi tidak untuk walaupun yaitu yakni yang nya
+tolong ringkas ringkasan ringkaskan khotbah jelaskan
+""".split())
+
+# akhiran partikel yang aman dibuang tanpa stemmer penuh
+PARTICLE_SUFFIXES = ("lah", "kah", "pun", "nya")
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# mis. "Yohanes 3:16", "1 Korintus 13:4-7", "Mat. 5:9"
+VERSE_REF_RE = re.compile(r"\b((?:[1-3]\s*)?[A-Za-z]+)\.?\s+(\d{1,3})\s*:\s*(\d{1,3})(?:\s*-\s*(\d{1,3}))?")
+MAX_RANGE_VERSES = 30
+
+
+def _stem(token: str) -> str:
+    for suffix in PARTICLE_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[: -len(suffix)]
+    return token
+
+
+def verse_ref_tokens(text: str) -> List[str]:
+    """
+    Token referensi ayat, rentang dipecah per ayat: "Yoh 3:16-17" -> yoh3:16, yoh3:17.
+    """
+    tokens = []
+    for book, chapter, start, end in VERSE_REF_RE.findall(text):
+        book = re.sub(r"\s+", "", book.lower())
+        first = int(start)
+        last = int(end) if end and first <= int(end) <= first + MAX_RANGE_VERSES else first
+        tokens.extend(f"{book}{chapter}:{verse}" for verse in range(first, last + 1))
+    return tokens
+
+
+def tokenize(text: str) -> List[str]:
+    words = [_stem(w) for w in TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+    return words + verse_ref_tokens(text)
+
+
+def is_exact_reference(text: str) -> bool:
+    return bool(VERSE_REF_RE.search(text))
+
+
+class LexicalIndex:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id TEXT PRIMARY KEY, doc_id TEXT, length INTEGER, text TEXT, metadata TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks (doc_id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT, id TEXT, tf INTEGER, PRIMARY KEY (term, id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_id ON postings (id)")
+        self._lock = threading.Lock()
+
+    def add(self, ids: Sequence[str], documents: Sequence[Document]):
+        """
+        Tambah atau ganti chunk (id sama dengan ID vektor).
+        """
+        with self._lock, self._conn:
+            self._delete_ids_locked(ids)
+            for chunk_id, doc in zip(ids, documents):
+                counts = Counter(tokenize(doc.page_content))
+                self._conn.execute(
+                    "INSERT INTO chunks VALUES (?, ?, ?, ?, ?)",
+                    (chunk_id, str(doc.metadata.get("doc_id")), sum(counts.values()), doc.page_content,
+                     json.dumps(doc.metadata, ensure_ascii=False)),
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?)",
+                    [(term, chunk_id, tf) for term, tf in counts.items()],
+                )
+
+    def _delete_ids_locked(self, ids: Sequence[str]):
+        self._conn.executemany("DELETE FROM postings WHERE id = ?", [(i,) for i in ids])
+        self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock, self._conn:
+            self._delete_ids_locked(ids)
+
+    def delete_doc(self, doc_id) -> int:
+        with self._lock, self._conn:
+            ids = [row[0] for row in self._conn.execute("SELECT id FROM chunks WHERE doc_id = ?", (str(doc_id),))]
+            self._delete_ids_locked(ids)
+        return len(ids)
+
+    def has_any(self, terms: Sequence[str]) -> bool:
+        """
+        Apakah minimal satu term punya posting di index.
+        """
+        if not terms:
+            return False
+        with self._lock:
+            placeholders = ",".join("?" * len(terms))
+            row = self._conn.execute(
+                f"SELECT 1 FROM postings WHERE term IN ({placeholders}) LIMIT 1", list(terms)
+            ).fetchone()
+        return row is not None
+
+    def ids(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT id FROM chunks")}
+
+    def search(self, query: str, k: int = 5) -> List[Document]:
+        """
+        BM25 atas token query. Dokumen yang dikembalikan memuat skor di metadata["bm25"].
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            total, total_length = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks").fetchone()
+            if total == 0:
+                return []
+            avg_length = total_length / total
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+                # referensi ayat jauh lebih spesifik daripada kata biasa
+                boost = 3.0 if ":" in term else 1.0
+                idf = math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+                for chunk_id, tf, length in rows:
+                    norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + boost * idf * norm
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            documents = []
+            for chunk_id, score in top:
+                text, metadata = self._conn.execute(
+                    "SELECT text, metadata FROM chunks WHERE id = ?", (chunk_id,)
+                ).fetchone()
+                metadata = json.loads(metadata)
+                metadata["bm25"] = round(score, 4)
+                documents.append(Document(id=chunk_id, page_content=text, metadata=metadata))
+        return documents
+
+
+_lexical_index: Optional[LexicalIndex] = None
+_lexical_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> LexicalIndex:
+    """
+    Index leksikal bersama untuk proses ini.
+    """
+    global _lexical_index
+    if _lexical_index is None:
+        with _lexical_index_lock:
+            if _lexical_index is None:
+                _lexical_index = LexicalIndex(uconfig.lexical_index_path)
+    return _lexical_index
@@ -0,0 +1,202 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from config import uconfig
+
+#=====================================================================#
+# Latensi per tahap (auth, routing, embedding, retrieval, LLM,        #
+# Supabase, ingestion). Setiap span dicatat ke:                        #
+#   - RequestTimings milik request yang sedang berjalan (ContextVar),  #
+#     dikirim sebagai header Server-Timing oleh middleware di app.py   #
+#   - histogram Prometheus, dibaca lewat GET /metrics                  #
+# Jika keduanya mati (R_METRICS=0, R_SERVER_TIMING=0) span tidak       #
+# melakukan apa-apa selain satu lookup ContextVar.                     #
+#=====================================================================#
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class RequestTimings:
+    """
+    Span, jumlah token dan flag cache untuk satu request.
+    Objek ini dibagi ke task/thread turunan (ContextVar ikut tersalin), jadi
+    span yang berjalan paralel dijumlahkan per tahap.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        self.flags: Dict[str, str] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """
+        Nilai header Server-Timing, mis. `auth;dur=1.2, llm;dur=830.5, answer_cache;desc="miss"`.
+        """
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.durations.items()]
+        parts.extend(f"tokens_{kind};desc={count}" for kind, count in self.tokens.items())
+        parts.extend(f'{name};desc="{value}"' for name, value in self.flags.items())
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+class _Prometheus:
+    """
+    Kumpulan metrik Prometheus. prometheus_client hanya dibutuhkan jika R_METRICS=1.
+    """
+
+    def __init__(self):
+        import prometheus_client
+
+        self.client = prometheus_client
+        self.registry = prometheus_client.CollectorRegistry()
+        self.stage_seconds = prometheus_client.Histogram(
+            "r1_stage_duration_seconds", "Durasi per tahap pemrosesan",
+            ["stage"], buckets=STAGE_BUCKETS, registry=self.registry,
+        )
+        self.request_seconds = prometheus_client.Histogram(
+            "r1_request_duration_seconds", "Durasi request HTTP per route",
+            ["route", "method"], buckets=STAGE_BUCKETS, registry=self.registry,
+        )
+        self.tokens = prometheus_client.Counter(
+            "r1_llm_tokens", "Token LLM per tahap (input/output)",
+            ["stage", "kind"], registry=self.registry,
+        )
+        self.cache = prometheus_client.Counter(
+            "r1_cache_lookups", "Hasil lookup cache (hit/miss) per cache",
+            ["cache", "result"], registry=self.registry,
+        )
+        self.http_pool = prometheus_client.Gauge(
+            "r1_http_pool", "Request, koneksi baru dan reuse per pool HTTP (lihat http_pool.py)",
+            ["pool", "stat"], registry=self.registry,
+        )
+
+
+_prometheus: Optional[_Prometheus] = None
+if uconfig.metrics_enabled:
+    try:
+        _prometheus = _Prometheus()
+    except ImportError as e:
+        print(f"Peringatan: prometheus_client tidak tersedia, /metrics dimatikan: {e}")
+
+
+def enabled() -> bool:
+    return _prometheus is not None
+
+
+def begin_request() -> Optional[RequestTimings]:
+    """
+    Mulai pencatatan untuk request ini (dipanggil middleware). None jika Server-Timing mati.
+    """
+    if not uconfig.server_timing:
+        return None
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def record(stage: str, seconds: float):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+    if _prometheus is not None:
+        _prometheus.stage_seconds.labels(stage).observe(seconds)
+
+
+def record_request(route: str, method: str, seconds: float):
+    if _prometheus is not None:
+        _prometheus.request_seconds.labels(route, method).observe(seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Ukur durasi blok `with`. Bisa dipakai di kode sinkron maupun async
+    (durasi termasuk waktu menunggu await di dalam blok).
+    """
+    if _prometheus is None and _current.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def flag(cache: str, hit: bool):
+    """
+    Catat hasil lookup cache (answer_cache, auth_cache, intent_fast_path, speculation...).
+    """
+    result = "hit" if hit else "miss"
+    timings = _current.get()
+    if timings is not None:
+        timings.flags[cache] = result
+    if _prometheus is not None:
+        _prometheus.cache.labels(cache, result).inc()
+
+
+def add_tokens(stage: str, input_tokens: int, output_tokens: int):
+    timings = _current.get()
+    if timings is not None:
+        for kind, count in (("input", input_tokens), ("output", output_tokens)):
+            key = f"{stage}_{kind}"
+            timings.tokens[key] = timings.tokens.get(key, 0) + count
+    if _prometheus is not None:
+        _prometheus.tokens.labels(stage, "input").inc(input_tokens)
+        _prometheus.tokens.labels(stage, "output").inc(output_tokens)
+
+
+def _usage_from_response(response) -> tuple:
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not input_tokens and not output_tokens:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
+
+
+def token_usage_callback(stage: str):
+    """
+    Callback LangChain yang mencatat usage token dari setiap panggilan LLM ke tahap `stage`.
+    Untuk streaming, usage hanya ada jika model dibuat dengan stream_usage=True.
+    langchain_core baru di-import di sini supaya modul ini tetap ringan untuk app.py.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TokenUsageCallback(BaseCallbackHandler):
+        def on_llm_end(self, response, **kwargs):
+            input_tokens, output_tokens = _usage_from_response(response)
+            if input_tokens or output_tokens:
+                add_tokens(stage, input_tokens, output_tokens)
+
+    return TokenUsageCallback()
+
+
+def render() -> Optional[tuple]:
+    """
+    (body, content_type) untuk GET /metrics, None jika metrik dimatikan.
+    """
+    if _prometheus is None:
+        return None
+    import http_pool
+
+    for pool, values in http_pool.stats().items():
+        for stat, value in values.items():
+            if isinstance(value, (int, float)):
+                _prometheus.http_pool.labels(pool, stat).set(value)
+    return _prometheus.client.generate_latest(_prometheus.registry), _prometheus.client.CONTENT_TYPE_LATEST
@@ -20,8 +20,27 @@ CREATE TABLE IF NOT EXISTS file (
     uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
 );
 
+-- tabel files (dipakai ingestion); id dipakai sebagai doc_id di metadata vektor
+CREATE TABLE IF NOT EXISTS files (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    name TEXT NOT NULL,
+    size BIGINT,
+    type TEXT,
+    url TEXT,
+    content_hash TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- database lama: tambahkan hash isi file untuk deduplikasi
+ALTER TABLE files ADD COLUMN IF NOT EXISTS content_hash TEXT;
+CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files(content_hash);
+CREATE INDEX IF NOT EXISTS idx_files_name ON files(name);
+
 CREATE INDEX IF NOT EXISTS idx_history_user_id ON history(user_id);
 CREATE INDEX IF NOT EXISTS idx_history_created_at ON history(created_at);
+-- keyset pagination /hist-get dan /chat-get: ORDER BY created_at, id per user / per history
+CREATE INDEX IF NOT EXISTS idx_history_user_created_at ON history(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_chat_history_created_at ON chat(history_id, created_at, id);
 CREATE INDEX IF NOT EXISTS idx_file_uploaded_at ON file(uploaded_at);
 
 ALTER TABLE history ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,105 @@
+import base64
+import datetime
+import hashlib
+import json
+from typing import Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from config import uconfig
+
+#=====================================================================#
+# Cursor (keyset) pagination + conditional GET untuk /hist-get dan   #
+# /chat-get. Urutan dikerjakan di database lewat index               #
+# (created_at, id); cursor menyimpan (created_at, id) baris terakhir #
+# halaman sebelumnya, jadi halaman ke-N sama murahnya dengan         #
+# halaman pertama (tidak ada OFFSET). Klien lama yang tidak mengirim #
+# limit maupun cursor tetap menerima semua baris tanpa paging.       #
+# Body dibuat sekali, ETag-nya hash body: klien yang mengirim        #
+# If-None-Match yang sama dapat 304.                                 #
+#=====================================================================#
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_limit(limit: Optional[int], cursor: Optional[str] = None) -> Optional[int]:
+    """
+    None berarti tanpa paging (tidak ada limit maupun cursor dari klien).
+    """
+    if limit is None:
+        return uconfig.page_size if cursor else None
+    return max(1, min(limit, uconfig.page_size_max))
+
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        # hanya timestamp valid yang boleh masuk ke filter postgrest
+        datetime.datetime.fromisoformat(created_at)
+        return created_at, int(row_id)
+    except Exception as e:
+        raise InvalidCursor(f"Cursor tidak valid: {cursor}") from e
+
+
+def after_cursor(query, cursor: Optional[str], descending: bool):
+    """
+    Tambahkan filter keyset `(created_at, id) > cursor` (atau `<` jika descending)
+    dan urutan yang sama ke query postgrest.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        op = "lt" if descending else "gt"
+        # nilai timestamp dikutip karena mengandung ':' dan '+'
+        query = query.or_(f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{row_id})')
+    return query.order("created_at", desc=descending).order("id", desc=descending)
+
+
+def with_limit(query, limit: Optional[int]):
+    # ambil satu baris ekstra untuk tahu apakah masih ada halaman berikutnya
+    return query if limit is None else query.limit(limit + 1)
+
+
+def split_page(rows: list, limit: Optional[int]) -> Tuple[list, Optional[str]]:
+    """
+    Query diambil `limit + 1` baris; baris ekstra hanya menandakan masih ada halaman berikutnya.
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
+
+
+def dumps(payload) -> bytes:
+    """
+    JSON ringkas; orjson dipakai jika terpasang dan R_FAST_JSON=1.
+    """
+    if uconfig.fast_json and orjson is not None:
+        return orjson.dumps(payload, default=str)
+    return json.dumps(payload, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def conditional_json(request: Request, payload) -> Response:
+    """
+    JSONResponse dengan ETag; 304 tanpa body jika If-None-Match klien masih cocok.
+    """
+    body = dumps(payload)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
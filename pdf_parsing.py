@@ -0,0 +1,182 @@
+import asyncio
+import multiprocessing
+import queue
+import threading
+from typing import TYPE_CHECKING, List, Optional, Set
+
+from config import uconfig
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+#=====================================================================#
+# Parsing PDF (UnstructuredPDFLoader) sangat berat di CPU. Modul ini   #
+# sengaja ringan supaya bisa di-import oleh proses worker (spawn) tanpa #
+# ikut menginisialisasi Pinecone/OpenAI seperti rag_store_documents.   #
+# Setiap proses worker mengerjakan satu PDF dalam satu waktu, jadi    #
+# PDF yang macet cukup menghentikan worker-nya sendiri; parsing lain  #
+# di pool tetap berjalan.                                             #
+#=====================================================================#
+
+_pool: Optional["PdfWorkerPool"] = None
+_pool_lock = threading.Lock()
+
+
+def load_pdf_elements(path: str) -> List["Document"]:
+    """
+    Dijalankan di proses worker. Kembalikan elemen-elemen PDF sebagai Document.
+    """
+    from langchain_community.document_loaders import UnstructuredPDFLoader
+
+    # loader = PyPDFLoader(path)
+    loader = UnstructuredPDFLoader(path, mode="elements")
+    return loader.load()
+
+
+def _worker_main(conn):
+    """
+    Loop proses worker: terima path, kirim balik (True, elemen) atau (False, error).
+    """
+    while True:
+        try:
+            path = conn.recv()
+        except EOFError:
+            return
+        if path is None:
+            return
+        try:
+            conn.send((True, load_pdf_elements(path)))
+        except Exception as e:
+            try:
+                conn.send((False, e))
+            except Exception:
+                # exception yang tidak bisa di-pickle
+                conn.send((False, RuntimeError(str(e))))
+
+
+class PdfWorker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def run(self, path: str):
+        """
+        Blocking, dijalankan di thread. EOFError jika prosesnya mati atau dihentikan.
+        """
+        self.conn.send(path)
+        return self.conn.recv()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class PdfWorkerPool:
+    def __init__(self, size: int):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots = threading.Semaphore(size)
+        self._idle: "queue.SimpleQueue[PdfWorker]" = queue.SimpleQueue()
+        self._workers: Set[PdfWorker] = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self) -> PdfWorker:
+        """
+        Blocking sampai ada slot. Worker idle dipakai ulang, selain itu dibuat baru.
+        """
+        self._slots.acquire()
+        try:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                worker = PdfWorker(self._ctx)
+                with self._lock:
+                    self._workers.add(worker)
+                return worker
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, worker: PdfWorker, broken: bool = False):
+        """
+        Kembalikan worker ke pool; worker yang macet/mati (`broken`) dihentikan
+        dan slot-nya dipakai worker baru pada acquire() berikutnya.
+        """
+        if broken or self._closed:
+            with self._lock:
+                self._workers.discard(worker)
+            worker.kill()
+        else:
+            self._idle.put(worker)
+        self._slots.release()
+
+    def shutdown(self):
+        self._closed = True
+        with self._lock:
+            workers, self._workers = list(self._workers), set()
+        for worker in workers:
+            worker.kill()
+
+
+def get_pdf_pool() -> Optional[PdfWorkerPool]:
+    """
+    Pool worker bersama, None jika R_PDF_WORKERS=0 (parsing di thread).
+    """
+    global _pool
+    if uconfig.pdf_workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PdfWorkerPool(uconfig.pdf_workers)
+    return _pool
+
+
+async def _acquire(pool: PdfWorkerPool) -> PdfWorker:
+    acquiring = asyncio.ensure_future(asyncio.to_thread(pool.acquire))
+    try:
+        return await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        # thread acquire tetap selesai; kembalikan worker yang didapatnya
+        acquiring.add_done_callback(lambda f: f.cancelled() or f.exception() or pool.release(f.result()))
+        raise
+
+
+async def aload_pdf(path: str) -> List["Document"]:
+    """
+    Parse PDF di pool worker dengan batas waktu R_PDF_TIMEOUT detik.
+    Jika waktunya habis, hanya worker yang mengerjakan PDF ini yang dihentikan.
+    """
+    pool = get_pdf_pool()
+    if pool is None:
+        return await asyncio.wait_for(asyncio.to_thread(load_pdf_elements, path), timeout=uconfig.pdf_timeout)
+
+    worker = await _acquire(pool)
+    try:
+        ok, result = await asyncio.wait_for(asyncio.to_thread(worker.run, path), timeout=uconfig.pdf_timeout)
+    except asyncio.TimeoutError:
+        await asyncio.to_thread(pool.release, worker, True)
+        raise TimeoutError(f"Parsing PDF melebihi {uconfig.pdf_timeout:.0f} detik")
+    except EOFError:
+        await asyncio.to_thread(pool.release, worker, True)
+        raise RuntimeError("Proses parsing PDF berhenti tiba-tiba")
+    except BaseException:
+        # dibatalkan di tengah parsing: worker masih sibuk, hentikan
+        await asyncio.shield(asyncio.to_thread(pool.release, worker, True))
+        raise
+    pool.release(worker)
+    if not ok:
+        raise result
+    return result
+
+
+def shutdown_pdf_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
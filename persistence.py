@@ -0,0 +1,113 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+#=================================================================#
+# Antrian write-behind untuk penulisan ke Supabase.               #
+# Route cukup submit() lalu langsung menjawab; worker di belakang #
+# menjalankan job, retry dengan backoff jika gagal, dan drain()    #
+# dipanggil saat shutdown supaya tidak ada tulisan yang hilang.   #
+#=================================================================#
+
+WriteJob = Callable[[], Awaitable[Any]]
+
+
+class PersistenceQueue:
+    def __init__(self, workers: int = 2, max_retries: int = 3, backoff: float = 0.5, maxsize: int = 10000):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.submitted = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.overflowed = 0
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def start(self):
+        self._ensure_started()
+
+    def submit(self, job: WriteJob) -> asyncio.Future:
+        """
+        Jadwalkan job. Future yang dikembalikan berisi hasil job (mis. baris
+        yang di-insert beserta id-nya) bagi pemanggil yang membutuhkannya.
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future))
+        self.submitted += 1
+        return future
+
+    async def submit_or_run(self, job: WriteJob) -> asyncio.Future:
+        """
+        Seperti submit(), tetapi jika antrian penuh job langsung dijalankan dan
+        ditunggu di sini (tanpa retry) alih-alih melempar QueueFull ke route.
+        """
+        try:
+            return self.submit(job)
+        except asyncio.QueueFull:
+            self.overflowed += 1
+        future = asyncio.get_running_loop().create_future()
+        try:
+            future.set_result(await job())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    async def _worker(self):
+        while True:
+            job, future = await self._queue.get()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        result = await job()
+                    except Exception as e:
+                        if attempt == self.max_retries:
+                            self.failed += 1
+                            print(f"GAGAL menyimpan data setelah {attempt + 1} percobaan: {e}")
+                            if not future.done():
+                                future.set_exception(e)
+                                # tidak semua pemanggil menunggu future-nya
+                                future.exception()
+                            break
+                        self.retried += 1
+                        await asyncio.sleep(self.backoff * 2 ** attempt)
+                    else:
+                        self.completed += 1
+                        if not future.done():
+                            future.set_result(result)
+                        break
+            finally:
+                self._queue.task_done()
+
+    async def drain(self, timeout: Optional[float] = None):
+        """
+        Tunggu semua job selesai lalu hentikan worker. Dipanggil saat shutdown.
+        """
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"Drain timeout, {self._queue.qsize()} job belum tersimpan.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "overflowed": self.overflowed,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+        }
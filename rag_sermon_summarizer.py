@@ -1,14 +1,20 @@
 import os
+import asyncio
+import re
+import threading
+import time
+from difflib import SequenceMatcher
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_pinecone import PineconeVectorStore
-from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
 from pydantic import SecretStr, BaseModel
-from typing import List
+from typing import TYPE_CHECKING, Any, AsyncIterator, List, Optional, Tuple, Union
+
+from answer_cache import get_answer_cache
+from config import uconfig
+from metrics import flag, record, span, token_usage_callback
+from singleflight import Flight, SingleFlight, normalize
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
 
 class SermonSummary(BaseModel):
     summary: str
@@ -18,33 +24,10 @@ load_dotenv()
 
 # load from env
 openai_api_key: SecretStr = SecretStr(os.getenv("OPENAI_API_KEY", ""))
-pinecone_api_key = os.getenv("PINECONE_API_KEY", "")
 index_name = os.getenv("PINECONE_INDEX_NAME", "khotbah-summarizer-app")
 
-# inisialisasi koneksi ke Pinecone
-pc = Pinecone(
-        api_key=pinecone_api_key
-        )
-
-# inisialisasi model embeddings
-embeddings_model = OpenAIEmbeddings(
-        model="text-embedding-3-small",
-        )
-
-# inisialisasi llm untuk tugas routing
-router_llm = ChatOpenAI(
-        model="gpt-4o-mini-2024-07-18",
-        temperature=0,
-        api_key=openai_api_key,
-        )
-
-# inisialisasi json parser untuk parsing output
-json_parser = JsonOutputParser()
-
 # prompt untuk menggunakan teknik few-shot prompting
-prompt_router = ChatPromptTemplate.from_messages([
-    ("system",
-     """Anda adalah AI router yang sangat efisien. Tugas Anda adalah menganalisis input pengguna terkait sebuah khotbah dan mengklasifikasikannya ke dalam salah satu dari tiga kategori niat: 'topic_summary', 'general_summary', atau 'irrelevant'.
+ROUTER_SYSTEM_PROMPT = """Anda adalah AI router yang sangat efisien. Tugas Anda adalah menganalisis input pengguna terkait sebuah khotbah dan mengklasifikasikannya ke dalam salah satu dari tiga kategori niat: 'topic_summary', 'general_summary', atau 'irrelevant'.
 
      - 'topic_summary': Gunakan ini jika pengguna menyebutkan topik, peristiwa, nama, atau pertanyaan spesifik. Ekstrak topik itu sebagai 'query'.
      - 'general_summary': Gunakan ini jika pengguna meminta ringkasan umum tanpa topik jelas. 'query' harus berupa kalimat perintah umum.
@@ -65,41 +48,21 @@ prompt_router = ChatPromptTemplate.from_messages([
      Input: "Terima kasih ya"
      Output: {{"intent": "irrelevant", "query": null}}
      """
-    ),
-    ("human", "Analisis input berikut: {user_input}"),
-    ])
-
-# merge semua komponen menjadi satu rantai
-# alurnya, prompt_router -> router_llm -> json_parser
-router_chain = prompt_router | router_llm | json_parser
-
-# menghubungkan ke vector database yang sudaha ada
-vectorstore = PineconeVectorStore.from_existing_index(
-        index_name=index_name,
-        embedding=embeddings_model,
-        )
 
-# buat retriever 
-# retriever = vectorstore.as_retriever(
-#         search_type="similarity_score_threshold",
-#         search_kwargs={
-#             'score_threshold': 0.75,
-#             'k': 10
-#         }
-#     )
-
-retriever = vectorstore.as_retriever(
-        search_kwargs={
-            'k': 5
-        }
-    )
+# menulis ulang pertanyaan lanjutan menjadi pertanyaan mandiri dari ringkasan percakapan
+REWRITE_SYSTEM_PROMPT = """Anda menulis ulang pertanyaan lanjutan dalam sebuah percakapan tentang khotbah.
+Gunakan RINGKASAN PERCAKAPAN untuk melengkapi rujukan yang tidak jelas (mis. "poin kedua", "itu", "ayat tadi")
+sehingga pertanyaan bisa dipahami tanpa membaca percakapan sebelumnya.
+Jika pertanyaan sudah jelas dengan sendirinya, kembalikan apa adanya.
+Jawab HANYA dengan pertanyaan hasil tulis ulang, dalam bahasa yang sama dengan pertanyaan aslinya."""
 
-# inisialiasi llm untuk summarization
-summarization_llm = ChatOpenAI(
-        model="gpt-4o-mini-2024-07-18", 
-        temperature=0.2, 
-        api_key=openai_api_key
-        )
+# memperbarui ringkasan percakapan dengan giliran terbaru
+CONVERSATION_SUMMARY_SYSTEM_PROMPT = """Anda menjaga ringkasan singkat dari sebuah percakapan tentang khotbah.
+Perbarui RINGKASAN SEBELUMNYA dengan GILIRAN BARU. Pertahankan topik, khotbah, ayat, dan poin bernomor
+yang sudah dibahas beserta urutannya supaya pertanyaan lanjutan bisa dirujuk. Buang basa-basi.
+Tulis maksimal {max_words} kata. Jawab HANYA dengan ringkasan yang sudah diperbarui."""
+
+RETRIEVER_K = 5
 
 prompt_template_text = """
 Anda adalah asisten AI yang ahli dalam teologi dan analisis teks keagamaan.
@@ -127,50 +90,771 @@ Sebelum menjawab, lakukan langkah-langkah internal berikut:
 JAWABAN ANDA:
 """
 
-RAG_PROMPT = PromptTemplate(
-        template=prompt_template_text,
-        input_variables=["context", "question"]
+FEATURED_SNIPPET_RE = re.compile(r"<featured-snippet>(.*?)</featured-snippet>", re.DOTALL)
+
+class RagPipeline:
+    """
+    Klien dan rantai yang berat (OpenAI, Pinecone/vector store, LangChain).
+    Dibuat sekali lewat get_pipeline() saat pertama dibutuhkan, bukan saat modul
+    di-import, supaya worker cepat boot dan gangguan layanan tidak menggagalkan startup.
+    Atributnya boleh diganti setelah dibuat (mis. fake di bench/harness.py).
+    """
+
+    def __init__(self):
+        from langchain_openai import ChatOpenAI
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+        from langchain.prompts import PromptTemplate
+        from langchain.chains import RetrievalQA
+
+        from context_builder import ContextBuilder
+        from embeddings import get_embeddings
+        from http_pool import openai_clients
+        from hybrid_retrieval import HybridRetriever
+        from intent_classifier import IntentClassifier
+        from lexical_index import get_lexical_index
+        from vector_store import get_vectorstore
+
+        # inisialisasi model embeddings (dipakai bersama & di-cache, lihat embeddings.py)
+        self.embeddings_model = get_embeddings()
+
+        # inisialisasi llm untuk tugas routing
+        self.router_llm = ChatOpenAI(
+                model="gpt-4o-mini-2024-07-18",
+                temperature=0,
+                api_key=openai_api_key,
+                **openai_clients(),
+                )
+
+        # inisialisasi json parser untuk parsing output
+        self.json_parser = JsonOutputParser()
+
+        self.prompt_router = ChatPromptTemplate.from_messages([
+            ("system", ROUTER_SYSTEM_PROMPT),
+            ("human", "Analisis input berikut: {user_input}"),
+            ])
+
+        # merge semua komponen menjadi satu rantai
+        # alurnya, prompt_router -> router_llm -> json_parser
+        self.router_chain = self.prompt_router | self.router_llm | self.json_parser
+
+        # menghubungkan ke vector database yang sudaha ada (Pinecone atau lokal, lihat vector_store.py)
+        self.vectorstore = get_vectorstore(self.embeddings_model)
+
+        # dense + BM25 lokal (R_RETRIEVER_MODE=hybrid), index leksikal diisi oleh ingestion
+        self.hybrid_retriever = HybridRetriever(
+                vectorstore=self.vectorstore,
+                lexical_index=get_lexical_index(),
+                k=uconfig.context_candidates,
+                fetch_k=uconfig.hybrid_fetch_k,
+                rrf_k=uconfig.rrf_k,
+                )
+
+        if uconfig.retriever_mode == "hybrid":
+            self.retriever = self.hybrid_retriever
+        else:
+            self.retriever = self.vectorstore.as_retriever(
+                    search_kwargs={
+                        'k': RETRIEVER_K
+                    }
+                )
+
+        # inisialiasi llm untuk summarization
+        self.summarization_llm = ChatOpenAI(
+                model="gpt-4o-mini-2024-07-18", 
+                temperature=0.2, 
+                api_key=openai_api_key,
+                # usage token juga dikirim saat streaming (dicatat di metrics.py)
+                stream_usage=True,
+                **openai_clients(),
+                )
+
+        self.rag_prompt = PromptTemplate(
+                template=prompt_template_text,
+                input_variables=["context", "question"]
+                )
+
+        # rantai tanpa retriever untuk mode streaming, dokumen diambil terpisah
+        self.stream_chain = self.rag_prompt | self.summarization_llm
+
+        # merge semua komponenen menjadi satu rantai RetrievalQA
+        self.rag_chain = RetrievalQA.from_chain_type(
+                llm=self.summarization_llm,
+                chain_type="stuff",
+                retriever=self.retriever,
+                return_source_documents=True,
+                chain_type_kwargs={"prompt": self.rag_prompt}
+                )
+
+        # klasifikasi niat lokal, router_chain hanya dipanggil jika tidak yakin
+        self.intent_classifier = IntentClassifier(self.embeddings_model, threshold=uconfig.intent_fast_threshold)
+
+        # kandidat retrieval -> konteks prompt (tanpa duplikat, MMR, dalam batas token)
+        self.context_builder = ContextBuilder(
+                token_budget=uconfig.context_token_budget,
+                max_chunks=uconfig.context_max_chunks,
+                mmr_lambda=uconfig.context_mmr_lambda,
+                duplicate_threshold=uconfig.context_duplicate_threshold,
+                )
+
+        # pertanyaan lanjutan -> pertanyaan mandiri, dari ringkasan percakapan (lihat conversation.py)
+        self.prompt_rewrite = ChatPromptTemplate.from_messages([
+            ("system", REWRITE_SYSTEM_PROMPT),
+            ("human", "RINGKASAN PERCAKAPAN:\n{summary}\n\nPERTANYAAN LANJUTAN:\n{question}"),
+            ])
+        self.rewrite_chain = self.prompt_rewrite | self.router_llm | StrOutputParser()
+
+        # ringkasan lama + giliran baru -> ringkasan baru, panjang output dibatasi
+        self.prompt_conversation_summary = ChatPromptTemplate.from_messages([
+            ("system", CONVERSATION_SUMMARY_SYSTEM_PROMPT),
+            ("human", "RINGKASAN SEBELUMNYA:\n{summary}\n\nGILIRAN BARU:\n{turns}"),
+            ])
+        self.conversation_summary_chain = (
+            self.prompt_conversation_summary
+            | self.router_llm.bind(max_tokens=uconfig.conversation_summary_tokens)
+            | StrOutputParser()
+            )
+
+        # usage token per panggilan LLM, lihat metrics.py
+        self.router_usage = token_usage_callback("router_llm")
+        self.summarization_usage = token_usage_callback("llm")
+        self.rewrite_usage = token_usage_callback("rewrite")
+        self.conversation_summary_usage = token_usage_callback("conversation_summary")
+
+    async def awarm_up(self):
+        """
+        Buka koneksi dan muat data yang biasanya baru dimuat oleh request pertama
+        (dipanggil dari warm-up di app.py).
+        """
+        from context_builder import count_tokens
+
+        await asyncio.to_thread(self.vectorstore.warm_up)
+        # memuat file encoding tiktoken
+        await asyncio.to_thread(count_tokens, "warm-up")
+        if uconfig.intent_fast_path:
+            await self.intent_classifier.awarm_up()
+
+
+_pipeline: Optional[RagPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> RagPipeline:
+    """
+    Pipeline bersama untuk proses ini, dibuat saat pertama dipanggil (thread-safe).
+    Jika gagal (mis. Pinecone tidak bisa dihubungi), panggilan berikutnya mencoba lagi.
+    """
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = RagPipeline()
+    return _pipeline
+
+
+async def aget_pipeline() -> RagPipeline:
+    """
+    get_pipeline() tanpa memblokir event loop pada pembuatan pertama.
+    """
+    if _pipeline is not None:
+        return _pipeline
+    return await asyncio.to_thread(get_pipeline)
+
+
+speculation_stats = {"used": 0, "discarded": 0}
+
+
+def _is_close_query(query: Optional[str], user_input: str) -> bool:
+    """
+    apakah query hasil routing cukup mirip dengan input mentah
+    sehingga hasil retrieval spekulatif boleh dipakai
+    """
+    if not query:
+        return False
+    a = " ".join(query.lower().split())
+    b = " ".join(user_input.lower().split())
+    return SequenceMatcher(None, a, b).ratio() >= uconfig.speculative_min_similarity
+
+
+def _discard(task: Optional[asyncio.Task]):
+    if task is not None and not task.done():
+        task.cancel()
+    if task is not None:
+        # hindari warning "Task exception was never retrieved"
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def _embed_query(p: RagPipeline, text: str) -> List[float]:
+    with span("embed_query"):
+        return await p.embeddings_model.aembed_query(text)
+
+
+async def _search_by_vector(p: RagPipeline, query: str, vector: List[float]) -> List["Document"]:
+    with span("retrieval"):
+        if uconfig.retriever_mode == "hybrid":
+            return await p.hybrid_retriever.asearch_by_vector(query, vector)
+        return await p.vectorstore.asimilarity_search_by_vector(vector, k=uconfig.context_candidates)
+
+
+async def _build_context(p: RagPipeline, candidates: List["Document"]) -> List["Document"]:
+    # tokenisasi di thread: tiktoken bisa memuat file encoding saat pertama dipakai
+    with span("context"):
+        return await asyncio.to_thread(p.context_builder.build, candidates)
+
+
+async def _lookup_answer(cache, vector: List[float]) -> Optional[dict]:
+    with span("answer_cache"):
+        cached = await cache.alookup(vector)
+    flag("answer_cache", cached is not None)
+    return cached
+
+
+async def _search(p: RagPipeline, query: str, vector_task: "asyncio.Task[List[float]]") -> List["Document"]:
+    return await _search_by_vector(p, query, await vector_task)
+
+
+async def _route(p: RagPipeline, user_input: str, vector_task: Optional[asyncio.Task] = None) -> dict:
+    """
+    tentukan intent & query, lewat fast-path lokal bila memungkinkan.
+    Router LLM dimulai bersamaan dengan embedding + classifier dan dibatalkan
+    jika classifier yakin, jadi input yang jatuh ke router tidak menunggu embedding dulu.
+    """
+    if not uconfig.intent_fast_path:
+        with span("router_llm"):
+            return await p.router_chain.ainvoke({"user_input": user_input}, config={"callbacks": [p.router_usage]})
+
+    router_task = asyncio.create_task(
+        p.router_chain.ainvoke({"user_input": user_input}, config={"callbacks": [p.router_usage]})
+    )
+    try:
+        vector = await vector_task if vector_task is not None else None
+        with span("intent_classifier"):
+            route = await p.intent_classifier.aclassify(user_input, vector=vector)
+    except BaseException:
+        _discard(router_task)
+        raise
+    flag("intent_fast_path", route is not None)
+    if route is not None:
+        _discard(router_task)
+        return route
+    # hanya sisa waktu router setelah classifier yang masih menambah latensi
+    with span("router_llm"):
+        return await router_task
+
+
+async def _prepare(p: RagPipeline, user_input: str) -> dict:
+    """
+    routing, cache lookup dan retrieval yang dipakai bersama oleh
+    asummarize_sermon dan astream_sermon. Kembalikan dict berisi
+    intent, query, query_vector, cached (payload cache atau None) dan source_docs
+    (sudah disaring context_builder).
+
+    Retrieval atas input mentah dijalankan spekulatif bersamaan dengan routing.
+    Hasilnya dipakai jika query hasil routing mirip dengan input, dan
+    dibatalkan jika intent-nya irrelevant atau query-nya berbeda jauh.
+    """
+    route = p.intent_classifier.classify_rules(user_input) if uconfig.intent_fast_path else None
+    if route is not None and route["intent"] not in ["topic_summary", "general_summary"]:
+        # sapaan / di luar topik: tanpa retrieval
+        return {**route, "query_vector": None, "cached": None, "source_docs": []}
+
+    vector_task = search_task = None
+    if route is None:
+        if uconfig.retriever_mode == "hybrid":
+            # referensi ayat (mis. "Yohanes 3:16") cukup dicari di index leksikal, tanpa embedding
+            exact_docs = await asyncio.to_thread(p.hybrid_retriever.lexical_only, user_input)
+            if exact_docs is not None:
+                return {"intent": "topic_summary", "query": user_input, "query_vector": None, "cached": None,
+                        "source_docs": await _build_context(p, exact_docs)}
+
+        if uconfig.speculative_retrieval:
+            vector_task = asyncio.create_task(_embed_query(p, user_input))
+            search_task = asyncio.create_task(_search(p, user_input, vector_task))
+
+        try:
+            route = await _route(p, user_input, vector_task)
+        except BaseException:
+            _discard(search_task)
+            _discard(vector_task)
+            raise
+
+    plan = {"intent": route["intent"], "query": route["query"], "query_vector": None, "cached": None, "source_docs": []}
+    if plan["intent"] not in ["topic_summary", "general_summary"]:
+        _discard(search_task)
+        _discard(vector_task)
+        return plan
+
+    if search_task is not None and _is_close_query(plan["query"], user_input):
+        speculation_stats["used"] += 1
+        flag("speculation", True)
+        plan["query_vector"] = await vector_task
+    else:
+        if search_task is not None:
+            speculation_stats["discarded"] += 1
+            flag("speculation", False)
+        _discard(search_task)
+        _discard(vector_task)
+        search_task = None
+        # embedding query dipakai dua kali: kunci cache dan pencarian vektor
+        plan["query_vector"] = route.get("query_vector") or await _embed_query(p, plan["query"])
+
+    cache = get_answer_cache()
+    if cache is not None:
+        plan["cached"] = await _lookup_answer(cache, plan["query_vector"])
+        if plan["cached"] is not None:
+            _discard(search_task)
+            return plan
+
+    if search_task is not None:
+        candidates = await search_task
+    else:
+        candidates = await _search_by_vector(p, plan["query"], plan["query_vector"])
+    plan["source_docs"] = await _build_context(p, candidates)
+    return plan
+
+
+async def _rewrite(p: RagPipeline, user_input: str, conversation: Optional[str]) -> str:
+    """
+    Tulis ulang pertanyaan lanjutan memakai ringkasan percakapan. Tanpa ringkasan,
+    atau jika input tertangkap aturan lokal (sapaan, terima kasih), input dipakai apa adanya.
+    """
+    if not conversation:
+        return user_input
+    if uconfig.intent_fast_path and p.intent_classifier.classify_rules(user_input) is not None:
+        return user_input
+
+    from context_builder import truncate_tokens
+
+    with span("rewrite"):
+        rewritten = await p.rewrite_chain.ainvoke(
+            {"summary": conversation, "question": truncate_tokens(user_input, uconfig.conversation_turn_tokens)},
+            config={"callbacks": [p.rewrite_usage]},
         )
+    return rewritten.strip() or user_input
+
+
+def _turn_text(question: str, answer: str) -> str:
+    """
+    satu giliran untuk prompt ringkasan: jawaban panjang cukup diwakili featured snippet-nya
+    """
+    from context_builder import truncate_tokens
+
+    match = FEATURED_SNIPPET_RE.search(answer)
+    if match:
+        answer = match.group(1).strip()
+    return (
+        f"User: {truncate_tokens(question, uconfig.conversation_turn_tokens)}\n"
+        f"Asisten: {truncate_tokens(answer, uconfig.conversation_turn_tokens)}"
+    )
+
 
-# merge semua komponenen menjadi satu rantai RetrievalQA
-rag_chain = RetrievalQA.from_chain_type(
-        llm=summarization_llm,
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": RAG_PROMPT}
+async def aupdate_conversation_summary(summary: str, turns: List[Tuple[str, str]]) -> str:
+    """
+    Ringkasan percakapan baru dari ringkasan lama + giliran (pertanyaan, jawaban) terbaru.
+    Input dan output dibatasi token, jadi biayanya tetap berapapun panjang percakapannya.
+    """
+    from context_builder import truncate_tokens
+
+    p = await aget_pipeline()
+    with span("conversation_summary"):
+        updated = await p.conversation_summary_chain.ainvoke(
+            {
+                "summary": summary or "(belum ada)",
+                "turns": "\n\n".join(_turn_text(question, answer) for question, answer in turns),
+                # perkiraan kasar ~1.3 token per kata bahasa Indonesia
+                "max_words": int(uconfig.conversation_summary_tokens / 1.3),
+            },
+            config={"callbacks": [p.conversation_summary_usage]},
         )
+    return truncate_tokens(updated.strip(), uconfig.conversation_summary_tokens)
+
+
+IRRELEVANT_SUMMARY = "Input tidak relevan dengan khotbah. Silakan berikan pertanyaan atau topik yang lebih spesifik."
 
 
-def summarize_sermon(user_input: str)-> SermonSummary:
+def _build_summary(rag_result: dict) -> SermonSummary:
     """
-    fungsi untuk meringkas khotbah berdasarkan input pengguna
+    ubah output rag_chain menjadi SermonSummary
     """
-    route = router_chain.invoke({"user_input": user_input})
-    intent = route["intent"]
-    query = route["query"]
+    from context_builder import unique_sources
+
+    # beberapa chunk bisa berasal dari PDF yang sama, sumber cukup disebut sekali
+    list_of_source = unique_sources(rag_result.get("source_documents", []))
 
-    summary: str = ""
-    source_documents = []
+    return SermonSummary(
+        summary=rag_result.get("result", "Tidak ada ringkasan yang ditemukan."),
+        source_documents=list_of_source
+    )
+
+
+async def _asummarize_sermon(user_input: str, conversation: Optional[str] = None) -> SermonSummary:
+    """
+    versi async dari summarize_sermon, memakai ainvoke supaya
+    panggilan ke OpenAI dan Pinecone tidak memblokir event loop.
+    `conversation` adalah ringkasan percakapan sebelumnya (lihat conversation.py).
+    """
+    p = await aget_pipeline()
+    user_input = await _rewrite(p, user_input, conversation)
+    plan = await _prepare(p, user_input)
+    intent = plan["intent"]
+    query = plan["query"]
 
     print("masih berpikir...")
 
     if intent == "irrelevant":
-        summary = "Input tidak relevan dengan khotbah. Silakan berikan pertanyaan atau topik yang lebih spesifik."
+        return SermonSummary(summary=IRRELEVANT_SUMMARY, source_documents=[])
     elif intent in ["topic_summary", "general_summary"]:
-        rag_result = rag_chain.invoke({"query": query})
-        list_of_source = []
+        if plan["cached"] is not None:
+            return SermonSummary(**plan["cached"])
 
-        source_docs = rag_result.get("source_documents", [])
-        if source_docs:
-            for i, doc in enumerate(source_docs):
-                source_file = doc.metadata.get("source", "N/A")
-                list_of_source.append(source_file)
+        with span("llm"):
+            answer = await p.rag_chain.combine_documents_chain.ainvoke(
+                {"input_documents": plan["source_docs"], "question": query},
+                config={"callbacks": [p.summarization_usage]},
+            )
+        result = _build_summary({"result": answer["output_text"], "source_documents": plan["source_docs"]})
 
-        summary = rag_result.get("result", "Tidak ada ringkasan yang ditemukan.")
-        source_documents = list_of_source
+        cache = get_answer_cache()
+        if cache is not None and plan["query_vector"] is not None:
+            await cache.astore(query, plan["query_vector"], result.model_dump())
+        return result
 
-    return SermonSummary(
-        summary=summary,
-        source_documents=source_documents
+    return SermonSummary(summary="", source_documents=[])
+
+
+def _format_context(docs: List["Document"]) -> str:
+    """
+    gabungkan isi dokumen seperti chain "stuff" milik RetrievalQA
+    """
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def _summary_events(summary: str, source_documents: List[str]) -> List[Tuple[str, Any]]:
+    """
+    jawaban yang sudah jadi (cache atau hasil non-streaming) sebagai event streaming
+    """
+    events = []
+    match = FEATURED_SNIPPET_RE.search(summary)
+    if match:
+        events.append(("snippet", match.group(1).strip()))
+    events.append(("token", summary))
+    events.append(("sources", source_documents))
+    return events
+
+
+async def _astream_sermon(user_input: str, conversation: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    versi streaming dari asummarize_sermon. Menghasilkan pasangan (event, data):
+    - ("snippet", str): isi <featured-snippet> begitu tag penutupnya selesai dibuat
+    - ("token", str): potongan jawaban dari summarization_llm
+    - ("sources", List[str]): daftar sumber, selalu menjadi event terakhir
+    """
+    p = await aget_pipeline()
+    user_input = await _rewrite(p, user_input, conversation)
+    plan = await _prepare(p, user_input)
+    intent = plan["intent"]
+    query = plan["query"]
+
+    print("masih berpikir...")
+
+    if intent == "irrelevant":
+        yield "token", IRRELEVANT_SUMMARY
+        yield "sources", []
+        return
+    elif intent not in ["topic_summary", "general_summary"]:
+        yield "sources", []
+        return
+
+    cached = plan["cached"]
+    if cached is not None:
+        for event in _summary_events(cached["summary"], cached["source_documents"]):
+            yield event
+        return
+
+    source_docs = plan["source_docs"]
+
+    answer = ""
+    snippet_sent = False
+    start = time.perf_counter()
+    async for chunk in p.stream_chain.astream(
+        {"context": _format_context(source_docs), "question": query},
+        config={"callbacks": [p.summarization_usage]},
+    ):
+        if not chunk.content:
+            continue
+        if not answer:
+            record("llm_first_token", time.perf_counter() - start)
+        answer += chunk.content
+        yield "token", chunk.content
+
+        if not snippet_sent:
+            match = FEATURED_SNIPPET_RE.search(answer)
+            if match:
+                snippet_sent = True
+                yield "snippet", match.group(1).strip()
+
+    record("llm", time.perf_counter() - start)
+    result = _build_summary({"result": answer, "source_documents": source_docs})
+    cache = get_answer_cache()
+    if cache is not None and plan["query_vector"] is not None:
+        await cache.astore(query, plan["query_vector"], result.model_dump())
+
+    yield "sources", result.source_documents
+
+
+#=====================================================================#
+# Single-flight (lihat singleflight.py): pertanyaan yang sama (setelah #
+# dinormalisasi, dengan ringkasan percakapan yang sama) berbagi satu   #
+# komputasi selama masih berjalan. Pengikut non-streaming memakai      #
+# hasil komputasi streaming dan sebaliknya.                            #
+#=====================================================================#
+
+_single_flight = SingleFlight()
+
+
+def single_flight_stats() -> dict:
+    return _single_flight.stats()
+
+
+def _flight_key(user_input: str, conversation: Optional[str]) -> str:
+    # follow-up hanya identik jika ringkasan percakapannya juga sama
+    return f"{normalize(user_input)}\x00{conversation or ''}"
+
+
+def _join(user_input: str, conversation: Optional[str], stream: bool) -> Flight:
+    async def produce_summary(flight: Flight) -> SermonSummary:
+        result = await _asummarize_sermon(user_input, conversation)
+        for event in _summary_events(result.summary, result.source_documents):
+            flight.publish(*event)
+        return result
+
+    async def produce_stream(flight: Flight) -> SermonSummary:
+        answer = ""
+        sources: List[str] = []
+        async for event, data in _astream_sermon(user_input, conversation):
+            flight.publish(event, data)
+            if event == "token":
+                answer += data
+            elif event == "sources":
+                sources = data
+        return SermonSummary(summary=answer, source_documents=sources)
+
+    flight, leader = _single_flight.join(
+        _flight_key(user_input, conversation),
+        produce_stream if stream else produce_summary,
     )
+    flag("single_flight", not leader)
+    return flight
+
+
+async def asummarize_sermon(user_input: str, conversation: Optional[str] = None) -> SermonSummary:
+    """
+    Jawaban untuk `user_input`; request identik yang sedang berjalan dipakai bersama (R_SINGLE_FLIGHT=1).
+    """
+    if not uconfig.single_flight:
+        return await _asummarize_sermon(user_input, conversation)
+    return await _join(user_input, conversation, stream=False).result()
+
+
+async def astream_sermon(user_input: str, conversation: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Versi streaming, event-nya sama dengan _astream_sermon. Pengikut menerima
+    ulang semua event yang sudah keluar lalu event berikutnya secara langsung.
+    """
+    if not uconfig.single_flight:
+        async for event in _astream_sermon(user_input, conversation):
+            yield event
+        return
+    async for event in _join(user_input, conversation, stream=True).subscribe():
+        yield event
+
+
+def summarize_sermon(user_input: str) -> SermonSummary:
+    """
+    fungsi untuk meringkas khotbah berdasarkan input pengguna
+    (versi sinkron untuk skrip seperti test.py, jangan dipanggil dari dalam event loop)
+    """
+    return asyncio.run(asummarize_sermon(user_input))
+
+
+#=====================================================================#
+# Batch (tool admin, generator FAQ): setiap tahap dikerjakan untuk     #
+# semua pertanyaan sekaligus. Embedding dalam satu request, routing    #
+# lewat router_chain.abatch, vector query berjalan paralel, dan        #
+# panggilan LLM dibatasi R_BATCH_LLM_CONCURRENCY. Error satu           #
+# pertanyaan tidak menggagalkan pertanyaan lain.                       #
+#=====================================================================#
+
+
+async def _gather_bounded(coros: list, limit: int) -> list:
+    """
+    asyncio.gather dengan maksimal `limit` coroutine berjalan bersamaan; exception ikut dikembalikan.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*[run(coro) for coro in coros], return_exceptions=True)
+
+
+async def asummarize_sermons(user_inputs: List[str]) -> List[Union[SermonSummary, Exception]]:
+    """
+    Jawab banyak pertanyaan sekaligus. Hasil berurutan sesuai `user_inputs`:
+    SermonSummary, atau Exception untuk pertanyaan yang gagal.
+    Pertanyaan yang identik (setelah dinormalisasi) hanya dijawab sekali.
+    """
+    p = await aget_pipeline()
+
+    unique: dict = {}
+    for text in user_inputs:
+        unique.setdefault(normalize(text), text)
+    texts = list(unique.values())
+    n = len(texts)
+    routes: List[Optional[dict]] = [None] * n
+    input_vectors: List[Optional[List[float]]] = [None] * n
+    query_vectors: List[Optional[List[float]]] = [None] * n
+    candidates: List[Optional[List["Document"]]] = [None] * n
+    results: List[Optional[SermonSummary]] = [None] * n
+    errors: dict = {}
+
+    def pending() -> List[int]:
+        return [i for i in range(n) if routes[i] is None and i not in errors]
+
+    # 1. aturan lokal dan referensi ayat, tanpa embedding maupun LLM
+    if uconfig.intent_fast_path:
+        for i, text in enumerate(texts):
+            routes[i] = p.intent_classifier.classify_rules(text)
+    if uconfig.retriever_mode == "hybrid":
+        todo = pending()
+        exact = await asyncio.gather(
+            *[asyncio.to_thread(p.hybrid_retriever.lexical_only, texts[i]) for i in todo], return_exceptions=True
+        )
+        for i, docs in zip(todo, exact):
+            if isinstance(docs, BaseException):
+                errors[i] = docs
+            elif docs is not None:
+                routes[i] = {"intent": "topic_summary", "query": texts[i]}
+                candidates[i] = docs
+
+    # 2. klasifikasi niat lokal dari satu batch embedding input;
+    #    jika batch embedding gagal, semuanya cukup lewat router LLM di langkah 3
+    todo = pending()
+    if uconfig.intent_fast_path and todo:
+        try:
+            with span("embed_query"):
+                vectors = await p.embeddings_model.aembed_documents([texts[i] for i in todo])
+        except Exception as e:
+            print(f"Batch embedding input gagal, semua pertanyaan lewat router LLM: {e}")
+        else:
+            with span("intent_classifier"):
+                for i, vector in zip(todo, vectors):
+                    input_vectors[i] = vector
+                    routes[i] = await p.intent_classifier.aclassify(texts[i], vector=vector)
+
+    # 3. sisanya lewat router LLM dalam satu batch
+    todo = pending()
+    if todo:
+        with span("router_llm"):
+            routed = await p.router_chain.abatch(
+                [{"user_input": texts[i]} for i in todo],
+                config={"callbacks": [p.router_usage], "max_concurrency": uconfig.batch_llm_concurrency},
+                return_exceptions=True,
+            )
+        for i, route in zip(todo, routed):
+            if isinstance(route, BaseException):
+                errors[i] = route
+            else:
+                routes[i] = route
+
+    answerable = [
+        i for i in range(n)
+        if i not in errors and routes[i].get("intent") in ["topic_summary", "general_summary"]
+    ]
+
+    # 4. embedding query yang belum ada, juga dalam satu batch
+    for i in answerable:
+        if routes[i].get("query_vector") is not None:
+            query_vectors[i] = routes[i]["query_vector"]
+        elif input_vectors[i] is not None and routes[i]["query"] == texts[i]:
+            query_vectors[i] = input_vectors[i]
+    todo = [i for i in answerable if query_vectors[i] is None and candidates[i] is None]
+    if todo:
+        try:
+            with span("embed_query"):
+                vectors = await p.embeddings_model.aembed_documents([routes[i]["query"] for i in todo])
+        except Exception as e:
+            # satu input bermasalah tidak boleh menggagalkan semuanya: ulangi per pertanyaan
+            print(f"Batch embedding query gagal, diulang per pertanyaan: {e}")
+            vectors = await _gather_bounded(
+                [_embed_query(p, routes[i]["query"]) for i in todo], uconfig.batch_retrieval_concurrency
+            )
+        for i, vector in zip(todo, vectors):
+            if isinstance(vector, BaseException):
+                errors[i] = vector
+            else:
+                query_vectors[i] = vector
+
+    cache = get_answer_cache()
+    if cache is not None:
+        for i in answerable:
+            if i not in errors and query_vectors[i] is not None:
+                cached = await _lookup_answer(cache, query_vectors[i])
+                if cached is not None:
+                    results[i] = SermonSummary(**cached)
+
+    # 5. vector query paralel, lalu susun konteks per pertanyaan
+    todo = [i for i in answerable if i not in errors and results[i] is None and candidates[i] is None]
+    found = await _gather_bounded(
+        [_search_by_vector(p, routes[i]["query"], query_vectors[i]) for i in todo],
+        uconfig.batch_retrieval_concurrency,
+    )
+    for i, docs in zip(todo, found):
+        if isinstance(docs, BaseException):
+            errors[i] = docs
+        else:
+            candidates[i] = docs
+
+    todo = [i for i in answerable if i not in errors and results[i] is None]
+    contexts = await asyncio.gather(*[_build_context(p, candidates[i]) for i in todo], return_exceptions=True)
+
+    # 6. jawaban LLM, concurrency dibatasi
+    todo_llm = []
+    for i, docs in zip(todo, contexts):
+        if isinstance(docs, BaseException):
+            errors[i] = docs
+        else:
+            todo_llm.append((i, docs))
+    if todo_llm:
+        with span("llm"):
+            answers = await p.rag_chain.combine_documents_chain.abatch(
+                [{"input_documents": docs, "question": routes[i]["query"]} for i, docs in todo_llm],
+                config={"callbacks": [p.summarization_usage], "max_concurrency": uconfig.batch_llm_concurrency},
+                return_exceptions=True,
+            )
+        for (i, docs), answer in zip(todo_llm, answers):
+            if isinstance(answer, BaseException):
+                errors[i] = answer
+                continue
+            results[i] = _build_summary({"result": answer["output_text"], "source_documents": docs})
+            if cache is not None and query_vectors[i] is not None:
+                await cache.astore(routes[i]["query"], query_vectors[i], results[i].model_dump())
+
+    for i in range(n):
+        if i in errors or results[i] is not None:
+            continue
+        if routes[i].get("intent") == "irrelevant":
+            results[i] = SermonSummary(summary=IRRELEVANT_SUMMARY, source_documents=[])
+        else:
+            results[i] = SermonSummary(summary="", source_documents=[])
+
+    by_key = {key: errors.get(i) or results[i] for i, key in enumerate(unique)}
+    return [by_key[normalize(text)] for text in user_inputs]
+
+
+def summarize_sermons(user_inputs: List[str]) -> List[Union[SermonSummary, Exception]]:
+    """
+    versi sinkron dari asummarize_sermons (untuk skrip, jangan dipanggil dari dalam event loop)
+    """
+    return asyncio.run(asummarize_sermons(user_inputs))
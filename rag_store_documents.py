@@ -1,27 +1,32 @@
+import asyncio
+import hashlib
+import logging
 import os
-import tempfile
-from typing import List
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
 
 from dotenv import load_dotenv
-from fastapi import UploadFile
-from langchain_core.documents import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-# from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.document_loaders import UnstructuredPDFLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone
-from supabase import create_client, Client
-
-from langchain_core.documents import Document
-from langchain_community.document_loaders import UnstructuredPDFLoader
-from langchain_experimental.text_splitter import SemanticChunker
+
+from answer_cache import get_answer_cache
+from config import uconfig
+from metrics import span
+from pdf_parsing import aload_pdf
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from supabase import Client
+
+    from chunking import Chunk, SentenceEmbeddingChunker
 
 # Muat environment variables dari file .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # --- HELPER FUNCTION UNTUK MEMBERSIHKAN METADATA ---
-def clean_pinecone_metadata(docs: List[Document]) -> List[Document]:
+def clean_pinecone_metadata(docs: List["Document"]) -> List["Document"]:
     """
     Menghapus atau mengubah tipe data metadata yang tidak didukung oleh Pinecone.
     Pinecone hanya mendukung: string, number, boolean, atau list of strings.
@@ -36,30 +41,47 @@ def clean_pinecone_metadata(docs: List[Document]) -> List[Document]:
         doc.metadata = cleaned_meta
     return docs
 
-# --- INISIALISASI KLIEN (dilakukan sekali saat modul dimuat) ---
-try:
-    # Kredensial Supabase
-    # SUPABASE_URL: str = os.environ["R_SUPABASE_URL"]
-    # SUPABASE_KEY: str = os.environ["R_SUPABASE_KEY"]
-    # supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Nama Bucket & Folder Supabase
+BUCKET_NAME: str = os.environ.get("SUPABASE_BUCKET", "dataset-khotbah")
+FOLDER_PATH: str = os.environ.get("SUPABASE_FOLDER", "khotbah")
 
-    # Nama Bucket & Folder Supabase
-    BUCKET_NAME: str = os.environ.get("SUPABASE_BUCKET", "dataset-khotbah")
-    FOLDER_PATH: str = os.environ.get("SUPABASE_FOLDER", "khotbah")
+# Nama index Pinecone (tidak dibutuhkan untuk R_VECTOR_BACKEND=local)
+INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "khotbah-summarizer-app")
 
-    # Kredensial Pinecone
-    PINECONE_API_KEY = os.environ["PINECONE_API_KEY"]
-    INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "khotbah-summarizer-app")
+# --- INISIALISASI KLIEN (lazy, saat pertama dipakai oleh ingestion) ---
+# Embedding, vector store dan index leksikal dipakai bersama dengan
+# rag_sermon_summarizer.py (lihat embeddings.py, vector_store.py, lexical_index.py).
+# Kredensial yang hilang atau layanan yang mati menjadi error di job ingestion,
+# bukan menghentikan proses saat startup.
 
-    # Inisialisasi Klien Pinecone
-    pc = Pinecone(api_key=PINECONE_API_KEY)
+def get_embeddings_model():
+    from embeddings import get_embeddings
 
-    # Inisialisasi Model Embedding OpenAI
-    embeddings_model = OpenAIEmbeddings(model='text-embedding-3-small')
-    
-    # Inisialisasi Pinecone Vector Store
-    vectorstore = PineconeVectorStore(index_name=INDEX_NAME, embedding=embeddings_model)
-    
+    # Model Embedding OpenAI (dipakai bersama & di-cache, lihat embeddings.py)
+    return get_embeddings()
+
+def get_store():
+    """
+    Vector store bersama (Pinecone atau lokal, lihat vector_store.py).
+    """
+    from vector_store import get_vectorstore
+
+    if uconfig.vector_backend == "pinecone" and not os.environ.get("PINECONE_API_KEY"):
+        raise RuntimeError("Environment variable PINECONE_API_KEY tidak ditemukan. Pastikan file .env sudah benar.")
+    return get_vectorstore(get_embeddings_model())
+
+def get_lexical_store():
+    """
+    Index BM25 lokal untuk retriever hybrid, diperbarui bersama vector store.
+    """
+    from lexical_index import get_lexical_index
+
+    return get_lexical_index()
+
+_text_splitter: Optional["SentenceEmbeddingChunker"] = None
+_text_splitter_lock = threading.Lock()
+
+def get_text_splitter() -> "SentenceEmbeddingChunker":
     # Inisialisasi Text Splitter
     # text_splitter = RecursiveCharacterTextSplitter(
     #     chunk_size=250,
@@ -67,111 +89,370 @@ try:
     #     length_function=len,
     #     is_separator_regex=False,
     # )
-    text_splitter = SemanticChunker(
-        embeddings_model, breakpoint_threshold_type="percentile"
+    # text_splitter = SemanticChunker(
+    #     embeddings_model, breakpoint_threshold_type="percentile"
+    # )
+    # Chunker yang memakai ulang embedding kalimat dari pencarian breakpoint
+    # (mode "fixed" = RecursiveCharacterTextSplitter di atas)
+    global _text_splitter
+    if _text_splitter is None:
+        with _text_splitter_lock:
+            if _text_splitter is None:
+                from chunking import SentenceEmbeddingChunker
+
+                _text_splitter = SentenceEmbeddingChunker(
+                    get_embeddings_model(), mode=uconfig.chunking_mode, reembed_below=uconfig.chunk_reembed_below
+                )
+    return _text_splitter
+
+# --- FILE YANG SIAP DIPROSES ---
+@dataclass
+class IngestFile:
+    """
+    File PDF yang sudah disimpan ke disk (UploadFile tidak bisa dibaca lagi
+    setelah request selesai, jadi job ingestion bekerja dari path ini).
+    """
+    filename: str
+    path: str
+    size: int
+    sha256: Optional[str] = None
+
+ProgressCallback = Callable[..., None]
+
+def _no_progress(filename: str, stage: str, **info):
+    pass
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(doc_id, text: str) -> str:
+    """
+    ID vektor deterministik: doc_id + hash isi chunk. Chunk yang sama selalu
+    mendapat ID yang sama, jadi upsert ulang tidak menambah duplikat.
+    """
+    return f"{doc_id}#{hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]}"
+
+def list_chunk_ids(doc_id) -> Set[str]:
+    """
+    Semua ID vektor milik doc_id (prefix listing).
+    """
+    try:
+        return set(get_store().list_ids(f"{doc_id}#"))
+    except Exception as e:
+        # index pod-based tidak mendukung list, upsert tetap idempotent karena ID deterministik
+        print(f"Peringatan: tidak bisa melihat vektor lama untuk doc_id {doc_id}: {e}")
+        return set()
+
+def upsert_chunks(chunks: List["Chunk"], ids: List[str], batch_size: int = 100):
+    """
+    Simpan chunk ke vector store. Vektor yang sudah dihasilkan chunker dipakai langsung,
+    hanya chunk tanpa vektor yang di-embed (sekali batch). Chunk yang sama juga
+    didaftarkan ke index leksikal.
+    """
+    with span("ingest_embedding"):
+        vectors = get_text_splitter().embed_missing(chunks)
+    with span("ingest_upsert"):
+        get_store().upsert_embeddings(ids, vectors, [chunk.document for chunk in chunks], batch_size=batch_size)
+        get_lexical_store().add(ids, [chunk.document for chunk in chunks])
+
+async def delete_document(filename: str, db_client: "Client") -> Optional[dict]:
+    """
+    Hapus satu dokumen knowledge base: vektornya di vector store, file di bucket, lalu
+    baris files (terakhir, supaya reconcile.py masih bisa membereskan jika gagal di tengah).
+    Kembalikan None jika tidak ada dokumen dengan nama itu.
+    """
+    response = await asyncio.to_thread(
+        db_client.table("files").select("id, name").eq("name", filename).limit(1).execute
+    )
+    if not response.data:
+        return None
+    doc_id = response.data[0]["id"]
+
+    removed = await asyncio.to_thread(lambda: get_store().delete_doc(doc_id))
+    await asyncio.to_thread(lambda: get_lexical_store().delete_doc(doc_id))
+    await asyncio.to_thread(db_client.storage.from_(BUCKET_NAME).remove, [f"{FOLDER_PATH}/{filename}"])
+    await asyncio.to_thread(db_client.table("files").delete().eq("id", doc_id).execute)
+    print(f"Dokumen {filename} (doc_id {doc_id}) dihapus, {removed} vektor ikut dihapus.")
+
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        await answer_cache.ainvalidate()
+    return {"doc_id": doc_id, "vectors_removed": removed}
+
+async def _find_file_rows(file: IngestFile, db_client: "Client"):
+    """
+    Cari baris files dengan isi yang sama (hash) dan dengan nama yang sama.
+    """
+    by_hash, by_name = await asyncio.gather(
+        asyncio.to_thread(db_client.table("files").select("id, name").eq("content_hash", file.sha256).limit(1).execute),
+        asyncio.to_thread(db_client.table("files").select("id, content_hash").eq("name", file.filename).limit(1).execute),
     )
-    print("Klien dan model berhasil diinisialisasi.")
+    return (by_hash.data[0] if by_hash.data else None), (by_name.data[0] if by_name.data else None)
+
+async def _timed(stage: str, awaitable):
+    with span(stage):
+        return await awaitable
+
+async def _upload_file(file: IngestFile, db_client: "Client", file_path_in_bucket: str, public_url: str, existing_row, store_object: bool = True):
+    """
+    Upload ke Supabase Storage lalu catat di tabel files, kembalikan baris files.
+    File dengan nama yang sudah ada memakai ulang baris (dan doc_id) lamanya.
+    `store_object=False` untuk file yang sudah ada di bucket (reindex).
+    """
+    if store_object:
+        # 'upsert=True' akan menimpa file jika namanya sudah ada
+        await asyncio.to_thread(
+            db_client.storage.from_(BUCKET_NAME).upload,
+            path=file_path_in_bucket,
+            file=file.path,
+            file_options={"cache-control": "3600", "upsert": "true", "content-type": "application/pdf"}
+        )
+        print(f"Berhasil upload & mendapatkan URL: {public_url}")
+
+    # content_hash baru ditulis setelah vektornya tersimpan (lihat _mark_indexed);
+    # sampai saat itu baris ini tidak boleh dianggap "sudah diindeks"
+    row = {
+        "name": file.filename,
+        "size": file.size,
+        "type": "application/pdf",
+        "url": public_url,
+        "content_hash": None,
+    }
+    if existing_row is not None:
+        response_table = await asyncio.to_thread(
+            db_client.table("files").update(row).eq("id", existing_row["id"]).execute
+        )
+    else:
+        response_table = await asyncio.to_thread(db_client.table("files").insert(row).execute)
+    logger.info("Berhasil menyimpan metadata file %s ke Supabase Table (files)", file.filename)
+    return response_table.data[0] if response_table.data else existing_row
+
+async def _prepare_file(file: IngestFile, db_client: "Client", on_progress: ProgressCallback, reindex: bool = False):
+    """
+    Upload (ke Storage + tabel files) dan parsing PDF (di process pool) untuk satu file,
+    keduanya berjalan bersamaan. File yang isinya sudah pernah diindeks dilewati,
+    kecuali `reindex` (file diambil dari bucket dan cukup diindeks ulang).
+    Kembalikan (documents, info); info None jika gagal, info["skipped"] jika dilewati.
+    """
+    file_path_in_bucket = f"{FOLDER_PATH}/{file.filename}"
+    # URL publik hanya dibangun dari path, bisa didapat sebelum upload selesai
+    public_url = db_client.storage.from_(BUCKET_NAME).get_public_url(file_path_in_bucket)
+
+    try:
+        if file.sha256 is None:
+            file.sha256 = await asyncio.to_thread(file_sha256, file.path)
+        same_content, same_name = await _find_file_rows(file, db_client)
+    except Exception as e:
+        print(f"GAGAL memproses file {file.filename}: {e}")
+        on_progress(file.filename, "error", error=str(e))
+        return [], None
+
+    if same_content is not None and not reindex:
+        print(f"File {file.filename} tidak berubah (sama dengan {same_content['name']}), dilewati.")
+        on_progress(file.filename, "skipped")
+        return [], {"filename": file.filename, "url": public_url, "skipped": True}
 
-except KeyError as e:
-    print(f"Error: Environment variable tidak ditemukan -> {e}. Pastikan file .env sudah benar.")
-    exit()
-except Exception as e:
-    print(f"Gagal menginisialisasi klien: {e}")
-    exit()
+    on_progress(file.filename, "uploading")
+    upload_task = asyncio.create_task(_timed(
+        "ingest_upload",
+        _upload_file(file, db_client, file_path_in_bucket, public_url, same_name, store_object=not reindex),
+    ))
+    parse_task = asyncio.create_task(_timed("ingest_parse", aload_pdf(file.path)))
+    try:
+        on_progress(file.filename, "parsing")
+        file_row, documents_per_file = await asyncio.gather(upload_task, parse_task)
+    except Exception as e:
+        upload_task.cancel()
+        parse_task.cancel()
+        print(f"GAGAL memproses file {file.filename}: {e}")
+        on_progress(file.filename, "error", error=str(e))
+        return [], None
+
+    # Perbarui metadata 'source' dengan URL Supabase
+    # + Tambahkan metadata doc_id sebagai foreign key 
+    # (doc_id berisi id dari uuid file yang diupload ke supabase table)
+    for doc in documents_per_file:
+        doc.metadata['source'] = public_url
+        doc.metadata['filename'] = file.filename
+        doc.metadata['doc_id'] = file_row['id']
+
+    on_progress(file.filename, "parsed", elements=len(documents_per_file))
+    return documents_per_file, {
+        "filename": file.filename,
+        "url": public_url,
+        "doc_id": file_row["id"],
+        "replaced": same_name is not None,
+        "content_hash": file.sha256,
+    }
+
+async def _mark_indexed(processed_files_info: List[dict], db_client: "Client"):
+    """
+    Tulis content_hash setelah upsert berhasil. Jika gagal, upload berikutnya
+    dengan isi yang sama diindeks ulang (idempoten karena ID chunk deterministik).
+    """
+    results = await asyncio.gather(*[
+        asyncio.to_thread(
+            db_client.table("files").update({"content_hash": info["content_hash"]}).eq("id", info["doc_id"]).execute
+        )
+        for info in processed_files_info
+    ], return_exceptions=True)
+    for info, result in zip(processed_files_info, results):
+        if isinstance(result, BaseException):
+            print(f"Gagal menyimpan content_hash untuk {info['filename']}: {result}")
+
+async def _dedupe_by_hash(files: List[IngestFile], on_progress: ProgressCallback):
+    """
+    Hitung hash yang belum ada, lalu pisahkan file dengan isi identik dalam satu batch:
+    hanya yang pertama diproses, sisanya dilewati (tanpa ini semuanya lolos cek
+    _find_file_rows bersamaan dan diindeks berkali-kali).
+    Kembalikan (file unik, info file duplikat yang dilewati).
+    """
+    hashes = await asyncio.gather(*[
+        asyncio.to_thread(file_sha256, file.path) if file.sha256 is None else asyncio.sleep(0, file.sha256)
+        for file in files
+    ], return_exceptions=True)
+    unique: Dict[str, IngestFile] = {}
+    skipped = []
+    for file, sha256 in zip(files, hashes):
+        if isinstance(sha256, BaseException):
+            print(f"GAGAL memproses file {file.filename}: {sha256}")
+            on_progress(file.filename, "error", error=str(sha256))
+            continue
+        file.sha256 = sha256
+        first = unique.setdefault(sha256, file)
+        if first is not file:
+            print(f"File {file.filename} isinya sama dengan {first.filename} dalam batch ini, dilewati.")
+            on_progress(file.filename, "skipped")
+            skipped.append({"filename": file.filename, "skipped": True, "duplicate_of": first.filename})
+    return list(unique.values()), skipped
 
 # --- FUNGSI UTAMA UNTUK MEMPROSES FILE ---
-async def process_and_add_documents(files: List[UploadFile], db_client: Client) -> dict:
+async def process_and_add_documents(
+    files: List[IngestFile],
+    db_client: "Client",
+    on_progress: ProgressCallback = _no_progress,
+    reindex: bool = False,
+) -> dict:
     """
     Menerima file PDF, mengunggahnya ke Supabase, memprosesnya, 
-    dan menambahkan vektornya ke Pinecone.
+    dan menambahkan vektornya ke vector store.
+    `on_progress(filename, stage, **info)` dipanggil setiap kali sebuah file
+    berpindah tahap: uploading, parsing, chunking, embedding, done, skipped, error.
+    File yang isinya (sha256) sudah pernah diindeks dilewati, dan vektor disimpan
+    dengan ID deterministik doc_id#hash-chunk sehingga ingest ulang bersifat idempoten.
+    Parsing PDF berjalan di process pool (lihat pdf_parsing.py), pekerjaan lain
+    yang memblokir dijalankan di thread supaya event loop tetap bebas.
+    `reindex=True` dipakai reconcile.py untuk file yang sudah ada di bucket.
     """
     all_new_documents = []
     processed_files_info = []
 
-    # Buat direktori sementara yang unik untuk pemrosesan ini
-    with tempfile.TemporaryDirectory() as temp_dir:
-        for file in files:
-            if not file.filename:
-                print("Peringatan: Ditemukan file unggahan tanpa nama, file ini dilewati.")
-                continue 
-
-            file_path_in_bucket = f"{FOLDER_PATH}/{file.filename}"
-            temp_file_path = os.path.join(temp_dir, file.filename)
-
-            try:
-                # 1. Simpan file yang diunggah ke disk sementara
-                content = await file.read()
-                with open(temp_file_path, "wb") as f:
-                    f.write(content)
-
-                # 2. Upload file ke Supabase Storage
-                # 'upsert=True' akan menimpa file jika namanya sudah ada
-
-                db_client.storage.from_(BUCKET_NAME).upload(
-                    path=file_path_in_bucket,
-                    file=temp_file_path,
-                    file_options={"cache-control": "3600", "upsert": "true", "content-type": "application/pdf"}
-                )
+    files, duplicate_files_info = await _dedupe_by_hash([file for file in files if file.filename], on_progress)
+    skipped_files_info = list(duplicate_files_info)
 
-                # 3. Dapatkan URL publik dari Supabase
-                public_url = db_client.storage.from_(BUCKET_NAME).get_public_url(file_path_in_bucket)
-                print(f"Berhasil upload & mendapatkan URL: {public_url}")
-
-                # 2.5 Upload file ke Supabase Table
-                response_table = db_client.table("files").insert({
-                    "name": file.filename,
-                    "size": file.size,
-                    "type": "application/pdf",
-                    "url": public_url,
-                }).execute()
-                print(f"Berhasil menyimpan metadata file ke Supabase Table (files)")
-
-                # 4. Load konten PDF menggunakan PyPDFLoader
-                # loader = PyPDFLoader(temp_file_path)
-                loader = UnstructuredPDFLoader(temp_file_path, mode="elements")
-                documents_per_file = loader.load()
-
-                # 5. Perbarui metadata 'source' dengan URL Supabase
-                # + Tambahkan metadata doc_id sebagai foreign key 
-                # (doc_id berisi id dari uuid file yang diupload ke supabase table)
-                for doc in documents_per_file:
-                    doc.metadata['source'] = public_url
-                    doc.metadata['filename'] = file.filename
-                    doc.metadata['doc_id'] = response_table.data[0]['id']
-                
-                all_new_documents.extend(documents_per_file)
-                processed_files_info.append({"filename": file.filename, "url": public_url})
-
-            except Exception as e:
-                print(f"GAGAL memproses file {file.filename}: {e}")
-                # Jika gagal, lanjutkan ke file berikutnya
-                continue
+    # semua file diproses paralel, per file upload dan parsing juga berjalan bersamaan
+    results = await asyncio.gather(*[
+        _prepare_file(file, db_client, on_progress, reindex) for file in files
+    ])
+    for documents_per_file, info in results:
+        if info is None:
+            continue
+        if info.get("skipped"):
+            skipped_files_info.append(info)
+            continue
+        all_new_documents.extend(documents_per_file)
+        processed_files_info.append(info)
     
     if not all_new_documents:
+        if skipped_files_info and len(skipped_files_info) == len(results) + len(duplicate_files_info):
+            return {
+                "status": "success",
+                "message": "Semua file sudah ada di knowledge base, tidak ada yang diubah.",
+                "files_processed": 0,
+                "files_skipped": len(skipped_files_info),
+                "chunks_added": 0,
+                "details": skipped_files_info
+            }
         return {"status": "error", "message": "Tidak ada dokumen yang berhasil diproses."}
 
+    processed_names = [info["filename"] for info in processed_files_info]
     try:
-        # 6. Pecah dokumen menjadi chunk
+        # Pecah dokumen menjadi chunk (mode pooled sekaligus menghasilkan vektornya)
+        for name in processed_names:
+            on_progress(name, "chunking")
         print(f"Memecah {len(all_new_documents)} halaman menjadi chunk...")
-        all_chunks = text_splitter.split_documents(all_new_documents)
-        print(f"Dibuat {len(all_chunks)} chunk baru.")
+        text_splitter = await asyncio.to_thread(get_text_splitter)
+        with span("ingest_chunking"):
+            all_chunks = await asyncio.to_thread(text_splitter.split_documents, all_new_documents)
+        print(f"Dibuat {len(all_chunks)} chunk baru ({text_splitter.stats()}).")
 
         # ## INI FIXNYA ##: Panggil fungsi pembersihan sebelum mengirim ke Pinecone
         print("Membersihkan metadata untuk kompatibilitas dengan Pinecone...")
-        all_chunks = clean_pinecone_metadata(all_chunks)
+        clean_pinecone_metadata([chunk.document for chunk in all_chunks])
+
+        # ID deterministik per chunk, chunk kembar dalam satu dokumen cukup disimpan sekali
+        chunks_by_id = {}
+        for chunk in all_chunks:
+            chunk_vector_id = chunk_id(chunk.document.metadata["doc_id"], chunk.document.page_content)
+            chunk.document.metadata["chunk_hash"] = chunk_vector_id.split("#", 1)[1]
+            chunks_by_id.setdefault(chunk_vector_id, chunk)
+
+        # Untuk file yang diganti, hanya chunk yang berubah yang di-embed ulang
+        existing_ids: Set[str] = set()
+        stale_ids: List[str] = []
+        for info in processed_files_info:
+            if info["replaced"]:
+                old_ids = await asyncio.to_thread(list_chunk_ids, info["doc_id"])
+                new_ids = {cid for cid in chunks_by_id if cid.startswith(f"{info['doc_id']}#")}
+                existing_ids |= old_ids & new_ids
+                stale_ids.extend(old_ids - new_ids)
+
+        new_chunk_ids = [cid for cid in chunks_by_id if cid not in existing_ids]
+        new_chunks = [chunks_by_id[cid] for cid in new_chunk_ids]
+
+        # Tambahkan chunk ke vector store (embedding hanya untuk chunk yang belum punya vektor)
+        chunk_counts = Counter(chunk.document.metadata.get("filename") for chunk in chunks_by_id.values())
+        for name in processed_names:
+            on_progress(name, "embedding", chunks=chunk_counts.get(name, 0))
+        print(f"Menambahkan {len(new_chunks)} chunk ke vector store ({len(existing_ids)} tidak berubah)...")
+        if new_chunks:
+            await asyncio.to_thread(upsert_chunks, new_chunks, new_chunk_ids, batch_size=100)
+        if stale_ids:
+            print(f"Menghapus {len(stale_ids)} chunk lama dari vector store...")
+            with span("ingest_delete_stale"):
+                await asyncio.to_thread(lambda: get_store().delete(ids=stale_ids))
+                await asyncio.to_thread(lambda: get_lexical_store().delete(stale_ids))
+
+        print(f"Statistik cache embedding: {get_embeddings_model().stats()}")
+
+        # baru sekarang file dianggap "sudah diindeks" untuk cek isi yang sama
+        await _mark_indexed(processed_files_info, db_client)
+
+        # index berubah, jawaban yang tersimpan di cache sudah tidak valid
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            await answer_cache.ainvalidate()
+
+        for name in processed_names:
+            on_progress(name, "done", chunks=chunk_counts.get(name, 0))
 
-        # 7. Tambahkan chunk ke Pinecone (sudah termasuk proses embedding)
-        print("Menambahkan chunk ke Pinecone...")
-        vectorstore.add_documents(all_chunks, batch_size=100)
-        
         return {
             "status": "success",
             "message": "Knowledge base berhasil diperbarui.",
             "files_processed": len(processed_files_info),
-            "chunks_added": len(all_chunks),
-            "details": processed_files_info
+            "files_skipped": len(skipped_files_info),
+            "chunks_added": len(new_chunks),
+            "chunks_unchanged": len(existing_ids),
+            "chunks_removed": len(stale_ids),
+            "details": processed_files_info + skipped_files_info
         }
 
     except Exception as e:
-        print(f"GAGAL saat chunking atau upload ke Pinecone: {e}")
-        return {"status": "error", "message": f"Gagal pada tahap akhir: {e}"}
\ No newline at end of file
+        print(f"GAGAL saat chunking atau upload ke vector store: {e}")
+        for name in processed_names:
+            on_progress(name, "error", error=str(e))
+        return {"status": "error", "message": f"Gagal pada tahap akhir: {e}"}
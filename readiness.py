@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+#=====================================================================#
+# Status dependency untuk GET /ready. Klien berat (Supabase, OpenAI,  #
+# vector store, rantai LangChain) dibuat lazy; Readiness menjalankan  #
+# pembuatannya di background dan mencatat hasil per dependency.       #
+# Warm-up (opsional) sekaligus membuka koneksi ke layanannya.         #
+#=====================================================================#
+
+Step = Callable[[], Awaitable[None]]
+
+
+class Readiness:
+    def __init__(self):
+        self._init: Dict[str, Step] = {}
+        self._warm_up: Dict[str, Step] = {}
+        self.status: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._keep_warm_task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, init: Step, warm_up: Optional[Step] = None):
+        self._init[name] = init
+        if warm_up is not None:
+            self._warm_up[name] = warm_up
+        self.status[name] = {"status": "pending"}
+
+    async def _run_one(self, name: str, warm: bool):
+        if self.status[name]["status"] == "ok":
+            return
+        self.status[name] = {"status": "starting"}
+        start = time.perf_counter()
+        try:
+            await self._init[name]()
+            if warm and name in self._warm_up:
+                await self._warm_up[name]()
+        except Exception as e:
+            print(f"Dependency {name} belum siap: {e}")
+            self.status[name] = {"status": "error", "error": str(e)}
+        else:
+            self.status[name] = {"status": "ok", "seconds": round(time.perf_counter() - start, 3)}
+
+    async def _run(self, warm: bool):
+        await asyncio.gather(*[self._run_one(name, warm) for name in self._init])
+
+    def start(self, warm: bool = False):
+        """
+        Jalankan inisialisasi (dan warm-up) di background jika belum berjalan.
+        Dependency yang sudah ok dilewati, yang error dicoba lagi.
+        """
+        if self.ready() or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run(warm))
+
+    async def _keep_warm(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            for name, warm_up in self._warm_up.items():
+                if self.status[name]["status"] != "ok":
+                    continue
+                try:
+                    await warm_up()
+                except Exception as e:
+                    print(f"Keep-warm {name} gagal: {e}")
+
+    def start_keep_warm(self, interval: float):
+        """
+        Ulangi warm-up tiap `interval` detik supaya koneksi idle di pool tidak ditutup server.
+        """
+        if self._keep_warm_task is None or self._keep_warm_task.done():
+            self._keep_warm_task = asyncio.create_task(self._keep_warm(interval))
+
+    async def stop(self):
+        tasks = [task for task in (self._task, self._keep_warm_task) if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def ready(self) -> bool:
+        return all(entry["status"] == "ok" for entry in self.status.values())
+
+    def report(self) -> dict:
+        return {"ready": self.ready(), "dependencies": dict(self.status)}
@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from typing import List, Set
+
+from supabase import Client
+
+from answer_cache import get_answer_cache
+from config import uconfig
+from http_pool import create_supabase_client
+from rag_store_documents import (
+    BUCKET_NAME,
+    FOLDER_PATH,
+    IngestFile,
+    get_lexical_store,
+    get_store,
+    process_and_add_documents,
+)
+
+#=====================================================================#
+# Sinkronisasi tabel files, bucket Storage, dan vector store.         #
+#   python reconcile.py            -> hanya laporan (dry run)          #
+#   python reconcile.py --apply    -> hapus orphan & index yang hilang #
+# Orphan: vektor tanpa baris files, baris files tanpa objek di bucket. #
+# Hilang: baris files tanpa vektor, objek bucket tanpa baris files.    #
+# Index leksikal (BM25) disamakan dengan isi vector store.             #
+#=====================================================================#
+
+LIST_PAGE_SIZE = 1000
+DELETE_BATCH_SIZE = 1000
+BACKFILL_BATCH_SIZE = 500
+INDEX_BATCH_SIZE = 20
+
+
+def list_bucket_files(db_client: Client) -> Set[str]:
+    names: Set[str] = set()
+    offset = 0
+    while True:
+        page = db_client.storage.from_(BUCKET_NAME).list(FOLDER_PATH, {"limit": LIST_PAGE_SIZE, "offset": offset})
+        for item in page:
+            if not item["name"].startswith("."):
+                names.add(item["name"])
+        if len(page) < LIST_PAGE_SIZE:
+            return names
+        offset += LIST_PAGE_SIZE
+
+
+async def _index_from_bucket(names: List[str], db_client: Client) -> List[dict]:
+    """
+    Unduh file dari bucket lalu index ulang (tanpa upload kembali), per batch kecil.
+    """
+    results = []
+    for i in range(0, len(names), INDEX_BATCH_SIZE):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            files = []
+            for name in names[i:i + INDEX_BATCH_SIZE]:
+                data = await asyncio.to_thread(db_client.storage.from_(BUCKET_NAME).download, f"{FOLDER_PATH}/{name}")
+                path = os.path.join(temp_dir, name)
+                with open(path, "wb") as f:
+                    f.write(data)
+                files.append(IngestFile(filename=name, path=path, size=len(data)))
+            results.append(await process_and_add_documents(files, db_client, reindex=True))
+    return results
+
+
+async def reconcile(db_client: Client, apply: bool = False) -> dict:
+    vectorstore, lexical_index = await asyncio.gather(
+        asyncio.to_thread(get_store),
+        asyncio.to_thread(get_lexical_store),
+    )
+    rows_response, bucket_names, vectors_by_doc, lexical_ids = await asyncio.gather(
+        asyncio.to_thread(db_client.table("files").select("id, name").execute),
+        asyncio.to_thread(list_bucket_files, db_client),
+        asyncio.to_thread(vectorstore.vector_ids_by_doc),
+        asyncio.to_thread(lexical_index.ids),
+    )
+    rows = rows_response.data or []
+    row_ids = {str(row["id"]) for row in rows}
+    row_names = {row["name"] for row in rows}
+
+    orphan_docs = sorted(doc_id for doc_id in vectors_by_doc if doc_id not in row_ids)
+    dead_rows = [row for row in rows if row["name"] not in bucket_names]
+    unindexed_rows = [
+        row for row in rows
+        if row["name"] in bucket_names and not vectors_by_doc.get(str(row["id"]))
+    ]
+    untracked_names = sorted(bucket_names - row_names)
+
+    vector_ids = {vector_id for ids in vectors_by_doc.values() for vector_id in ids}
+    lexical_missing = sorted(vector_ids - lexical_ids)
+    lexical_stale = sorted(lexical_ids - vector_ids)
+
+    report = {
+        "files_rows": len(rows),
+        "bucket_objects": len(bucket_names),
+        "indexed_docs": len(vectors_by_doc),
+        "orphan_vector_docs": orphan_docs,
+        "rows_without_object": [row["name"] for row in dead_rows],
+        "rows_without_vectors": [row["name"] for row in unindexed_rows],
+        "objects_without_row": untracked_names,
+        "lexical_missing": len(lexical_missing),
+        "lexical_stale": len(lexical_stale),
+        "applied": apply,
+    }
+    if not apply:
+        return report
+
+    # vektor orphan + vektor milik baris yang file-nya sudah hilang, dihapus per batch
+    stale_ids = [vector_id for doc_id in orphan_docs for vector_id in vectors_by_doc[doc_id]]
+    for row in dead_rows:
+        stale_ids.extend(vectors_by_doc.get(str(row["id"]), []))
+    for i in range(0, len(stale_ids), DELETE_BATCH_SIZE):
+        await asyncio.to_thread(vectorstore.delete, ids=stale_ids[i:i + DELETE_BATCH_SIZE])
+    for row in dead_rows:
+        await asyncio.to_thread(db_client.table("files").delete().eq("id", row["id"]).execute)
+
+    # index leksikal mengikuti vector store: buang yang sudah tidak ada, isi yang belum
+    stale_id_set = set(stale_ids)
+    await asyncio.to_thread(lexical_index.delete, sorted(set(lexical_stale) | stale_id_set))
+    backfill_ids = [vector_id for vector_id in lexical_missing if vector_id not in stale_id_set]
+    for i in range(0, len(backfill_ids), BACKFILL_BATCH_SIZE):
+        documents = await asyncio.to_thread(vectorstore.get_documents, backfill_ids[i:i + BACKFILL_BATCH_SIZE])
+        await asyncio.to_thread(lexical_index.add, [doc.id for doc in documents], documents)
+    report["lexical_backfilled"] = len(backfill_ids)
+    report["vectors_deleted"] = len(stale_ids)
+    report["rows_deleted"] = len(dead_rows)
+
+    if stale_ids:
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            await answer_cache.ainvalidate()
+
+    to_index = [row["name"] for row in unindexed_rows] + untracked_names
+    report["index_results"] = await _index_from_bucket(to_index, db_client) if to_index else []
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sinkronkan tabel files, bucket, dan vector store.")
+    parser.add_argument("--apply", action="store_true", help="jalankan penghapusan dan indexing (default: laporan saja)")
+    args = parser.parse_args()
+
+    client = create_supabase_client(uconfig.supabase_url, uconfig.supabase_service_role_key)
+    print(json.dumps(asyncio.run(reconcile(client, apply=args.apply)), indent=2, default=str))
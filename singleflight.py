@@ -0,0 +1,113 @@
+import asyncio
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+#=====================================================================#
+# Single-flight: request identik yang datang bersamaan (mis. jemaat   #
+# menanyakan hal yang sama sesaat setelah khotbah) berbagi satu        #
+# komputasi routing + retrieval + LLM. Komputasi berjalan sebagai task #
+# tersendiri, jadi request pertama yang putus tidak membatalkannya     #
+# untuk yang lain. Event streaming disimpan di Flight sehingga         #
+# pengikut yang datang belakangan tetap menerima semua event dari awal.#
+#=====================================================================#
+
+Event = Tuple[str, Any]
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def normalize(text: str) -> str:
+    """
+    kunci single-flight: huruf kecil, tanpa tanda baca, spasi dirapikan
+    """
+    return " ".join(_PUNCT_RE.sub(" ", text.lower()).split())
+
+
+class Flight:
+    def __init__(self):
+        self.events: List[Event] = []
+        self.done = False
+        self.subscribers = 1
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, event: str, data: Any):
+        self.events.append((event, data))
+        self._notify()
+
+    def finish(self):
+        self.done = True
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[Event]:
+        """
+        Semua event dari awal lalu yang baru masuk; error komputasi dilempar ulang di akhir.
+        """
+        i = 0
+        while True:
+            changed = self._changed
+            if i < len(self.events):
+                yield self.events[i]
+                i += 1
+            elif self.done:
+                await asyncio.shield(self.task)
+                return
+            else:
+                await changed.wait()
+
+    async def result(self) -> Any:
+        # shield: pembatalan satu pemanggil tidak membatalkan komputasi bersama
+        return await asyncio.shield(self.task)
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def join(self, key: str, produce: Callable[[Flight], Awaitable[Any]]) -> Tuple[Flight, bool]:
+        """
+        Ikut komputasi yang sedang berjalan untuk `key`, atau mulai baru lewat
+        `produce(flight)`. Kembalikan (flight, True jika request ini yang memulai).
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            flight.subscribers += 1
+            return flight, False
+
+        flight = Flight()
+        self._flights[key] = flight
+        self.leaders += 1
+        flight.task = asyncio.create_task(self._run(key, flight, produce))
+        # hindari warning "Task exception was never retrieved" jika semua pemanggil sudah pergi
+        flight.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return flight, True
+
+    async def _run(self, key: str, flight: Flight, produce: Callable[[Flight], Awaitable[Any]]) -> Any:
+        try:
+            return await produce(flight)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.finish()
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "in_flight": len(self._flights),
+            # bagian request yang tidak memicu komputasi sendiri
+            "saved_rate": self.coalesced / total if total else 0.0,
+        }
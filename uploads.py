@@ -0,0 +1,72 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+import magic
+from fastapi import UploadFile
+
+#=================================================================#
+# Menyimpan file upload ke disk potong demi potong: memori yang    #
+# dipakai tetap sebesar satu chunk berapapun ukuran file-nya.      #
+# Hash sha256 dihitung sambil jalan, MIME type dideteksi dari      #
+# beberapa KB pertama saja.                                       #
+#=================================================================#
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+SNIFF_BYTES = 8192
+
+
+class UploadRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    size: int
+    sha256: str
+    mime: str
+
+
+async def spool_upload(
+    upload: UploadFile,
+    path: str,
+    expected_mime: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+) -> SpooledUpload:
+    """
+    Tulis isi `upload` ke `path`. Jika `expected_mime` diisi dan hasil deteksi
+    dari header file berbeda, berhenti membaca dan lempar UploadRejected(400).
+    Lebih dari `max_bytes` -> UploadRejected(413).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    mime = None
+
+    with open(path, "wb") as out:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            if mime is None:
+                head += chunk
+                if len(head) >= SNIFF_BYTES:
+                    mime = magic.from_buffer(head[:SNIFF_BYTES], mime=True)
+                    if expected_mime and mime != expected_mime:
+                        raise UploadRejected(400, f"File '{upload.filename}' bukan {expected_mime}.")
+
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise UploadRejected(413, f"File '{upload.filename}' melebihi batas {max_bytes} byte.")
+
+            digest.update(chunk)
+            out.write(chunk)
+
+    if mime is None:
+        # file lebih kecil dari SNIFF_BYTES
+        mime = magic.from_buffer(head, mime=True) if head else "application/x-empty"
+        if expected_mime and mime != expected_mime:
+            raise UploadRejected(400, f"File '{upload.filename}' bukan {expected_mime}.")
+
+    return SpooledUpload(path=path, size=size, sha256=digest.hexdigest(), mime=mime)
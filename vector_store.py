@@ -0,0 +1,406 @@
+import json
+import os
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_pinecone import PineconeVectorStore
+
+from config import uconfig
+
+try:
+    import fcntl
+except ImportError:
+    # bukan POSIX: hanya aman untuk satu proses
+    fcntl = None
+
+#=====================================================================#
+# Vector store yang dipakai kedua modul RAG, dipilih lewat             #
+# R_VECTOR_BACKEND:                                                    #
+#   pinecone: PineconeVectorStore + operasi per doc_id                 #
+#   local:    vektor float16/int8 di file .npy (memory-mapped), top-k  #
+#             dengan NumPy, metadata di file JSON pendamping. Cocok     #
+#             untuk korpus kecil dan mode offline (test / benchmark).  #
+# Keduanya menyediakan upsert_embeddings, list_ids, delete_doc,        #
+# vector_ids_by_doc dan get_documents untuk ingestion & reconcile.py.  #
+#=====================================================================#
+
+TEXT_KEY = "text"
+
+
+class PineconeStore(PineconeVectorStore):
+    """
+    PineconeVectorStore + operasi per doc_id untuk ingestion dan reconcile.py.
+    """
+
+    def upsert_embeddings(self, ids: List[str], embeddings: List[List[float]], documents: List[Document], batch_size: int = 100):
+        records = [
+            (vector_id, vector, {**doc.metadata, self._text_key: doc.page_content})
+            for vector_id, vector, doc in zip(ids, embeddings, documents)
+        ]
+        for i in range(0, len(records), batch_size):
+            self.index.upsert(vectors=records[i:i + batch_size])
+
+    def list_ids(self, prefix: str = "") -> Iterable[str]:
+        """
+        Prefix listing, hanya didukung index serverless.
+        """
+        for page in self.index.list(prefix=prefix) if prefix else self.index.list():
+            yield from page
+
+    def delete_doc(self, doc_id) -> int:
+        """
+        Hapus semua vektor milik doc_id. ID deterministik dihapus lewat prefix listing;
+        vektor lama (ID acak, sebelum ID deterministik) dicari dari seluruh listing ID
+        lalu dicocokkan lewat metadata doc_id. Index yang tidak mendukung listing
+        (pod-based) memakai delete dengan filter metadata.
+        Kembalikan jumlah vektor yang dihapus (tanpa hasil delete lewat filter).
+        """
+        try:
+            ids = sorted(self.list_ids(f"{doc_id}#"))
+            legacy_ids = self._legacy_ids_by_doc().get(str(doc_id), [])
+        except Exception as e:
+            print(f"Peringatan: listing ID tidak tersedia, hapus doc_id {doc_id} lewat filter metadata: {e}")
+            self.index.delete(filter={"doc_id": doc_id})
+            return 0
+
+        ids += legacy_ids
+        for i in range(0, len(ids), 1000):
+            self.delete(ids=ids[i:i + 1000])
+        return len(ids)
+
+    def _legacy_ids_by_doc(self, vector_ids: Optional[Iterable[str]] = None, fetch_batch_size: int = 100) -> Dict[str, List[str]]:
+        """
+        ID lama (tanpa prefix doc_id#) dikelompokkan per doc_id dari metadata-nya.
+        """
+        legacy = [vector_id for vector_id in (self.list_ids() if vector_ids is None else vector_ids) if "#" not in vector_id]
+        by_doc: Dict[str, List[str]] = defaultdict(list)
+        for i in range(0, len(legacy), fetch_batch_size):
+            fetched = self.index.fetch(ids=legacy[i:i + fetch_batch_size])
+            for vector_id, vector in fetched.vectors.items():
+                by_doc[str((vector.metadata or {}).get("doc_id"))].append(vector_id)
+        return by_doc
+
+    def vector_ids_by_doc(self, fetch_batch_size: int = 100) -> Dict[str, List[str]]:
+        """
+        Semua ID vektor di index, dikelompokkan per doc_id (sebagai string).
+        ID deterministik membawa doc_id di prefix-nya; ID lama dibaca dari metadata.
+        """
+        all_ids = list(self.list_ids())
+        by_doc: Dict[str, List[str]] = defaultdict(list)
+        for vector_id in all_ids:
+            if "#" in vector_id:
+                by_doc[vector_id.split("#", 1)[0]].append(vector_id)
+        for doc_id, legacy_ids in self._legacy_ids_by_doc(all_ids, fetch_batch_size).items():
+            by_doc[doc_id].extend(legacy_ids)
+        return by_doc
+
+    def warm_up(self):
+        """
+        Buka koneksi ke index lebih awal.
+        """
+        self.index.describe_index_stats()
+
+    def get_documents(self, ids: List[str], fetch_batch_size: int = 100) -> List[Document]:
+        documents = []
+        for i in range(0, len(ids), fetch_batch_size):
+            fetched = self.index.fetch(ids=ids[i:i + fetch_batch_size])
+            for vector_id, vector in fetched.vectors.items():
+                metadata = dict(vector.metadata or {})
+                documents.append(Document(id=vector_id, page_content=metadata.pop(self._text_key, ""), metadata=metadata))
+        return documents
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Vector store lokal. Satu generasi data = vectors-<gen>.npy (+ scales untuk
+    int8) dan meta-<gen>.json; manifest.json menunjuk generasi aktif dan diganti
+    secara atomik (os.replace), jadi pembaca tidak pernah melihat data setengah jadi.
+    Proses lain (worker uvicorn) memuat ulang saat manifest berubah. Penulisan
+    (muat ulang -> tulis generasi -> ganti manifest) dikunci dengan flock pada
+    file .lock, jadi dua proses yang menulis bersamaan tidak saling menimpa.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings, dtype: str = "float16", block_rows: int = 8192):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"dtype vector store lokal tidak dikenal: {dtype}")
+        self.path = path
+        self._embedding = embedding
+        self.dtype = dtype
+        self.block_rows = block_rows
+        self._lock = threading.RLock()
+        self._manifest_version = None
+        self._generation = None
+        # (vectors, scales, records); diganti utuh supaya query tidak perlu lock
+        self._state: Tuple[Optional[np.ndarray], Optional[np.ndarray], List[dict]] = (None, None, [])
+        os.makedirs(path, exist_ok=True)
+        self._maybe_reload()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    # --- persistensi ---
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    @contextmanager
+    def _write_lock(self):
+        """
+        Kunci antar-thread (RLock) dan antar-proses (flock) untuk satu operasi tulis.
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _maybe_reload(self):
+        try:
+            stat = os.stat(self._manifest_path())
+        except FileNotFoundError:
+            return
+        # os.replace selalu menghasilkan inode baru
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._manifest_version:
+            return
+        with self._lock:
+            if version == self._manifest_version:
+                return
+            with open(self._manifest_path()) as f:
+                manifest = json.load(f)
+            gen = manifest["generation"]
+            with open(os.path.join(self.path, f"meta-{gen}.json")) as f:
+                records = json.load(f)
+            vectors = scales = None
+            if records:
+                vectors = np.load(os.path.join(self.path, f"vectors-{gen}.npy"), mmap_mode="r")
+                if manifest["dtype"] == "int8":
+                    scales = np.load(os.path.join(self.path, f"scales-{gen}.npy"))
+            self.dtype = manifest["dtype"]
+            self._state = (vectors, scales, records)
+            self._generation = gen
+            self._manifest_version = version
+
+    def _save_array(self, name: str, array: np.ndarray):
+        with open(os.path.join(self.path, name), "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write(self, vectors: Optional[np.ndarray], scales: Optional[np.ndarray], records: List[dict]):
+        """
+        Tulis generasi baru lalu ganti manifest secara atomik. Generasi sebelumnya
+        disimpan satu putaran lagi untuk proses lain yang sedang memuatnya.
+        """
+        gen = uuid.uuid4().hex
+        if records:
+            self._save_array(f"vectors-{gen}.npy", vectors)
+            if scales is not None:
+                self._save_array(f"scales-{gen}.npy", scales)
+        with open(os.path.join(self.path, f"meta-{gen}.json"), "w") as f:
+            json.dump(records, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"generation": gen, "dtype": self.dtype, "count": len(records)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path())
+
+        keep = {gen, self._generation}
+        for name in os.listdir(self.path):
+            if name.endswith((".npy", ".json")) and name != "manifest.json" and not any(g and g in name for g in keep):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+        self._manifest_version = None
+        self._maybe_reload()
+
+    def _encode(self, embeddings: List[List[float]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        if self.dtype == "float16":
+            return matrix.astype(np.float16), None
+        # int8 simetris per baris
+        scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127.0
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    # --- operasi tulis ---
+
+    def upsert_embeddings(self, ids: List[str], embeddings: List[List[float]], documents: List[Document], batch_size: int = 100):
+        if not ids:
+            return
+        new_vectors, new_scales = self._encode(embeddings)
+        new_records = [
+            {"id": vector_id, TEXT_KEY: doc.page_content, "metadata": doc.metadata}
+            for vector_id, doc in zip(ids, documents)
+        ]
+        with self._write_lock():
+            self._maybe_reload()
+            vectors, scales, records = self._state
+            id_set = set(ids)
+            keep = [i for i, r in enumerate(records) if r["id"] not in id_set]
+            records = [records[i] for i in keep] + new_records
+            if vectors is not None and keep:
+                vectors = np.concatenate([np.asarray(vectors[keep]), new_vectors])
+                scales = np.concatenate([scales[keep], new_scales]) if new_scales is not None else None
+            else:
+                vectors, scales = new_vectors, new_scales
+            self._write(vectors, scales, records)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+        self.upsert_embeddings(ids, self._embedding.embed_documents(texts), documents)
+        return ids
+
+    def _delete_rows(self, predicate) -> int:
+        with self._write_lock():
+            self._maybe_reload()
+            vectors, scales, records = self._state
+            keep = [i for i, r in enumerate(records) if not predicate(r)]
+            removed = len(records) - len(keep)
+            if removed:
+                self._write(
+                    np.asarray(vectors[keep]) if keep else None,
+                    scales[keep] if scales is not None and keep else None,
+                    [records[i] for i in keep],
+                )
+            return removed
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if ids:
+            id_set = set(ids)
+            self._delete_rows(lambda r: r["id"] in id_set)
+        return True
+
+    def delete_doc(self, doc_id) -> int:
+        return self._delete_rows(lambda r: r["metadata"].get("doc_id") == doc_id)
+
+    # --- operasi baca ---
+
+    def list_ids(self, prefix: str = "") -> Iterable[str]:
+        self._maybe_reload()
+        return [r["id"] for r in self._state[2] if r["id"].startswith(prefix)]
+
+    def vector_ids_by_doc(self, fetch_batch_size: int = 100) -> Dict[str, List[str]]:
+        self._maybe_reload()
+        by_doc: Dict[str, List[str]] = defaultdict(list)
+        for r in self._state[2]:
+            by_doc[str(r["metadata"].get("doc_id"))].append(r["id"])
+        return by_doc
+
+    def warm_up(self):
+        """
+        Muat (memory-map) generasi data aktif lebih awal.
+        """
+        self._maybe_reload()
+
+    def get_documents(self, ids: List[str], fetch_batch_size: int = 100) -> List[Document]:
+        self._maybe_reload()
+        id_set = set(ids)
+        return [
+            Document(id=r["id"], page_content=r[TEXT_KEY], metadata=dict(r["metadata"]))
+            for r in self._state[2] if r["id"] in id_set
+        ]
+
+    def _scores(self, vectors: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        # per blok supaya konversi ke float32 tidak menyalin seluruh matriks sekaligus
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), self.block_rows):
+            block = np.asarray(vectors[start:start + self.block_rows], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        if scales is not None:
+            scores *= scales
+        return scores
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        self._maybe_reload()
+        vectors, scales, records = self._state
+        if vectors is None or not records:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self._scores(vectors, scales, query)
+
+        if filter:
+            mask = np.fromiter(
+                (all(r["metadata"].get(key) == value for key, value in filter.items()) for r in records),
+                dtype=bool, count=len(records),
+            )
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, len(records))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(id=records[i]["id"], page_content=records[i][TEXT_KEY], metadata=dict(records[i]["metadata"])), float(scores[i]))
+            for i in top if np.isfinite(scores[i])
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, path: Optional[str] = None, **kwargs: Any) -> "LocalVectorStore":
+        store = cls(path or uconfig.local_vector_dir, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
+
+
+_vectorstore: Optional[VectorStore] = None
+_vectorstore_lock = threading.Lock()
+
+
+def get_vectorstore(embedding: Embeddings) -> VectorStore:
+    """
+    Vector store bersama untuk proses ini, sesuai R_VECTOR_BACKEND.
+    """
+    global _vectorstore
+    if _vectorstore is None:
+        with _vectorstore_lock:
+            if _vectorstore is None:
+                if uconfig.vector_backend == "local":
+                    _vectorstore = LocalVectorStore(uconfig.local_vector_dir, embedding, dtype=uconfig.local_vector_dtype)
+                elif uconfig.vector_backend == "pinecone":
+                    from pinecone import Pinecone
+
+                    from http_pool import pinecone_pool_stats, register_stats
+
+                    # satu klien + index untuk seluruh proses, pool urllib3-nya dibatasi R_PINECONE_POOL_SIZE
+                    index = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(
+                        os.getenv("PINECONE_INDEX_NAME", "khotbah-summarizer-app"),
+                        connection_pool_maxsize=uconfig.pinecone_pool_size,
+                    )
+                    register_stats("pinecone", lambda: pinecone_pool_stats(index))
+                    _vectorstore = PineconeStore(index=index, embedding=embedding)
+                else:
+                    raise ValueError(f"R_VECTOR_BACKEND tidak dikenal: {uconfig.vector_backend}")
+    return _vectorstore